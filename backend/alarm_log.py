@@ -0,0 +1,291 @@
+"""
+Event-sourced alarm storage
+Machines record RAISED / CLEARED transitions (HaasMachine.drain_alarm_events).
+Each transition is appended to alarm_events; alarm_log is the projection
+with one row per alarm occurrence, closed with cleared_ts and
+duration_seconds when its CLEARED event arrives. Fleet alarm questions are
+answered from these two small indexed tables, never from machine_samples.
+
+Warnings are stored the same way, as their RAISED / CLEARED transitions
+(HaasMachine.drain_warning_events) in warning_events, instead of a copy of
+the active list in every sample.
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from migrations import TEXT_TO_MS_SQL
+from sample_writer import datetime_to_ms, ms_to_timestamp
+
+
+# Columns added to the original alarm_log schema
+EXTRA_COLUMNS = (
+    ("ts", "INTEGER"),            # raised, epoch ms
+    ("cleared_ts", "INTEGER"),    # NULL while the alarm is active
+    ("cycle_phase", "TEXT"),
+    ("spindle_load", "REAL"),
+)
+
+
+def create_alarm_tables(c: sqlite3.Cursor) -> None:
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS alarm_events (
+            id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            machine_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            alarm_code INTEGER,
+            alarm_message TEXT,
+            duration_seconds REAL
+        )
+    """)
+
+    existing = {row[1] for row in c.execute("PRAGMA table_info(alarm_log)")}
+    for name, decl in EXTRA_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE alarm_log ADD COLUMN {name} {decl}")
+
+    # Rows written before ts existed only have the ISO text timestamp
+    c.execute(f"""
+        UPDATE alarm_log SET
+            ts = {TEXT_TO_MS_SQL},
+            cleared_ts = {TEXT_TO_MS_SQL} + CAST(duration_seconds * 1000 AS INTEGER)
+        WHERE ts IS NULL
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS warning_events (
+            id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            machine_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            warning_type TEXT NOT NULL,
+            severity TEXT,
+            message TEXT,
+            value REAL
+        )
+    """)
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_events_machine_ts ON alarm_events(machine_id, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_warning_events_machine_ts ON warning_events(machine_id, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_warning_events_ts ON warning_events(ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_log_ts ON alarm_log(ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_log_machine_ts ON alarm_log(machine_id, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_log_code_ts ON alarm_log(alarm_code, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_log_message_ts ON alarm_log(alarm_message, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alarm_log_open ON alarm_log(machine_id) WHERE cleared_ts IS NULL")
+
+
+def close_dangling_alarms(c: sqlite3.Cursor) -> None:
+    """Close alarms left open by a previous run (machines restart without alarms).
+
+    They end at the machine's last sample, the latest moment they are known
+    to have been active.
+    """
+    c.execute("""
+        UPDATE alarm_log SET
+            cleared_ts = MAX(ts, COALESCE((
+                SELECT s.ts FROM machine_samples s WHERE s.machine_id = alarm_log.machine_id
+                ORDER BY s.ts DESC LIMIT 1
+            ), ts))
+        WHERE cleared_ts IS NULL AND ts IS NOT NULL
+    """)
+    c.execute("""
+        UPDATE alarm_log SET duration_seconds = (cleared_ts - ts) / 1000.0
+        WHERE duration_seconds IS NULL AND cleared_ts IS NOT NULL
+    """)
+
+
+# ========================================
+# WRITES (on the sample writer thread)
+# ========================================
+
+def record_events(conn: sqlite3.Connection, events: List[Dict[str, Any]]) -> None:
+    """Append transitions to alarm_events and project them into alarm_log"""
+    for event in events:
+        ts = datetime_to_ms(event['timestamp'])
+        conn.execute("""
+            INSERT INTO alarm_events (ts, machine_id, event, alarm_code, alarm_message, duration_seconds)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (ts, event['machineId'], event['event'], event['code'], event['message'], event['durationSeconds']))
+
+        if event['event'] == 'RAISED':
+            conn.execute("""
+                INSERT INTO alarm_log (
+                    timestamp, ts, machine_id, machine_name, alarm_code, alarm_message,
+                    cycle_phase, spindle_load
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                ms_to_timestamp(ts), ts, event['machineId'], event['machineName'],
+                event['code'], event['message'], event['cyclePhase'], event['spindleLoad'],
+            ))
+        elif event['event'] == 'CLEARED':
+            conn.execute("""
+                UPDATE alarm_log SET cleared_ts = ?, duration_seconds = (? - ts) / 1000.0
+                WHERE machine_id = ? AND cleared_ts IS NULL
+            """, (ts, ts, event['machineId']))
+
+
+def record_warning_events(conn: sqlite3.Connection, events: List[Dict[str, Any]]) -> None:
+    """Append warning transitions to warning_events"""
+    conn.executemany("""
+        INSERT INTO warning_events (ts, machine_id, event, warning_type, severity, message, value)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            datetime_to_ms(event['timestamp']), event['machineId'], event['event'], event['type'],
+            event['severity'], event['message'], event['value'],
+        )
+        for event in events
+    ])
+
+
+# ========================================
+# QUERIES
+# ========================================
+
+def _filters(
+    since_ms: int,
+    machine_id: Optional[str],
+    code: Optional[int],
+    message: Optional[str],
+    active_only: bool = False,
+):
+    where = ["ts >= ?"]
+    params: List[Any] = [since_ms]
+    if machine_id is not None:
+        where.append("machine_id = ?")
+        params.append(machine_id)
+    if code is not None:
+        where.append("alarm_code = ?")
+        params.append(code)
+    if message is not None:
+        where.append("alarm_message = ?")
+        params.append(message)
+    if active_only:
+        where.append("cleared_ts IS NULL")
+    return " AND ".join(where), params
+
+
+def get_alarms(
+    conn: sqlite3.Connection,
+    since_ms: int,
+    machine_id: Optional[str] = None,
+    code: Optional[int] = None,
+    message: Optional[str] = None,
+    active_only: bool = False,
+    limit: int = 500,
+) -> List[Dict]:
+    """Alarm occurrences, newest first"""
+    where, params = _filters(since_ms, machine_id, code, message, active_only)
+    rows = conn.execute(f"""
+        SELECT id, ts, cleared_ts, machine_id, machine_name, alarm_code, alarm_message,
+               duration_seconds, cycle_phase, spindle_load
+        FROM alarm_log
+        WHERE {where}
+        ORDER BY ts DESC
+        LIMIT ?
+    """, (*params, limit)).fetchall()
+
+    return [
+        {
+            'id': row['id'],
+            'machine_id': row['machine_id'],
+            'machine_name': row['machine_name'],
+            'alarm_code': row['alarm_code'],
+            'alarm_message': row['alarm_message'],
+            'raised_at': ms_to_timestamp(row['ts']),
+            'cleared_at': ms_to_timestamp(row['cleared_ts']) if row['cleared_ts'] is not None else None,
+            'duration_seconds': row['duration_seconds'],
+            'active': row['cleared_ts'] is None,
+            'cycle_phase': row['cycle_phase'],
+            'spindle_load': row['spindle_load'],
+        }
+        for row in rows
+    ]
+
+
+GROUP_COLUMNS = {
+    'machine': 'machine_id',
+    'code': 'alarm_code, alarm_message',
+    'fleet': None,
+}
+
+
+def get_alarm_stats(
+    conn: sqlite3.Connection,
+    since_ms: int,
+    group_by: str = 'machine',
+    machine_id: Optional[str] = None,
+    code: Optional[int] = None,
+    message: Optional[str] = None,
+) -> List[Dict]:
+    """Alarm counts and durations grouped by machine, by code, or for the whole fleet"""
+    where, params = _filters(since_ms, machine_id, code, message)
+    group = GROUP_COLUMNS[group_by]
+    select = f"{group}, " if group else ""
+    group_clause = f"GROUP BY {group}" if group else ""
+    rows = conn.execute(f"""
+        SELECT {select}
+               COUNT(*) AS alarm_count,
+               SUM(CASE WHEN cleared_ts IS NULL THEN 1 ELSE 0 END) AS active_count,
+               SUM(duration_seconds) AS total_duration_seconds,
+               AVG(duration_seconds) AS avg_duration_seconds,
+               MAX(duration_seconds) AS max_duration_seconds,
+               MAX(ts) AS last_ts
+        FROM alarm_log
+        WHERE {where}
+        {group_clause}
+        ORDER BY alarm_count DESC
+    """, params).fetchall()
+
+    stats = []
+    for row in rows:
+        entry = {key: row[key] for key in row.keys() if key != 'last_ts'}
+        entry['total_duration_seconds'] = round(entry['total_duration_seconds'] or 0, 1)
+        entry['avg_duration_seconds'] = round(entry['avg_duration_seconds'] or 0, 1)
+        entry['max_duration_seconds'] = round(entry['max_duration_seconds'] or 0, 1)
+        entry['active_count'] = entry['active_count'] or 0
+        entry['last_alarm_at'] = ms_to_timestamp(row['last_ts']) if row['last_ts'] is not None else None
+        if entry['alarm_count']:
+            stats.append(entry)
+    return stats
+
+
+def get_warning_events(
+    conn: sqlite3.Connection,
+    since_ms: int,
+    machine_id: Optional[str] = None,
+    warning_type: Optional[str] = None,
+    limit: int = 500,
+) -> List[Dict]:
+    """Warning transitions, newest first"""
+    where = ["ts >= ?"]
+    params: List[Any] = [since_ms]
+    if machine_id is not None:
+        where.append("machine_id = ?")
+        params.append(machine_id)
+    if warning_type is not None:
+        where.append("warning_type = ?")
+        params.append(warning_type)
+    rows = conn.execute(f"""
+        SELECT id, ts, machine_id, event, warning_type, severity, message, value
+        FROM warning_events
+        WHERE {' AND '.join(where)}
+        ORDER BY ts DESC, id DESC
+        LIMIT ?
+    """, (*params, limit)).fetchall()
+
+    return [
+        {
+            'id': row['id'],
+            'timestamp': ms_to_timestamp(row['ts']),
+            'machine_id': row['machine_id'],
+            'event': row['event'],
+            'warning_type': row['warning_type'],
+            'severity': row['severity'],
+            'message': row['message'],
+            'value': row['value'],
+        }
+        for row in rows
+    ]
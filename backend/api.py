@@ -3,17 +3,40 @@ CNC Machine Monitor - Enhanced FastAPI Backend with Data Storage & Reports
 Run with: python api.py
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response, StreamingResponse
 import asyncio
 import json
+import os
+import random
 import sqlite3
+import traceback
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
-from haas_machine import create_default_machines, HaasMachine
+from haas_machine import create_fleet_machines, HaasMachine
+from fleet_simulator import FleetSimulator, create_default_fleet
+from scheduler import EventScheduler
+from sharded_fleet import ShardedFleet
+from deltas import DeltaTracker
+from subscriptions import SubscriptionHub, parse_subscription
+import binary_protocol
+from client_queues import ClientRegistry
+import event_stream
+from fleet_summary import FleetSummary
+import alarm_rules
+from snapshot_cache import SnapshotCache, dumps as dumps_json
+from sample_writer import SampleWriter, sample_to_row, machine_to_row, datetime_to_ms, ms_to_timestamp
+import rollups
+import migrations
+import daily_summaries
+import alarm_log
+import export
+import partitions
+import retention
+from read_pool import ReadPool, QueryTimeout
 
 app = FastAPI(title="CNC Machine Monitor API")
 
@@ -27,14 +50,140 @@ app.add_middleware(
 )
 
 # Database path
-DB_PATH = "machines_data.db"
+DB_PATH = os.environ.get("DB_PATH", "machines_data.db")
 
-# Initialize machines
-machines: Dict[str, HaasMachine] = create_default_machines()
+# Raw samples are stored in one table per day
+sample_partitions = partitions.SamplePartitions()
+
+# Keeps daily_summaries current as samples are written
+summary_aggregator = daily_summaries.DailySummaryAggregator()
+
+# Single long-lived writer; samples are batched into one transaction per flush
+sample_writer = SampleWriter(
+    DB_PATH,
+    max_queue=int(os.environ.get("WRITER_MAX_QUEUE", "1000")),
+    flush_interval_ms=int(os.environ.get("WRITER_FLUSH_MS", "1000")),
+    synchronous=os.environ.get("WRITER_SYNCHRONOUS", "NORMAL"),
+    flush_hooks=[rollups.update_rollups, summary_aggregator],
+    insert_rows=sample_partitions.insert,
+)
+
+# Days of data kept per resolution (0 = forever); expiry drops whole day
+# partitions, then freed pages are vacuumed incrementally
+retention_job = retention.RetentionJob(
+    sample_partitions,
+    raw_days=int(os.environ.get("RETENTION_RAW_DAYS", "7")),
+    rollup_days={
+        '1m': int(os.environ.get("RETENTION_1M_DAYS", "90")),
+        '1h': int(os.environ.get("RETENTION_1H_DAYS", "730")),
+    },
+)
+RETENTION_CHECK_SECONDS = int(os.environ.get("RETENTION_CHECK_SECONDS", "3600"))
+
+# Read-only connections for history/report queries, run off the event loop
+read_pool = ReadPool(
+    DB_PATH,
+    size=int(os.environ.get("READ_POOL_SIZE", "4")),
+    max_concurrent=int(os.environ.get("READ_MAX_CONCURRENT", "4")),
+    timeout=float(os.environ.get("READ_TIMEOUT_SECONDS", "10")),
+    max_streams=int(os.environ.get("READ_MAX_STREAMS", "2")),
+)
+
+# Rows fetched per cursor batch when streaming history
+HISTORY_BATCH_ROWS = 500
+
+# Rows fetched (and encoded) per batch for bulk exports
+EXPORT_BATCH_ROWS = 5000
+
+# Simulation tick (seconds) and how often a tick is persisted
+TICK_SECONDS = 1.0
+SAMPLE_EVERY_TICKS = int(os.environ.get("SAMPLE_EVERY_TICKS", "5"))
+# SIM_ENGINE=events: sleeping machines are caught up and sampled only every
+# SAMPLE_SLEEPING_SECONDS (under the daily summaries' 60 s gap cap)
+SAMPLE_SLEEPING_SECONDS = 30
+SAMPLE_SLEEPING_TICKS = SAMPLE_EVERY_TICKS * max(1, round(SAMPLE_SLEEPING_SECONDS / TICK_SECONDS / SAMPLE_EVERY_TICKS))
+
+# Initialize machines. SIM_ENGINE picks how they are advanced:
+#   objects - HaasMachine.update on every machine, every tick
+#   events  - EventScheduler: idle/off/alarmed machines sleep until their next event
+#   vector  - FleetSimulator: the whole fleet as NumPy arrays
+#   sharded - ShardedFleet: SIM_WORKERS processes (default: one per core)
+#             step and serialize their share; this process only reads
+# SIM_FLEET_COPIES repeats the default fleet N times for load testing.
+# SIM_SEED fixes every machine's random stream (derived from it and the
+# machine id), so a run can be replayed with the same engine; unset, one is
+# picked and logged. objects and sharded give identical trajectories, events
+# and vector each their own.
+SIM_ENGINE = os.environ.get("SIM_ENGINE", "objects")
+SIM_FLEET_COPIES = int(os.environ.get("SIM_FLEET_COPIES", "1"))
+SIM_SEED = int(os.environ.get("SIM_SEED") or random.SystemRandom().getrandbits(32))
+SIM_WORKERS = int(os.environ.get("SIM_WORKERS", "0")) or None
+
+# Alarm/warning rules: a JSON rule file, re-read when it changes (default:
+# the built-in rules, see alarm_rules.DEFAULT_RULES)
+ALARM_RULES_PATH = os.environ.get("ALARM_RULES_PATH") or None
+alarm_rules.configure(ALARM_RULES_PATH)
+
+fleet: Optional[FleetSimulator] = None
+scheduler: Optional[EventScheduler] = None
+shards: Optional[ShardedFleet] = None
+if SIM_ENGINE == "vector":
+    fleet = create_default_fleet(SIM_FLEET_COPIES, SIM_SEED)
+    machines = fleet.machines()
+elif SIM_ENGINE == "sharded":
+    # Workers are forked in startup_event
+    shards = ShardedFleet(create_fleet_machines(SIM_FLEET_COPIES, SIM_SEED).values(), SIM_WORKERS)
+    machines = shards.machines()
+else:
+    machines: Dict[str, HaasMachine] = create_fleet_machines(SIM_FLEET_COPIES, SIM_SEED)
+    if SIM_ENGINE == "events":
+        scheduler = EventScheduler(machines.values(), TICK_SECONDS)
 
 # Connected WebSocket clients
 connected_clients: List[WebSocket] = []
 
+# Last published tick: dicts plus their encoded JSON, built at most once
+# per tick whatever the number of readers
+snapshot_cache = SnapshotCache()
+tick_count = 0
+
+# Versioned field-level changes between published ticks; clients holding a
+# baseline (/ws?deltas=1, ?since=) are sent only what changed
+delta_tracker = DeltaTracker()
+delta_clients: List[WebSocket] = []
+
+# Clients that subscribed to some machines / fields / rate, grouped by
+# subscription; each group's frame is encoded once per send
+subscriptions = SubscriptionHub()
+
+# Clients that negotiated the binary subprotocol: fixed-layout records,
+# one frame per tick encoded once for all of them
+binary_clients: List[WebSocket] = []
+binary_encoder = binary_protocol.BinaryEncoder(list(machines))
+
+# Per-client outbound queues: the latest state frame only, sends time out,
+# clients that stay behind are disconnected
+client_queues = ClientRegistry(
+    send_timeout=float(os.environ.get("WS_SEND_TIMEOUT_SECONDS", "5")),
+    max_behind_seconds=float(os.environ.get("WS_MAX_BEHIND_SECONDS", "30")),
+)
+
+# Server-Sent Events (/api/stream): every tick's delta message as an SSE
+# event, kept for clients that reconnect with Last-Event-ID
+SSE_REPLAY_EVENTS = int(os.environ.get("SSE_REPLAY_EVENTS", "60"))
+SSE_GZIP_LEVEL = int(os.environ.get("SSE_GZIP_LEVEL", "6"))
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# ETags and SSE event ids are the tick's revision / version, prefixed per
+# run so that one from before a restart never matches
+ETAG_RUN = f"{random.SystemRandom().getrandbits(32):08x}"
+
+delta_events = event_stream.EventStream(SSE_REPLAY_EVENTS, ETAG_RUN)
+sse_clients = {"connected": 0, "resumed": 0, "snapshots": 0}
+
+# /api/reports/summary counters, updated from each tick's delta
+fleet_summary = FleetSummary()
+
 # ============================================
 # DATABASE SETUP
 # ============================================
@@ -42,40 +191,19 @@ connected_clients: List[WebSocket] = []
 def init_db():
     """Initialize SQLite database with required tables"""
     conn = sqlite3.connect(DB_PATH)
+    # Freed pages (expired partitions) are returned to the OS in the background
+    retention.enable_incremental_vacuum(conn)
+    # WAL lets report queries read while the sample writer commits
+    conn.execute("PRAGMA journal_mode=WAL")
     c = conn.cursor()
     
-    # Machine samples table - stores time-series data
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS machine_samples (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            machine_id TEXT NOT NULL,
-            machine_name TEXT,
-            execution TEXT,
-            cycle_phase TEXT,
-            spindle_speed REAL,
-            spindle_load REAL,
-            spindle_temp REAL,
-            feed_rate REAL,
-            rapid_rate REAL,
-            axis_x REAL,
-            axis_y REAL,
-            axis_z REAL,
-            servo_load_x REAL,
-            servo_load_y REAL,
-            servo_load_z REAL,
-            temperature REAL,
-            current_amps REAL,
-            vibration REAL,
-            part_count INTEGER,
-            total_cycles INTEGER,
-            production_rate INTEGER,
-            alarm TEXT,
-            warnings TEXT,
-            oil_pressure REAL,
-            oil_level REAL
-        )
-    """)
+    # Single-table databases: park machine_samples for online copy into partitions
+    legacy_samples = migrations.prepare_sample_migration(c)
+    legacy_unsummarized = legacy_samples and migrations.legacy_has_text_timestamps(c)
+    
+    # Machine samples - one table per UTC day (ts = epoch ms, UTC) behind
+    # the machine_samples view; see partitions.py
+    sample_partitions.create_view(conn)
     
     # Daily summaries table
     c.execute("""
@@ -112,173 +240,202 @@ def init_db():
     """)
     
     # Create indexes for faster queries
-    c.execute("CREATE INDEX IF NOT EXISTS idx_samples_timestamp ON machine_samples(timestamp)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_samples_machine ON machine_samples(machine_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_summaries_date ON daily_summaries(date)")
     
+    # Alarm raise/clear events and the alarm_log projection built from them;
+    # machines restart without alarms, so anything still open is closed
+    alarm_log.create_alarm_tables(c)
+    alarm_log.close_dangling_alarms(c)
+    
+    # Incrementally maintained summaries; samples that predate them are
+    # summarized once (legacy rows as they are migrated, see below)
+    daily_summaries.ensure_columns(c)
+    c.execute("SELECT 1 FROM daily_summaries WHERE sample_count > 0 LIMIT 1")
+    summaries_empty = c.fetchone() is None
+    unsummarized_upto = (partitions.max_sample_id(conn) or None) if summaries_empty else None
+    legacy_unsummarized = legacy_unsummarized or (legacy_samples and summaries_empty)
+    
+    # 1-minute / 1-hour rollups; samples that predate them are folded in
+    # by the writer in chunks (legacy rows as they are migrated, see below)
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+              (rollups.rollup_table('1m'),))
+    rollups_existed = c.fetchone() is not None
+    rollups.create_rollup_tables(c)
+    unrolled_upto = (partitions.max_sample_id(conn) or None) if not rollups_existed else None
+    legacy_unrolled = legacy_samples and not rollups_existed
+    
     conn.commit()
     conn.close()
+    
+    if legacy_samples:
+        print("Migrating machine_samples into day partitions in the background...")
+        folds = []
+        if legacy_unsummarized:
+            folds.append(summary_aggregator.backfill_rows)
+        if legacy_unrolled:
+            folds.append(rollups.update_rollups)
+
+        def on_copied(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+            for fold in folds:
+                fold(conn, rows)
+
+        sample_writer.add_task(
+            lambda conn: migrations.migrate_samples_step(conn, sample_partitions.insert, on_copied)
+        )
+    if unsummarized_upto is not None:
+        summary_aggregator.start_backfill(unsummarized_upto)
+        sample_writer.add_task(summary_aggregator.backfill_step)
+    if unrolled_upto is not None:
+        print("Building rollups from existing samples in the background...")
+        sample_writer.add_task(rollups.RollupBackfill(unrolled_upto).step)
     print("Database initialized successfully!")
 
 
 def save_sample(machine_id: str, data: dict):
-    """Save a machine sample to the database"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    warnings_json = json.dumps(data.get('warnings', []))
-    
-    c.execute("""
-        INSERT INTO machine_samples (
-            timestamp, machine_id, machine_name, execution, cycle_phase,
-            spindle_speed, spindle_load, spindle_temp,
-            feed_rate, rapid_rate,
-            axis_x, axis_y, axis_z,
-            servo_load_x, servo_load_y, servo_load_z,
-            temperature, current_amps, vibration,
-            part_count, total_cycles, production_rate,
-            alarm, warnings, oil_pressure, oil_level
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        data.get('timestamp', datetime.utcnow().isoformat()),
-        machine_id,
-        data.get('name', ''),
-        data.get('execution', ''),
-        data.get('cyclePhase', ''),
-        data.get('spindleSpeed', 0),
-        data.get('spindleLoad', 0),
-        data.get('spindleTemp', 0),
-        data.get('feedRate', 0),
-        data.get('rapidRate', 0),
-        data.get('axisPositions', {}).get('X', 0),
-        data.get('axisPositions', {}).get('Y', 0),
-        data.get('axisPositions', {}).get('Z', 0),
-        data.get('servoLoad', {}).get('X', 0),
-        data.get('servoLoad', {}).get('Y', 0),
-        data.get('servoLoad', {}).get('Z', 0),
-        data.get('temperature', 0),
-        data.get('currentAmps', 0),
-        data.get('vibration', 0),
-        data.get('partCount', 0),
-        data.get('totalCycles', 0),
-        data.get('productionRate', 0),
-        data.get('alarm'),
-        warnings_json,
-        data.get('oilPressure', 0),
-        data.get('oilLevel', 0)
-    ))
-    
-    conn.commit()
-    conn.close()
+    """Queue a machine sample for the batched writer"""
+    sample_writer.submit(machine_id, data)
 
 
-def get_historical_data(machine_id: str, hours: int = 24, limit: int = 1000):
-    """Get historical data for a machine"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
-    
-    c.execute("""
-        SELECT * FROM machine_samples 
-        WHERE machine_id = ? AND timestamp > ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (machine_id, since, limit))
-    
-    rows = c.fetchall()
-    conn.close()
-    
-    return [dict(row) for row in rows]
+def save_samples(sleeping: bool = True):
+    """Queue the current state of every machine as a single batch"""
+    sample_writer.submit_batch(sample_rows(sleeping))
 
 
-def get_all_historical_data(hours: int = 24):
-    """Get historical data for all machines"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+def sample_rows(sleeping: bool = True) -> List[tuple]:
+    """machine_samples rows for the current state of every machine; with
+    SIM_ENGINE=events and sleeping=False, only of those stepped since the
+    last sample (a sleeping machine only decays until it wakes)"""
+    if shards is not None:
+        return shards.sample_rows()
+    if fleet is not None:
+        return [sample_to_row(machine_id, machine.to_dict(tools=False)) for machine_id, machine in machines.items()]
+    if scheduler is not None:
+        stepped = scheduler.drain_unsampled()
+        if not sleeping:
+            return [machine_to_row(machine) for machine in stepped]
+        scheduler.sync_all()
+    return [machine_to_row(machine) for machine in machines.values()]
+
+
+def drain_alarm_events() -> List[Dict]:
+    """Alarm transitions every machine recorded since the last call"""
+    if shards is not None:
+        return shards.drain_alarm_events()
+    if fleet is not None:
+        return fleet.drain_alarm_events()
+    return [event for machine in machines.values() for event in machine.drain_alarm_events()]
+
+
+def save_alarm_events():
+    """Queue the alarm transitions every machine recorded since the last tick"""
+    events = drain_alarm_events()
+    if events:
+        sample_writer.submit_call(lambda conn: alarm_log.record_events(conn, events))
+
+
+def drain_warning_events() -> List[Dict]:
+    """Warning transitions every machine recorded since the last call"""
+    if shards is not None:
+        return shards.drain_warning_events()
+    if fleet is not None:
+        return fleet.drain_warning_events()
+    return [event for machine in machines.values() for event in machine.drain_warning_events()]
+
+
+def save_warning_events() -> List[Dict]:
+    """Queue the warning transitions recorded since the last tick; returns them for the clients"""
+    events = drain_warning_events()
+    if events:
+        sample_writer.submit_call(lambda conn: alarm_log.record_warning_events(conn, events))
+    return events
+
+
+def warning_event_to_dict(event: Dict) -> Dict:
+    """Warning transition -> WebSocket payload (ISO timestamp)"""
+    return {**event, "timestamp": event["timestamp"].isoformat() + "Z"}
+
+
+def sample_row_to_dict(row: sqlite3.Row) -> Dict:
+    """machine_samples row -> API dict; ts is also rendered as an ISO timestamp"""
+    data = dict(row)
+    data['timestamp'] = ms_to_timestamp(row['ts'])
+    return data
+
+
+def open_history_cursor(
+    conn: sqlite3.Connection,
+    machine_id: Optional[str] = None,
+    hours: int = 24,
+    limit: Optional[int] = None,
+    after_ts: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> sqlite3.Cursor:
+    """Open a cursor over raw samples, newest first.
+
+    Keyset pagination: pass the ts and id of the last row already seen as
+    after_ts/after_id and the scan resumes right after it on the index,
+    no OFFSET involved.
+    """
+    since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
     
-    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+    where = ["ts > ?"]
+    params: List = [since]
+    if machine_id is not None:
+        where.insert(0, "machine_id = ?")
+        params.insert(0, machine_id)
+    if after_ts is not None:
+        if after_id is None:
+            where.append("ts < ?")
+            params.append(after_ts)
+        else:
+            where.append("(ts, id) < (?, ?)")
+            params.extend([after_ts, after_id])
     
-    c.execute("""
+    sql = f"""
         SELECT * FROM machine_samples 
-        WHERE timestamp > ?
-        ORDER BY timestamp DESC
-    """, (since,))
-    
-    rows = c.fetchall()
-    conn.close()
+        WHERE {' AND '.join(where)}
+        ORDER BY ts DESC, id DESC
+    """
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
     
-    return [dict(row) for row in rows]
+    return conn.execute(sql, params)
+
 
+def generate_daily_summary(conn: sqlite3.Connection, date: str = None):
+    """Get the daily summary for all machines.
 
-def generate_daily_summary(date: str = None):
-    """Generate daily summary for all machines"""
+    Rows are maintained by the sample writer as samples arrive (minutes
+    weighted by the real sample interval); past days are frozen.
+    """
     if date is None:
         date = datetime.utcnow().strftime('%Y-%m-%d')
     
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+    summaries = daily_summaries.get_daily_summaries(conn, date)
     
-    start_time = f"{date}T00:00:00"
-    end_time = f"{date}T23:59:59"
-    
-    summaries = []
-    
-    for machine_id in machines.keys():
-        c.execute("""
-            SELECT 
-                COUNT(*) as sample_count,
-                MAX(part_count) - MIN(part_count) as parts_produced,
-                MAX(total_cycles) - MIN(total_cycles) as cycles_completed,
-                AVG(spindle_load) as avg_spindle_load,
-                MAX(spindle_load) as max_spindle_load,
-                AVG(spindle_temp) as avg_spindle_temp,
-                MAX(spindle_temp) as max_spindle_temp,
-                SUM(CASE WHEN execution = 'RUNNING' THEN 1 ELSE 0 END) as running_samples,
-                SUM(CASE WHEN execution = 'IDLE' THEN 1 ELSE 0 END) as idle_samples,
-                SUM(CASE WHEN execution = 'ALARM' THEN 1 ELSE 0 END) as alarm_samples,
-                AVG(production_rate) as avg_production_rate
-            FROM machine_samples
-            WHERE machine_id = ? AND timestamp BETWEEN ? AND ?
-        """, (machine_id, start_time, end_time))
-        
-        row = c.fetchone()
-        
-        if row and row['sample_count'] > 0:
-            summary = {
-                'date': date,
-                'machine_id': machine_id,
-                'machine_name': machines[machine_id].name,
-                'total_parts': row['parts_produced'] or 0,
-                'total_cycles': row['cycles_completed'] or 0,
-                'avg_spindle_load': round(row['avg_spindle_load'] or 0, 2),
-                'max_spindle_load': round(row['max_spindle_load'] or 0, 2),
-                'avg_spindle_temp': round(row['avg_spindle_temp'] or 0, 2),
-                'max_spindle_temp': round(row['max_spindle_temp'] or 0, 2),
-                'runtime_minutes': round((row['running_samples'] or 0) / 60, 2),
-                'idle_minutes': round((row['idle_samples'] or 0) / 60, 2),
-                'alarm_minutes': round((row['alarm_samples'] or 0) / 60, 2),
-                'avg_production_rate': round(row['avg_production_rate'] or 0, 2),
-                'utilization_percent': round(
-                    ((row['running_samples'] or 0) / max(row['sample_count'], 1)) * 100, 2
-                )
-            }
-            summaries.append(summary)
+    # Keep fleet order and current display names
+    order = {machine_id: i for i, machine_id in enumerate(machines)}
+    summaries.sort(key=lambda s: order.get(s['machine_id'], len(order)))
+    for summary in summaries:
+        if summary['machine_id'] in machines:
+            summary['machine_name'] = machines[summary['machine_id']].name
     
-    conn.close()
     return summaries
 
 
-def get_chart_data(machine_id: str, metric: str, hours: int = 1):
-    """Get time-series data for charting"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+def get_chart_data(
+    conn: sqlite3.Connection, machine_id: str, metric: str, hours: int = 1, points: int = 300
+):
+    """Get time-series data for charting.
+
+    Served from the coarsest rollup that still gives at least `points`
+    buckets (each point then also carries min/max/count); short ranges
+    fall back to raw samples.
+    """
     c = conn.cursor()
     
-    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+    since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
     
     metric_map = {
         'spindle_speed': 'spindle_speed',
@@ -293,82 +450,300 @@ def get_chart_data(machine_id: str, metric: str, hours: int = 1):
     
     db_column = metric_map.get(metric, 'spindle_speed')
     
+    resolution = rollups.choose_resolution(hours * 3600, points)
+    if resolution is not None:
+        return rollups.get_rollup_series(conn, machine_id, db_column, since, resolution)
+    
     c.execute(f"""
-        SELECT timestamp, {db_column} as value
+        SELECT ts, {db_column} as value
         FROM machine_samples 
-        WHERE machine_id = ? AND timestamp > ?
-        ORDER BY timestamp ASC
+        WHERE machine_id = ? AND ts > ?
+        ORDER BY ts ASC
     """, (machine_id, since))
     
     rows = c.fetchall()
-    conn.close()
     
-    return [{'timestamp': row['timestamp'], 'value': row['value']} for row in rows]
+    return [{'timestamp': ms_to_timestamp(row['ts']), 'value': row['value']} for row in rows]
 
 
 # ============================================
 # API ENDPOINTS
 # ============================================
 
+async def stream_history(fmt: str, *args):
+    """Stream raw history rows as a JSON array or NDJSON, one cursor batch at a time"""
+    batches = read_pool.stream(open_history_cursor, *args, batch_size=HISTORY_BATCH_ROWS)
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except QueryTimeout as e:
+        await batches.aclose()
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    
+    async def body():
+        try:
+            if fmt == 'ndjson':
+                if first:
+                    yield "\n".join(json.dumps(sample_row_to_dict(r)) for r in first) + "\n"
+                async for rows in batches:
+                    yield "\n".join(json.dumps(sample_row_to_dict(r)) for r in rows) + "\n"
+            else:
+                # Chunked JSON array: same document as before, never held in memory
+                yield "[" + ",".join(json.dumps(sample_row_to_dict(r)) for r in first)
+                separator = "," if first else ""
+                async for rows in batches:
+                    yield separator + ",".join(json.dumps(sample_row_to_dict(r)) for r in rows)
+                    separator = ","
+                yield "]"
+        finally:
+            await batches.aclose()
+    
+    media_type = "application/x-ndjson" if fmt == 'ndjson' else "application/json"
+    return StreamingResponse(body(), media_type=media_type)
+
+
+async def stream_export(fmt: str, columns: List[str], machine_ids: List[str], since: int, until: int):
+    """Stream a gzip CSV or .npz export, one cursor batch at a time.
+
+    Encoding and compression run on worker threads, not the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    batches = read_pool.stream(
+        export.open_export_cursor, columns, machine_ids, since, until, batch_size=EXPORT_BATCH_ROWS
+    )
+    filename = f"machine_samples_{since}_{until}"
+    
+    if fmt == 'npz':
+        spooler = export.NpzColumnSpooler(columns)
+        try:
+            async for rows in batches:
+                await loop.run_in_executor(None, spooler.add, rows)
+        except QueryTimeout as e:
+            spooler.close()
+            return JSONResponse(status_code=504, content={"error": str(e)})
+        finally:
+            await batches.aclose()
+        return StreamingResponse(
+            spooler.iter_npz(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.npz"'},
+        )
+    
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except QueryTimeout as e:
+        await batches.aclose()
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    
+    encoder = export.CsvGzipEncoder(columns)
+    
+    async def body():
+        try:
+            yield await loop.run_in_executor(None, lambda: encoder.header() + encoder.encode(first))
+            async for rows in batches:
+                yield await loop.run_in_executor(None, encoder.encode, rows)
+            yield encoder.finish()
+        finally:
+            await batches.aclose()
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.csv.gz"'},
+    )
+
+
+async def run_query(fn, *args):
+    """Run a blocking query function on the read pool"""
+    try:
+        return await read_pool.run(fn, *args)
+    except QueryTimeout as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
+
+
 def get_all_machine_data() -> Dict:
     """Get current state of all machines"""
+    if shards is not None:
+        return shards.all_dicts()
+    if scheduler is not None:
+        scheduler.sync_all()
     return {machine_id: machine.to_dict() for machine_id, machine in machines.items()}
 
 
+# Per machine, the HaasMachine.version whose fields delta_tracker holds
+machine_versions: Dict[str, int] = {}
+
+
+def collect_changes() -> Dict[str, Dict[str, Any]]:
+    """The fields the tick just stepped changed, per machine, as found by the engine"""
+    if shards is not None:
+        return shards.changes()
+    if fleet is not None:
+        return fleet.changes()
+    # events: only the machines the scheduler touched; sleeping ones have no delta
+    touched = scheduler.drain_touched() if scheduler is not None else machines.values()
+    changes = {}
+    for machine in touched:
+        fields = machine.to_delta(machine_versions.get(machine.id, 0))
+        if fields:
+            changes[machine.id] = fields
+            machine_versions[machine.id] = machine.version
+    return changes
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the web dashboard"""
     return FileResponse('static/index.html')
 
 
+def json_response(content: bytes) -> Response:
+    """Already-encoded JSON, skipping FastAPI's per-request encoding"""
+    return Response(content=content, media_type="application/json")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header (a list of tags, or *) covers etag"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag or tag == "*":
+            return True
+    return False
+
+
+def tick_response(request: Request, revision: int, encode: Callable[[], bytes]) -> Response:
+    """JSON of one tick revision with its ETag; 304 (nothing encoded) when the client has it"""
+    etag = f'"{ETAG_RUN}-{revision}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=encode(), media_type="application/json", headers=headers)
+
+
 @app.get("/api/machines")
-async def get_machines():
-    """Get all machine data (REST endpoint)"""
-    return get_all_machine_data()
+async def get_machines(request: Request, since: Optional[int] = None):
+    """Get all machine data (REST endpoint); ?since=<version> returns only what changed"""
+    if snapshot_cache.version == 0:
+        return get_all_machine_data()
+    if since is None:
+        return tick_response(request, snapshot_cache.revision, snapshot_cache.fleet_bytes)
+    if not delta_tracker.can_answer(since):
+        # No usable baseline (0, or a version from before a restart): full state
+        return json_response(dumps_json(
+            {"version": delta_tracker.version, "full": True, "machines": delta_tracker.snapshot()}
+        ))
+    return json_response(dumps_json(
+        {"version": delta_tracker.version, "since": since, "machines": delta_tracker.delta(since)}
+    ))
 
 
 @app.get("/api/machines/{machine_id}")
-async def get_machine(machine_id: str):
-    """Get single machine data"""
+async def get_machine(request: Request, machine_id: str, since: Optional[int] = None):
+    """Get single machine data; ?since=<version> returns only the changed fields"""
     if machine_id in machines:
-        return machines[machine_id].to_dict()
+        if snapshot_cache.version > 0:
+            if since is None:
+                return tick_response(request, snapshot_cache.revision,
+                                     lambda: snapshot_cache.machine_bytes(machine_id))
+            if not delta_tracker.can_answer(since):
+                return json_response(dumps_json({"version": delta_tracker.version, "full": True,
+                                                 "machine": delta_tracker.snapshot()[machine_id]}))
+            return json_response(dumps_json({"version": delta_tracker.version, "since": since,
+                                             "machine": delta_tracker.machine_delta(machine_id, since)}))
+        machine = machines[machine_id]
+        if scheduler is not None:
+            scheduler.sync(machine)
+        return machine.to_dict()
     return {"error": "Machine not found"}
 
 
 @app.get("/api/machines/{machine_id}/history")
 async def get_machine_history(
     machine_id: str, 
-    hours: int = Query(default=24, ge=1, le=168)
+    hours: int = Query(default=24, ge=1, le=168),
+    resolution: str = Query(default='raw', regex='^(raw|1m|1h)$'),
+    limit: int = Query(default=1000, ge=1),
+    after_ts: Optional[int] = Query(default=None),
+    after_id: Optional[int] = Query(default=None),
+    format: str = Query(default='json', regex='^(json|ndjson)$')
 ):
-    """Get historical data for a machine"""
-    return get_historical_data(machine_id, hours)
+    """Get historical data for a machine (streamed, keyset-paginated)"""
+    if resolution != 'raw':
+        if after_id is not None:
+            return JSONResponse(status_code=400, content={
+                "error": "after_id only applies to raw history; page rollups with after_ts"
+            })
+        since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
+        rows = await run_query(rollups.get_rollup_history, machine_id, since, resolution, limit, after_ts)
+        if not isinstance(rows, list):
+            return rows
+        if format == 'ndjson':
+            return Response("".join(json.dumps(row) + "\n" for row in rows), media_type="application/x-ndjson")
+        return rows
+    return await stream_history(format, machine_id, hours, limit, after_ts, after_id)
 
 
 @app.get("/api/history")
-async def get_all_history(hours: int = Query(default=24, ge=1, le=168)):
-    """Get historical data for all machines"""
-    return get_all_historical_data(hours)
+async def get_all_history(
+    hours: int = Query(default=24, ge=1, le=168),
+    limit: Optional[int] = Query(default=None, ge=1),
+    after_ts: Optional[int] = Query(default=None),
+    after_id: Optional[int] = Query(default=None),
+    format: str = Query(default='json', regex='^(json|ndjson)$')
+):
+    """Get historical data for all machines (streamed, keyset-paginated)"""
+    return await stream_history(format, None, hours, limit, after_ts, after_id)
+
+
+@app.get("/api/export")
+async def export_samples(
+    format: str = Query(default='csv', regex='^(csv|npz)$'),
+    machine_id: Optional[str] = None,
+    columns: Optional[str] = None,
+    hours: int = Query(24, ge=1),
+    since_ts: Optional[int] = None,
+    until_ts: Optional[int] = None,
+):
+    """Bulk export of raw samples as gzip CSV or NumPy .npz (columnar)"""
+    try:
+        export_columns = export.parse_columns(columns)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    machine_ids = [m for m in (machine_id or '').split(',') if m]
+    until = until_ts if until_ts is not None else datetime_to_ms(datetime.utcnow()) + 1
+    since = since_ts if since_ts is not None else until - hours * 3600 * 1000
+    return await stream_export(format, export_columns, machine_ids, since, until)
 
 
 @app.get("/api/machines/{machine_id}/chart/{metric}")
 async def get_machine_chart(
     machine_id: str,
     metric: str,
-    hours: int = Query(default=1, ge=1, le=24)
+    hours: int = Query(default=1, ge=1, le=720),
+    points: int = Query(default=300, ge=1, le=5000)
 ):
     """Get chart data for a specific metric"""
-    return get_chart_data(machine_id, metric, hours)
+    return await run_query(get_chart_data, machine_id, metric, hours, points)
 
 
 @app.get("/api/reports/daily")
 async def get_daily_report(date: str = None):
     """Get daily summary report"""
-    return generate_daily_summary(date)
+    return await run_query(generate_daily_summary, date)
 
 
 @app.get("/api/reports/summary")
-async def get_summary_stats():
-    """Get overall summary statistics"""
+async def get_summary_stats(request: Request):
+    """Get overall summary statistics (as of the last tick)"""
+    if fleet_summary.version:
+        return tick_response(request, fleet_summary.version, summary_bytes)
     machine_data = get_all_machine_data()
     
     total_parts = sum(m.get('partCount', 0) for m in machine_data.values())
@@ -387,12 +762,123 @@ async def get_summary_stats():
     }
 
 
+_summary_body: Tuple[int, bytes] = (0, b"")
+
+
+def summary_bytes() -> bytes:
+    """Encoded fleet_summary, once per tick"""
+    global _summary_body
+    if _summary_body[0] != fleet_summary.version:
+        _summary_body = (fleet_summary.version, dumps_json(fleet_summary.to_dict()))
+    return _summary_body[1]
+
+
+@app.get("/api/alarms")
+async def get_alarms(
+    hours: int = Query(24, ge=1, le=24 * 365),
+    machine_id: Optional[str] = None,
+    code: Optional[int] = None,
+    message: Optional[str] = None,
+    active: bool = False,
+    limit: int = Query(500, ge=1, le=10000),
+):
+    """Get alarm occurrences (raised/cleared time and duration), newest first"""
+    since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
+    return await run_query(alarm_log.get_alarms, since, machine_id, code, message, active, limit)
+
+
+@app.get("/api/alarms/stats")
+async def get_alarm_stats(
+    hours: int = Query(24, ge=1, le=24 * 365),
+    group_by: str = Query(default='machine', regex='^(machine|code|fleet)$'),
+    machine_id: Optional[str] = None,
+    code: Optional[int] = None,
+    message: Optional[str] = None,
+):
+    """Get alarm counts and total/avg/max durations per machine, per code or fleet-wide"""
+    since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
+    return await run_query(alarm_log.get_alarm_stats, since, group_by, machine_id, code, message)
+
+
+@app.get("/api/warnings")
+async def get_warnings(
+    hours: int = Query(24, ge=1, le=24 * 365),
+    machine_id: Optional[str] = None,
+    warning_type: Optional[str] = Query(None, alias="type"),
+    limit: int = Query(500, ge=1, le=10000),
+):
+    """Get warning transitions (RAISED/CLEARED), newest first"""
+    since = datetime_to_ms(datetime.utcnow() - timedelta(hours=hours))
+    return await run_query(alarm_log.get_warning_events, since, machine_id, warning_type, limit)
+
+
+@app.get("/api/system/writer")
+async def get_writer_stats():
+    """Get sample writer flush and backpressure statistics"""
+    return sample_writer.stats()
+
+
+@app.get("/api/system/storage")
+async def get_storage_stats():
+    """Get database size, sample partitions and retention statistics"""
+    stats = await run_query(retention.get_storage_stats)
+    if isinstance(stats, dict):
+        stats['retention'] = retention_job.stats()
+    return stats
+
+
+@app.get("/api/system/read-pool")
+async def get_read_pool_stats():
+    """Get read connection pool statistics"""
+    return read_pool.stats()
+
+
+@app.get("/api/system/clients")
+async def get_client_stats():
+    """Get WebSocket clients with their queue lag, dropped frames and timeouts"""
+    return {**client_queues.stats(), 'sse': {**sse_clients, 'replay_events': len(delta_events.events)}}
+
+
+@app.get("/api/system/alarm-rules")
+async def get_alarm_rules():
+    """Get the alarm and warning rules in effect"""
+    book = alarm_rules.rule_book()
+    return {**book.stats(), "rules": book.rules.spec}
+
+
+@app.post("/api/system/alarm-rules/reload")
+async def reload_alarm_rules():
+    """Re-read ALARM_RULES_PATH now (it is also picked up on change within a second)"""
+    book = alarm_rules.rule_book()
+    if not book.path:
+        return JSONResponse(status_code=400, content={"error": "ALARM_RULES_PATH is not set"})
+    try:
+        book.reload()
+    except alarm_rules.RuleError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    wake_sleeping_machines()
+    return book.stats()
+
+
+def control_machine(machine_id: str, action):
+    """Apply a manual control; a sleeping machine is caught up first and woken after"""
+    machine = machines[machine_id]
+    if scheduler is not None:
+        scheduler.sync(machine)
+    action(machine)
+    if scheduler is not None:
+        scheduler.wake(machine)
+    if snapshot_cache.version:
+        snapshot_cache.refresh(machine_id, machine.to_dict())
+    return machine
+
+
 @app.post("/api/machines/{machine_id}/power")
 async def toggle_power(machine_id: str):
     """Toggle machine power"""
     if machine_id in machines:
-        machines[machine_id].set_power(not machines[machine_id].power)
-        return {"success": True, "power": machines[machine_id].power}
+        machine = control_machine(machine_id, lambda m: m.set_power(not m.power))
+        return {"success": True, "power": machine.power}
     return {"error": "Machine not found"}
 
 
@@ -400,50 +886,287 @@ async def toggle_power(machine_id: str):
 async def clear_alarm(machine_id: str):
     """Clear machine alarm"""
     if machine_id in machines:
-        machines[machine_id].clear_alarm()
+        control_machine(machine_id, lambda m: m.clear_alarm())
         return {"success": True}
     return {"error": "Machine not found"}
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates"""
-    await websocket.accept()
-    connected_clients.append(websocket)
-    print(f"Client connected. Total clients: {len(connected_clients)}")
+async def websocket_endpoint(websocket: WebSocket, deltas: bool = False):
+    """WebSocket endpoint for real-time updates (pushed by tick_loop).
+
+    deltas=1: one full {"type": "snapshot"} message, then per tick a
+    {"type": "delta"} with only the changed fields.
+
+    A {"type": "subscribe"} message switches the client to projected
+    {"type": "update"} frames (see subscriptions.py). Clients offering the
+    "cnc-binary.v1" subprotocol get a schema, then binary frames
+    (binary_protocol.py).
+    """
+    binary = binary_protocol.SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=binary_protocol.SUBPROTOCOL if binary else None)
+    clients = binary_clients if binary else delta_clients if deltas else connected_clients
+    # Everything goes out through the client's queue, never awaited here
+    # or in the tick loop. Current state right away instead of waiting for
+    # the next tick.
+    if binary:
+        queue = client_queues.add(websocket, "binary")
+        queue.send(json.dumps(binary_encoder.schema()))
+        if snapshot_cache.version:
+            queue.offer(binary_encoder.frame(delta_tracker.version, snapshot_cache.dicts()), delta_tracker.version)
+    elif deltas:
+        # A delta client that skips frames gets one delta covering them (see
+        # delta_catch_up); before the first tick the first delta carries everything
+        queue = client_queues.add(websocket, "delta", resync=delta_catch_up)
+        if delta_tracker.version > 0:
+            queue.offer(delta_baseline(), delta_tracker.version)
+    else:
+        queue = client_queues.add(websocket, "snapshot")
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            queue.offer(snapshot, delta_tracker.version)
+    clients.append(websocket)
+    print(f"Client connected. Total clients: {client_count()}")
     
     try:
         while True:
-            # Update all machines
-            for machine_id, machine in machines.items():
-                machine.update(1.0)
-                # Save to database every update
-                save_sample(machine_id, machine.to_dict())
-            
-            # Send data to client
-            data = get_all_machine_data()
-            await websocket.send_json(data)
-            
-            # Wait 1 second
-            await asyncio.sleep(1)
-            
+            handle_client_message(websocket, clients, await websocket.receive_text())
     except WebSocketDisconnect:
-        connected_clients.remove(websocket)
-        print(f"Client disconnected. Total clients: {len(connected_clients)}")
+        pass
+    finally:
+        if websocket in clients:
+            clients.remove(websocket)
+        subscriptions.unsubscribe(websocket)
+        if client_queues[websocket].closing:
+            print(f"Client dropped: {client_queues[websocket].closing}")
+        client_queues.remove(websocket)
+        print(f"Client disconnected. Total clients: {client_count()}")
+
+
+@app.get("/api/stream")
+async def stream_machines(request: Request, deltas: bool = False):
+    """Server-Sent Events: per tick the fleet state (same as GET /api/machines), or
+    with deltas=1 the /ws?deltas=1 messages. Resumes from Last-Event-ID."""
+    last_id = event_stream.parse_last_event_id(request.headers.get("last-event-id"), ETAG_RUN)
+    gzip = SSE_GZIP_LEVEL > 0 and "gzip" in request.headers.get("accept-encoding", "")
+
+    async def body():
+        encoder = event_stream.GzipStream(SSE_GZIP_LEVEL) if gzip else None
+
+        def chunk(data: bytes) -> bytes:
+            return encoder.encode(data) if encoder else data
+
+        sent = last_id
+        sse_clients["connected"] += 1
+        try:
+            yield chunk(event_stream.RETRY)
+            if deltas and delta_events.since(last_id) is not None:
+                sse_clients["resumed"] += 1
+            while True:
+                events: List[bytes] = []
+                if deltas:
+                    # Missed deltas from the replay buffer, else a new baseline
+                    events = delta_events.since(sent)
+                    if events is None:
+                        events = [sse_snapshot_event(True)] if delta_tracker.version else []
+                        sse_clients["snapshots"] += bool(events)
+                elif delta_tracker.version and sent != delta_tracker.version:
+                    events = [sse_snapshot_event(False)]
+                if events:
+                    yield chunk(b"".join(events))
+                    sent = delta_tracker.version
+                if not await delta_events.wait(sent or 0, SSE_KEEPALIVE_SECONDS):
+                    yield chunk(event_stream.KEEPALIVE)
+        finally:
+            sse_clients["connected"] -= 1
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body(), media_type="text/event-stream", headers=headers)
+
+
+def client_count() -> int:
+    return len(client_queues)
+
+
+def handle_client_message(websocket: WebSocket, clients: List[WebSocket], text: str):
+    """Apply a {"type": "subscribe", "machines", "fields", "maxRate"} message"""
+    queue = client_queues[websocket]
+    try:
+        message = json.loads(text)
+        if not isinstance(message, dict) or message.get("type") != "subscribe":
+            raise ValueError('expected {"type": "subscribe", ...}')
+        dicts = snapshot_cache.dicts()
+        field_names = set().union(*dicts.values()) if dicts else None
+        key = parse_subscription(message, machines.keys(), field_names, TICK_SECONDS)
+    except ValueError as e:   # includes malformed JSON
+        queue.send(json.dumps({"type": "error", "error": str(e)}))
+        return
+
+    if websocket in clients:
+        clients.remove(websocket)
+    group = subscriptions.subscribe(websocket, key)
+    machine_ids, fields, every_ticks = key
+    queue.kind = "subscription"
+    queue.resync = None
+    queue.send(json.dumps({
+        "type": "subscribed",
+        "machines": machine_ids,
+        "fields": fields,
+        "maxRate": 1.0 / (every_ticks * TICK_SECONDS),
+    }))
+    # Current state right away (replacing any frame of the old format); the
+    # group's next frame follows its schedule
+    if snapshot_cache.version:
+        queue.replace_state(group.frame(delta_tracker.version, snapshot_cache.dicts()), delta_tracker.version)
+    else:
+        queue.replace_state()
+
+
+def current_snapshot() -> Optional[str]:
+    """The last published tick as JSON; serialized once, whatever the number of clients"""
+    return snapshot_cache.fleet_text() if snapshot_cache.version else None
+
+
+_baseline: Dict[int, str] = {}
+
+
+def delta_baseline() -> str:
+    """{"type": "snapshot"} message of the current version for delta clients, encoded once per version"""
+    version = delta_tracker.version
+    if version not in _baseline:
+        _baseline.clear()
+        _baseline[version] = dumps_json({"type": "snapshot", "version": version,
+                                         "machines": delta_tracker.snapshot()}).decode()
+    return _baseline[version]
+
+
+def delta_catch_up(since: Optional[int]) -> Tuple[str, int]:
+    """For a delta client that skipped frames: one delta from the version it holds to now
+    (warning transitions of the skipped ticks are not repeated), else a new baseline"""
+    version = delta_tracker.version
+    if since is None or not delta_tracker.can_answer(since):
+        return delta_baseline(), version
+    message = {"type": "delta", "version": version, "since": since, "machines": delta_tracker.delta(since)}
+    return dumps_json(message).decode(), version
 
 
-# Background task to update machines (for REST polling)
-async def update_machines_task():
-    """Background task that updates machine state every second"""
-    sample_counter = 0
+_sse_snapshot: Dict[bool, Tuple[int, bytes]] = {}
+
+
+def sse_snapshot_event(deltas: bool) -> bytes:
+    """The current state as an SSE event (the fleet, or a delta baseline), formatted once per version"""
+    version = delta_tracker.version
+    cached = _sse_snapshot.get(deltas)
+    if cached is None or cached[0] != version:
+        data = delta_baseline().encode() if deltas else snapshot_cache.fleet_bytes()
+        cached = _sse_snapshot[deltas] = (version, event_stream.format_event(ETAG_RUN, version, data))
+    return cached[1]
+
+
+def broadcast(payload: Union[str, bytes], recipients: Optional[List[WebSocket]] = None):
+    """Queue one pre-serialized state frame (text, or bytes for a binary frame) of the
+    current tick for every client in recipients (default: full-snapshot clients);
+    never waits on a client"""
+    client_queues.offer(connected_clients if recipients is None else recipients, payload, delta_tracker.version)
+
+
+def push_subscriptions(data: Dict[str, Dict], warning_events: List[Dict]):
+    """Queue each subscription group that is due its projected frame, encoded once per group"""
+    if warning_events:
+        subscriptions.add_warnings(warning_events)
+    for group, warnings in subscriptions.due(tick_count, delta_tracker):
+        broadcast(group.frame(delta_tracker.version, data, warnings), group.clients)
+
+
+# The one simulation loop: ticks the machines, persists, and fans out
+def update_machines(dt: float, now: Optional[datetime] = None):
+    """Advance the simulation by dt seconds with the configured engine.
+
+    `now` stamps the new state (default: wall clock); backfill.py passes
+    virtual timestamps.
+    """
+    if alarm_rules.rule_book().reload_if_changed():
+        wake_sleeping_machines()
+    if shards is not None:
+        shards.step(dt, now)
+    elif fleet is not None:
+        fleet.step(dt, now)
+    elif scheduler is not None:
+        scheduler.step(now)
+    else:
+        for machine in machines.values():
+            machine.update(dt, now)
+
+
+def wake_sleeping_machines():
+    """After a rule change: sleeping machines were scheduled under the old rules"""
+    if scheduler is not None:
+        for machine in machines.values():
+            scheduler.wake(machine)
+
+
+async def tick_loop():
+    """Run a tick per TICK_SECONDS; a failing tick is logged and the next one runs anyway"""
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    while True:
+        try:
+            await run_tick()
+        except Exception as e:
+            print(f"Tick {tick_count} failed: {e!r}")
+            traceback.print_exc()
+
+        # Fixed rate: a slow tick shortens the next sleep instead of drifting
+        next_tick += TICK_SECONDS
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def run_tick():
+    """Advance all machines once, save the tick and push it to all clients"""
+    global tick_count
+    if shards is not None:
+        # Workers step and serialize (and watch the rule file themselves);
+        # the loop stays free meanwhile
+        alarm_rules.rule_book().reload_if_changed()
+        await shards.step_async(TICK_SECONDS)
+    else:
+        update_machines(TICK_SECONDS)
+    # Only the changed fields are built; the tracker merges them into the snapshot
+    delta = delta_tracker.publish(collect_changes())
+    data = delta_tracker.snapshot()
+    snapshot_cache.publish(data, shards.snapshot_json() if shards is not None else None)
+    fleet_summary.apply(delta, delta_tracker.version)
+    if tick_count % SAMPLE_EVERY_TICKS == 0:
+        save_samples(sleeping=tick_count % SAMPLE_SLEEPING_TICKS == 0)
+    # Alarm and warning transitions are never sampled away
+    save_alarm_events()
+    warning_events = [warning_event_to_dict(event) for event in save_warning_events()]
+    tick_count += 1
+    if connected_clients:
+        broadcast(current_snapshot())
+    # One encoding of the tick's delta for /ws?deltas=1 and the SSE replay buffer
+    version = delta_tracker.version
+    message = {"type": "delta", "version": version, "since": version - 1, "machines": delta}
+    if warning_events:
+        message["warnings"] = warning_events
+    delta_json = dumps_json(message)
+    delta_events.publish(version, delta_json)
+    if delta_clients:
+        broadcast(delta_json.decode(), delta_clients)
+    if binary_clients:
+        broadcast(binary_encoder.frame(delta_tracker.version, data), binary_clients)
+    if subscriptions.groups:
+        push_subscriptions(data, warning_events)
+
+
+# Background task to expire old data
+async def retention_task():
+    """Queue a retention pass (partition drops + incremental vacuum) periodically"""
     while True:
-        for machine_id, machine in machines.items():
-            machine.update(1.0)
-            # Save sample every 5 seconds to reduce DB writes
-            if sample_counter % 5 == 0:
-                save_sample(machine_id, machine.to_dict())
-        sample_counter += 1
-        await asyncio.sleep(1)
+        retention_job.schedule(sample_writer)
+        await asyncio.sleep(RETENTION_CHECK_SECONDS)
 
 
 @app.on_event("startup")
@@ -451,8 +1174,14 @@ async def startup_event():
     """Start background update task and initialize DB"""
     import shutil
     
-    # Initialize database
+    # Workers first: forked before this process starts any threads
+    if shards is not None:
+        shards.start()
+
+    # Initialize database and start the sample writer
     init_db()
+    sample_writer.start()
+    read_pool.start()
     
     # Create static directory and copy frontend
     static_dir = Path("static")
@@ -466,15 +1195,20 @@ async def startup_event():
     else:
         print(f"⚠️ Warning: {frontend_html} not found")
     
-    # Start background task
-    asyncio.create_task(update_machines_task())
+    # Start background tasks
+    asyncio.create_task(tick_loop())
+    asyncio.create_task(retention_task())
     
     print("=" * 60)
     print("CNC Machine Monitor API Started!")
     print("=" * 60)
-    print(f"Machines loaded: {len(machines)}")
-    for mid, m in machines.items():
+    print(f"Machines loaded: {len(machines)} (engine: {SIM_ENGINE}, SIM_SEED={SIM_SEED})")
+    if shards is not None:
+        print(f"  {shards.workers} simulation worker process(es)")
+    for mid, m in list(machines.items())[:12]:
         print(f"  - {m.name} ({m.model})")
+    if len(machines) > 12:
+        print(f"  ... and {len(machines) - 12} more")
     print("=" * 60)
     print("Endpoints:")
     print("  Dashboard:  http://localhost:5000/")
@@ -484,6 +1218,15 @@ async def startup_event():
     print("=" * 60)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close read connections and flush queued samples before exit"""
+    read_pool.close()
+    sample_writer.stop()
+    if shards is not None:
+        shards.stop()
+
+
 # Mount static files
 if Path("static").exists():
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -0,0 +1,258 @@
+"""
+Binary WebSocket telemetry
+Clients that ask for the "cnc-binary.v1" WebSocket subprotocol get one JSON
+schema message (machines, fields with their types, enum tables), then per
+tick one binary frame: a header and one fixed-layout little-endian record
+per machine. No key names, no number formatting - a record is 193 bytes
+where the machine's JSON object is several KB.
+
+Frame layout (struct notation):
+    header  <BBHIq   frame type (1), schema version, record count,
+                     tick version, timestamp (epoch ms)
+    record  <H...    machine index (into schema "machines"), then the
+                     schema fields in order
+
+String enums (execution, cyclePhase) are sent as their index in the
+schema's enum table (255: not in the table); missing numbers are NaN for
+floats and 0 for integers (-1 for alarmCode). Alarm messages, warnings,
+tools and specs only exist in the JSON protocol.
+
+    python binary_protocol.py [copies]   # benchmark against the JSON path
+"""
+
+import math
+import struct
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fleet_simulator import EXECUTIONS, PHASES
+
+SUBPROTOCOL = "cnc-binary.v1"
+SCHEMA_VERSION = 1
+FRAME_STATE = 1
+UNKNOWN_ENUM = 255
+
+HEADER = struct.Struct("<BBHIq")
+
+# Field type -> struct code
+TYPE_CODES = {"bool": "B", "enum": "B", "u8": "B", "u16": "H", "u32": "I", "i32": "i", "f32": "f"}
+
+ENUMS = {"execution": EXECUTIONS, "cyclePhase": PHASES}
+
+_AXES = ("X", "Y", "Z")
+
+# (name, type); dotted names are nested objects of the JSON state
+FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("power", "bool"),
+    ("execution", "enum"),
+    ("cyclePhase", "enum"),
+    ("alarmActive", "bool"),
+    ("alarmCode", "i32"),
+    ("warningCount", "u8"),
+    ("spindleSpeed", "f32"),
+    ("spindleLoad", "f32"),
+    ("spindleTemp", "f32"),
+    ("spindleHours", "f32"),
+    ("spindleOrientation", "f32"),
+    ("feedRate", "f32"),
+    ("rapidRate", "f32"),
+    *((f"{group}.{axis}", "f32")
+      for group in ("axisPositions", "servoLoad", "servoFollowingError", "servoTemp") for axis in _AXES),
+    ("partCount", "u32"),
+    ("totalCycles", "u32"),
+    ("machineOnHours", "f32"),
+    ("productionRate", "f32"),
+    ("batteryVoltage", "f32"),
+    ("temperature", "f32"),
+    ("vibration", "f32"),
+    ("currentAmps", "f32"),
+    ("oilPressure", "f32"),
+    ("oilLevel", "f32"),
+    ("currentTool", "u16"),
+    ("toolChangeCount", "u32"),
+    ("toolWear", "f32"),
+    *((f"coolant.{name}", "f32") for name in ("level", "pressure", "temperature", "flow")),
+    ("tonnage", "f32"),
+    ("maxTonnage", "f32"),
+    ("ramPosition", "f32"),
+    ("backGauge", "f32"),
+    ("bendAngle", "f32"),
+    ("laserPower", "f32"),
+    ("maxLaserPower", "f32"),
+    ("gasPressure", "f32"),
+    ("resonatorTemp", "f32"),
+    ("cutSpeed", "f32"),
+)
+
+RECORD = struct.Struct("<H" + "".join(TYPE_CODES[kind] for _, kind in FIELDS))
+
+
+def _getter(name: str, kind: str) -> Callable[[Dict[str, Any]], Any]:
+    """Reads one field's value, ready for struct.pack, off a machine's JSON state"""
+    missing = math.nan if kind == "f32" else 0
+    if name == "alarmActive":
+        return lambda data: data.get("alarm") is not None
+    if name == "alarmCode":
+        return lambda data: -1 if data.get("alarmCode") is None else data["alarmCode"]
+    if name == "warningCount":
+        return lambda data: min(len(data.get("warnings") or ()), 255)
+    if kind == "enum":
+        codes = {value: code for code, value in enumerate(ENUMS[name])}
+        return lambda data: codes.get(data.get(name), UNKNOWN_ENUM)
+    if "." in name:
+        group, key = name.split(".")
+
+        def nested(data: Dict[str, Any]) -> Any:
+            values = data.get(group)
+            value = values.get(key) if values else None
+            return missing if value is None else value
+        return nested
+
+    def plain(data: Dict[str, Any]) -> Any:
+        value = data.get(name)
+        return missing if value is None else value
+    return plain
+
+
+_GETTERS = tuple(_getter(name, kind) for name, kind in FIELDS)
+
+
+def _timestamp_ms(data: Dict[str, Any]) -> int:
+    stamp = data.get("timestamp")
+    if not stamp:
+        return 0
+    moment = datetime.fromisoformat(stamp.rstrip("Z"))
+    return int((moment - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+class BinaryEncoder:
+    """Encodes published ticks for binary clients, once per tick version"""
+
+    def __init__(self, machine_ids: Sequence[str]):
+        self.machine_ids = list(machine_ids)
+        self._index = {machine_id: i for i, machine_id in enumerate(self.machine_ids)}
+        self._frame: Optional[bytes] = None
+        self._frame_version = -1
+
+    def schema(self) -> Dict[str, Any]:
+        """The {"type": "schema"} message a client needs to decode frames"""
+        return {
+            "type": "schema",
+            "version": SCHEMA_VERSION,
+            "header": {"format": HEADER.format, "size": HEADER.size,
+                       "fields": ["frameType", "schemaVersion", "count", "version", "timestamp"]},
+            "record": {"format": RECORD.format, "size": RECORD.size},
+            "machines": self.machine_ids,
+            "fields": [{"id": k, "name": name, "type": kind} for k, (name, kind) in enumerate(FIELDS)],
+            "enums": {name: list(values) for name, values in ENUMS.items()},
+        }
+
+    def frame(self, version: int, machines: Dict[str, Dict[str, Any]]) -> bytes:
+        if self._frame_version != version:
+            self._frame = self.encode(version, machines)
+            self._frame_version = version
+        return self._frame
+
+    def encode(self, version: int, machines: Dict[str, Dict[str, Any]]) -> bytes:
+        index = self._index
+        records = [(index[machine_id], data) for machine_id, data in machines.items() if machine_id in index]
+        timestamp = _timestamp_ms(records[0][1]) if records else 0
+        buffer = bytearray(HEADER.size + RECORD.size * len(records))
+        HEADER.pack_into(buffer, 0, FRAME_STATE, SCHEMA_VERSION, len(records), version & 0xFFFFFFFF, timestamp)
+        pack_into = RECORD.pack_into
+        getters = _GETTERS
+        offset = HEADER.size
+        for i, data in records:
+            pack_into(buffer, offset, i, *[get(data) for get in getters])
+            offset += RECORD.size
+        return bytes(buffer)
+
+
+# ========================================
+# REFERENCE DECODER
+# ========================================
+
+class BinaryDecoder:
+    """Turns frames back into JSON-like state, from the schema message alone"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        if schema.get("version") != SCHEMA_VERSION:
+            raise ValueError(f"unsupported schema version {schema.get('version')!r}")
+        self.header = struct.Struct(schema["header"]["format"])
+        self.record = struct.Struct(schema["record"]["format"])
+        self.machines: List[str] = schema["machines"]
+        self.fields = [(field["name"], field["type"]) for field in schema["fields"]]
+        self.enums: Dict[str, List[str]] = schema["enums"]
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        """{"version", "timestamp" (epoch ms), "machines": {id: {field: value}}}"""
+        frame_type, schema_version, count, version, timestamp = self.header.unpack_from(frame, 0)
+        if frame_type != FRAME_STATE or schema_version != SCHEMA_VERSION:
+            raise ValueError(f"unexpected frame type {frame_type} / schema version {schema_version}")
+        machines: Dict[str, Dict[str, Any]] = {}
+        for values in self.record.iter_unpack(memoryview(frame)[self.header.size:]):
+            state: Dict[str, Any] = {}
+            for (name, kind), value in zip(self.fields, values[1:]):
+                if kind == "bool":
+                    value = bool(value)
+                elif kind == "enum":
+                    table = self.enums[name]
+                    value = table[value] if value < len(table) else None
+                if "." in name:
+                    group, key = name.split(".")
+                    state.setdefault(group, {})[key] = value
+                else:
+                    state[name] = value
+            machines[self.machines[values[0]]] = state
+        return {"version": version, "timestamp": timestamp, "machines": machines}
+
+
+# ========================================
+# SIMPLE LOCAL BENCHMARK
+# ========================================
+
+if __name__ == "__main__":
+    import json
+    import sys
+    import time
+
+    import snapshot_cache
+    from haas_machine import create_fleet_machines
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = 20
+
+    fleet = create_fleet_machines(copies, fleet_seed=1)
+    for _ in range(60):
+        for machine in fleet.values():
+            machine.update(1.0)
+    dicts = {machine_id: machine.to_dict() for machine_id, machine in fleet.items()}
+    encoder = BinaryEncoder(list(dicts))
+    decoder = BinaryDecoder(json.loads(json.dumps(encoder.schema())))
+
+    def timed(fn: Callable[[], Any]) -> Tuple[float, Any]:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            result = fn()
+        return (time.perf_counter() - started) * 1000.0 / rounds, result
+
+    json_ms, json_frame = timed(lambda: json.dumps(dicts, separators=(",", ":")).encode())
+    binary_ms, binary_frame = timed(lambda: encoder.encode(1, dicts))
+    json_decode_ms, _ = timed(lambda: json.loads(json_frame))
+    decode_ms, decoded = timed(lambda: decoder.decode(binary_frame))
+
+    sample_id = next(iter(dicts))
+    original, roundtrip = dicts[sample_id], decoded["machines"][sample_id]
+    assert roundtrip["execution"] == original["execution"]
+    assert abs(roundtrip["spindleLoad"] - original["spindleLoad"]) < 1e-3
+
+    print(f"{len(dicts)} machines, one tick")
+    print(f"  JSON (json module):  {len(json_frame):>10,} bytes  encode {json_ms:7.2f} ms  decode {json_decode_ms:7.2f} ms")
+    if snapshot_cache.orjson is not None:
+        orjson_ms, orjson_frame = timed(lambda: snapshot_cache.orjson.dumps(dicts))
+        orjson_decode_ms, _ = timed(lambda: snapshot_cache.orjson.loads(orjson_frame))
+        print(f"  JSON (orjson):       {len(orjson_frame):>10,} bytes  encode {orjson_ms:7.2f} ms  "
+              f"decode {orjson_decode_ms:7.2f} ms")
+    print(f"  binary:              {len(binary_frame):>10,} bytes  encode {binary_ms:7.2f} ms  "
+          f"decode {decode_ms:7.2f} ms (reference decoder)")
+    print(f"  record: {RECORD.size} bytes per machine, {len(FIELDS)} fields")
@@ -0,0 +1,234 @@
+"""
+Outbound WebSocket queues
+The tick loop never awaits a client. Each connection gets a sender task
+and a bounded queue: control messages (schema, acks, baselines) in order,
+and one slot for the latest state frame - a newer frame replaces one that
+is still waiting, so a slow client skips ticks instead of falling further
+behind. Sends time out, and a client that has not taken a frame for too
+long while newer ones pile up is disconnected, so one bad link cannot hold
+up the others.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple, Union
+
+Payload = Union[str, bytes]
+# (version the client last received or None) -> (catch-up message, its version)
+Resync = Callable[[Optional[int]], Tuple[Payload, int]]
+
+# Close code for clients dropped for being too slow ("try again later")
+CLOSE_TOO_SLOW = 1013
+
+
+class ClientQueue:
+    """One connection's outbound messages and its sender task.
+
+    resync: for clients that can't skip a frame (deltas), builds the message
+    that replaces the skipped ones, at send time, from the version of the
+    last frame the client received.
+    """
+
+    def __init__(
+        self,
+        websocket: Any,
+        kind: str,
+        send_timeout: float,
+        max_behind_seconds: float,
+        max_control: int = 64,
+        resync: Optional[Resync] = None,
+    ):
+        self.websocket = websocket
+        self.kind = kind
+        self.send_timeout = send_timeout
+        self.max_behind_seconds = max_behind_seconds
+        self.max_control = max_control
+        self.resync = resync
+        self.connected_at = time.time()
+
+        self._control: Deque[Payload] = deque()
+        self._state: Optional[Payload] = None
+        self._state_version: Optional[int] = None
+        self._catch_up = False    # _state was replaced: send resync(sent_version) instead
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closing: Optional[str] = None   # why the client is being dropped
+
+        self.sent = 0
+        self.dropped = 0        # state frames replaced before they were sent
+        self.resyncs = 0
+        self.timeouts = 0
+        self.lag = 0            # state frames queued or skipped since the last one sent
+        self.max_lag = 0
+        self.sent_version: Optional[int] = None   # version of the last state frame sent
+        self._waiting_since = 0.0   # when the state slot was last filled while empty
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    # ========================================
+    # QUEUEING (never blocks)
+    # ========================================
+
+    def send(self, payload: Payload) -> None:
+        """Queue a message that must arrive, in order, before any later state frame"""
+        if self.closing:
+            return
+        if len(self._control) >= self.max_control:
+            self._give_up("control queue full")
+            return
+        self._control.append(payload)
+        self._wake.set()
+
+    def offer(self, payload: Payload, version: Optional[int] = None) -> None:
+        """Queue the latest state frame (of tick `version`), replacing a waiting one"""
+        if self.closing:
+            return
+        if self._state is None:
+            self._waiting_since = time.monotonic()
+        else:
+            self.dropped += 1
+            if time.monotonic() - self._waiting_since > self.max_behind_seconds:
+                self._give_up(f"no frame taken for more than {self.max_behind_seconds:g}s")
+                return
+            self._catch_up = self.resync is not None
+        self._state = payload
+        self._state_version = version
+        self.lag += 1
+        self.max_lag = max(self.max_lag, self.lag)
+        self._wake.set()
+
+    def replace_state(self, payload: Optional[Payload] = None, version: Optional[int] = None) -> None:
+        """Discard the waiting state frame (the client switched formats); queue payload instead"""
+        self._state = payload
+        self._state_version = version
+        self._catch_up = False
+        self._waiting_since = time.monotonic()
+        self.lag = 1 if payload is not None else 0
+        if payload is not None:
+            self._wake.set()
+
+    def _give_up(self, reason: str) -> None:
+        self.closing = reason
+        self._control.clear()
+        self._state = None
+        self._wake.set()
+
+    # ========================================
+    # SENDER TASK
+    # ========================================
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                while not self.closing and (self._control or self._state is not None):
+                    is_state = not self._control
+                    if not is_state:
+                        payload = self._control.popleft()
+                    elif self._catch_up:
+                        self.resyncs += 1
+                        payload, version = self.resync(self.sent_version)
+                    else:
+                        payload, version = self._state, self._state_version
+                    if is_state:
+                        self._state = None
+                        self._catch_up = False
+                        self.lag = 0
+                    try:
+                        await asyncio.wait_for(self._send(payload), self.send_timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        self._give_up(f"send timed out after {self.send_timeout:g}s")
+                        break
+                    self.sent += 1
+                    if is_state:
+                        self.sent_version = version
+                if self.closing:
+                    await asyncio.wait_for(
+                        self.websocket.close(code=CLOSE_TOO_SLOW, reason=self.closing[:120]), self.send_timeout
+                    )
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection gone; the endpoint notices and unregisters the client
+            return
+
+    def _send(self, payload: Payload):
+        if isinstance(payload, bytes):
+            return self.websocket.send_bytes(payload)
+        return self.websocket.send_text(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        client = getattr(self.websocket, "client", None)
+        return {
+            'kind': self.kind,
+            'remote': f"{client.host}:{client.port}" if client else None,
+            'connected_seconds': round(time.time() - self.connected_at, 1),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'resyncs': self.resyncs,
+            'timeouts': self.timeouts,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'behind_seconds': round(time.monotonic() - self._waiting_since, 1) if self._state is not None else 0.0,
+            'sent_version': self.sent_version,
+            'queued_control': len(self._control),
+            'closing': self.closing,
+        }
+
+
+class ClientRegistry:
+    """The ClientQueue of every connected WebSocket"""
+
+    def __init__(self, send_timeout: float = 5.0, max_behind_seconds: float = 30.0, max_control: int = 64):
+        self.send_timeout = send_timeout
+        self.max_behind_seconds = max_behind_seconds
+        self.max_control = max_control
+        self._queues: Dict[Any, ClientQueue] = {}
+        self.disconnected_slow = 0
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def __getitem__(self, websocket: Any) -> ClientQueue:
+        return self._queues[websocket]
+
+    def add(self, websocket: Any, kind: str, resync: Optional[Resync] = None) -> ClientQueue:
+        queue = ClientQueue(websocket, kind, self.send_timeout, self.max_behind_seconds, self.max_control, resync)
+        self._queues[websocket] = queue
+        queue.start()
+        return queue
+
+    def remove(self, websocket: Any) -> None:
+        queue = self._queues.pop(websocket, None)
+        if queue is not None:
+            queue.stop()
+            if queue.closing:
+                self.disconnected_slow += 1
+
+    def offer(self, recipients: Iterable[Any], payload: Payload, version: Optional[int] = None) -> None:
+        """Queue one state frame for every client in recipients"""
+        queues = self._queues
+        for websocket in recipients:
+            queue = queues.get(websocket)
+            if queue is not None:
+                queue.offer(payload, version)
+
+    def stats(self) -> Dict[str, Any]:
+        clients = [queue.stats() for queue in self._queues.values()]
+        return {
+            'send_timeout_seconds': self.send_timeout,
+            'max_behind_seconds': self.max_behind_seconds,
+            'connected': len(clients),
+            'disconnected_slow': self.disconnected_slow,
+            'dropped': sum(client['dropped'] for client in clients),
+            'clients': clients,
+        }
@@ -0,0 +1,321 @@
+"""
+Incrementally maintained daily_summaries
+Every writer flush folds its samples into one row per (date, machine).
+State minutes are time-weighted by the real gap between consecutive
+samples of a machine (sample-and-hold: a state lasts until the next
+sample), so 1 s, 5 s or irregular sampling all report the same minutes.
+A day is frozen (finalized = 1) once that machine has reported a sample
+on a later day; reports then read the row as-is.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sample_writer import SAMPLE_COLUMNS
+
+
+DAY_MS = 86400 * 1000
+
+# Gaps longer than this (server down, machine unplugged) are not credited
+# to any state
+MAX_SAMPLE_GAP_MS = 60 * 1000
+
+# Rows scanned per writer step when building summaries for old samples
+BACKFILL_CHUNK_ROWS = 20000
+
+# Columns added to the original daily_summaries schema
+EXTRA_COLUMNS = (
+    ("machine_name", "TEXT"),
+    ("sample_count", "INTEGER"),
+    ("min_part_count", "INTEGER"),
+    ("max_part_count", "INTEGER"),
+    ("min_total_cycles", "INTEGER"),
+    ("max_total_cycles", "INTEGER"),
+    ("sum_spindle_load", "REAL"),
+    ("sum_spindle_temp", "REAL"),
+    ("sum_production_rate", "REAL"),
+    ("total_stopped_minutes", "REAL"),
+    ("finalized", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+_STATE_COLUMN = {
+    'RUNNING': 'total_runtime_minutes',
+    'IDLE': 'total_idle_minutes',
+    'ALARM': 'total_alarm_minutes',
+    'STOPPED': 'total_stopped_minutes',
+}
+
+_TS = SAMPLE_COLUMNS.index('ts')
+_MACHINE = SAMPLE_COLUMNS.index('machine_id')
+_NAME = SAMPLE_COLUMNS.index('machine_name')
+_EXECUTION = SAMPLE_COLUMNS.index('execution')
+_LOAD = SAMPLE_COLUMNS.index('spindle_load')
+_TEMP = SAMPLE_COLUMNS.index('spindle_temp')
+_PARTS = SAMPLE_COLUMNS.index('part_count')
+_CYCLES = SAMPLE_COLUMNS.index('total_cycles')
+_RATE = SAMPLE_COLUMNS.index('production_rate')
+
+_UPSERT_SQL = """
+    INSERT INTO daily_summaries (
+        date, machine_id, machine_name, sample_count,
+        min_part_count, max_part_count, min_total_cycles, max_total_cycles,
+        sum_spindle_load, max_spindle_load, sum_spindle_temp, max_spindle_temp,
+        sum_production_rate,
+        total_runtime_minutes, total_idle_minutes, total_alarm_minutes, total_stopped_minutes,
+        alarm_count, finalized
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+    ON CONFLICT(date, machine_id) DO UPDATE SET
+        machine_name = COALESCE(excluded.machine_name, machine_name),
+        sample_count = COALESCE(sample_count, 0) + excluded.sample_count,
+        min_part_count = COALESCE(MIN(min_part_count, excluded.min_part_count), min_part_count, excluded.min_part_count),
+        max_part_count = COALESCE(MAX(max_part_count, excluded.max_part_count), max_part_count, excluded.max_part_count),
+        min_total_cycles = COALESCE(MIN(min_total_cycles, excluded.min_total_cycles), min_total_cycles, excluded.min_total_cycles),
+        max_total_cycles = COALESCE(MAX(max_total_cycles, excluded.max_total_cycles), max_total_cycles, excluded.max_total_cycles),
+        sum_spindle_load = COALESCE(sum_spindle_load, 0) + excluded.sum_spindle_load,
+        max_spindle_load = COALESCE(MAX(max_spindle_load, excluded.max_spindle_load), max_spindle_load, excluded.max_spindle_load),
+        sum_spindle_temp = COALESCE(sum_spindle_temp, 0) + excluded.sum_spindle_temp,
+        max_spindle_temp = COALESCE(MAX(max_spindle_temp, excluded.max_spindle_temp), max_spindle_temp, excluded.max_spindle_temp),
+        sum_production_rate = COALESCE(sum_production_rate, 0) + excluded.sum_production_rate,
+        total_runtime_minutes = COALESCE(total_runtime_minutes, 0) + excluded.total_runtime_minutes,
+        total_idle_minutes = COALESCE(total_idle_minutes, 0) + excluded.total_idle_minutes,
+        total_alarm_minutes = COALESCE(total_alarm_minutes, 0) + excluded.total_alarm_minutes,
+        total_stopped_minutes = COALESCE(total_stopped_minutes, 0) + excluded.total_stopped_minutes,
+        alarm_count = COALESCE(alarm_count, 0) + excluded.alarm_count
+"""
+
+# Live samples must not reopen a frozen day; the backfill of old samples may
+_LIVE_UPSERT_SQL = _UPSERT_SQL + "    WHERE daily_summaries.finalized = 0\n"
+
+_DERIVED_SQL = """
+    UPDATE daily_summaries SET
+        total_parts = max_part_count - min_part_count,
+        total_cycles = max_total_cycles - min_total_cycles,
+        avg_spindle_load = sum_spindle_load / sample_count,
+        avg_spindle_temp = sum_spindle_temp / sample_count,
+        avg_production_rate = sum_production_rate / sample_count
+    WHERE date = ? AND machine_id = ? AND sample_count > 0
+"""
+
+_FINALIZE_SQL = "UPDATE daily_summaries SET finalized = 1 WHERE date = ? AND machine_id = ?"
+
+
+def ensure_columns(c: sqlite3.Cursor) -> None:
+    """Add the incremental-maintenance columns to an existing table"""
+    existing = {row[1] for row in c.execute("PRAGMA table_info(daily_summaries)")}
+    for name, decl in EXTRA_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE daily_summaries ADD COLUMN {name} {decl}")
+
+
+_day_names: Dict[int, str] = {}
+
+
+def day_of(ts_ms: int) -> str:
+    day = ts_ms // DAY_MS
+    name = _day_names.get(day)
+    if name is None:
+        name = _day_names[day] = datetime.utcfromtimestamp(day * 86400).strftime('%Y-%m-%d')
+    return name
+
+
+class _DayAcc:
+    __slots__ = (
+        'name', 'samples', 'min_parts', 'max_parts', 'min_cycles', 'max_cycles',
+        'sum_load', 'max_load', 'sum_temp', 'max_temp', 'sum_rate', 'minutes', 'alarms',
+    )
+
+    def __init__(self) -> None:
+        self.name: Optional[str] = None
+        self.samples = 0
+        self.min_parts = self.max_parts = None
+        self.min_cycles = self.max_cycles = None
+        self.sum_load = self.sum_temp = self.sum_rate = 0.0
+        self.max_load = self.max_temp = None
+        self.minutes = {column: 0.0 for column in _STATE_COLUMN.values()}
+        self.alarms = 0
+
+    def add_sample(self, row: Tuple) -> None:
+        self.name = row[_NAME] or self.name
+        self.samples += 1
+        parts, cycles = row[_PARTS] or 0, row[_CYCLES] or 0
+        load, temp = row[_LOAD] or 0.0, row[_TEMP] or 0.0
+        self.min_parts = parts if self.min_parts is None else min(self.min_parts, parts)
+        self.max_parts = parts if self.max_parts is None else max(self.max_parts, parts)
+        self.min_cycles = cycles if self.min_cycles is None else min(self.min_cycles, cycles)
+        self.max_cycles = cycles if self.max_cycles is None else max(self.max_cycles, cycles)
+        self.sum_load += load
+        self.sum_temp += temp
+        self.sum_rate += row[_RATE] or 0
+        self.max_load = load if self.max_load is None else max(self.max_load, load)
+        self.max_temp = temp if self.max_temp is None else max(self.max_temp, temp)
+
+    def params(self, date: str, machine_id: str) -> Tuple:
+        return (
+            date, machine_id, self.name, self.samples,
+            self.min_parts, self.max_parts, self.min_cycles, self.max_cycles,
+            self.sum_load, self.max_load, self.sum_temp, self.max_temp,
+            self.sum_rate,
+            self.minutes['total_runtime_minutes'], self.minutes['total_idle_minutes'],
+            self.minutes['total_alarm_minutes'], self.minutes['total_stopped_minutes'],
+            self.alarms,
+        )
+
+
+class DailySummaryAggregator:
+    """Writer flush hook that keeps daily_summaries current.
+
+    Remembers the last (ts, execution) per machine so the time between
+    two samples can be credited to a state; after a restart that is
+    primed from the newest sample already in the database.
+    """
+
+    def __init__(self, max_gap_ms: int = MAX_SAMPLE_GAP_MS):
+        self.max_gap_ms = max_gap_ms
+        self._last: Dict[str, Tuple[int, str]] = {}
+        self._backfill_last: Dict[str, Tuple[int, str]] = {}
+        self._backfill_upto: Optional[int] = None
+        self._backfill_after: Tuple[int, int] = (-1, -1)
+
+    # ========================================
+    # LIVE (FLUSH HOOK)
+    # ========================================
+
+    def __call__(self, conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+        rows = sorted(rows, key=lambda r: (r[_MACHINE], r[_TS]))
+        for machine_id in {row[_MACHINE] for row in rows}:
+            if machine_id not in self._last:
+                first_ts = min(row[_TS] for row in rows if row[_MACHINE] == machine_id)
+                prev = conn.execute(
+                    "SELECT ts, execution FROM machine_samples WHERE machine_id = ? AND ts < ? "
+                    "ORDER BY ts DESC LIMIT 1",
+                    (machine_id, first_ts),
+                ).fetchone()
+                if prev is not None:
+                    self._last[machine_id] = (prev[0], prev[1])
+        self._apply(conn, rows, self._last, _LIVE_UPSERT_SQL)
+
+    # ========================================
+    # BACKFILL (WRITER TASK)
+    # ========================================
+
+    def start_backfill(self, upto_id: int) -> None:
+        """Summarize samples with id <= upto_id (rows written before this table was maintained)"""
+        self._backfill_upto = upto_id
+        self._backfill_after = (-1, -1)
+
+    def backfill_step(self, conn: sqlite3.Connection) -> bool:
+        if self._backfill_upto is None:
+            return False
+        cur = conn.execute(
+            f"SELECT id, {', '.join(SAMPLE_COLUMNS)} FROM machine_samples "
+            "WHERE id <= ? AND (ts, id) > (?, ?) ORDER BY ts, id LIMIT ?",
+            (self._backfill_upto, *self._backfill_after, BACKFILL_CHUNK_ROWS),
+        )
+        chunk = cur.fetchall()
+        if not chunk:
+            self._backfill_upto = None
+            print("✅ daily_summaries backfill complete")
+            return False
+        self._backfill_after = (chunk[-1][1], chunk[-1][0])
+        with conn:
+            self.backfill_rows(conn, [row[1:] for row in chunk])
+        return True
+
+    def backfill_rows(self, conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+        """Fold historical rows (in ts order) that never went through the live hook"""
+        rows = sorted(rows, key=lambda r: (r[_MACHINE], r[_TS]))
+        self._apply(conn, rows, self._backfill_last, _UPSERT_SQL)
+
+    # ========================================
+    # AGGREGATION
+    # ========================================
+
+    def _apply(
+        self,
+        conn: sqlite3.Connection,
+        rows: List[Tuple],
+        last: Dict[str, Tuple[int, str]],
+        upsert_sql: str,
+    ) -> None:
+        """Fold rows (sorted by machine, ts) into daily_summaries"""
+        acc: Dict[Tuple[str, str], _DayAcc] = {}
+        finalize: Set[Tuple[str, str]] = set()
+
+        def day_acc(date: str, machine_id: str) -> _DayAcc:
+            key = (date, machine_id)
+            entry = acc.get(key)
+            if entry is None:
+                entry = acc[key] = _DayAcc()
+            return entry
+
+        for row in rows:
+            machine_id, ts, execution = row[_MACHINE], row[_TS], row[_EXECUTION]
+            date = day_of(ts)
+
+            prev = last.get(machine_id)
+            if prev is not None and ts >= prev[0]:
+                prev_ts, prev_execution = prev
+                gap = ts - prev_ts
+                column = _STATE_COLUMN.get(prev_execution)
+                if column is not None and gap <= self.max_gap_ms:
+                    # Split the interval at midnight(s)
+                    start = prev_ts
+                    while start // DAY_MS < ts // DAY_MS:
+                        boundary = (start // DAY_MS + 1) * DAY_MS
+                        day_acc(day_of(start), machine_id).minutes[column] += (boundary - start) / 60000.0
+                        start = boundary
+                    day_acc(date, machine_id).minutes[column] += (ts - start) / 60000.0
+                if execution == 'ALARM' and prev_execution != 'ALARM':
+                    day_acc(date, machine_id).alarms += 1
+                if prev_ts // DAY_MS < ts // DAY_MS:
+                    finalize.add((day_of(prev_ts), machine_id))
+
+            day_acc(date, machine_id).add_sample(row)
+            if prev is None or ts >= prev[0]:
+                last[machine_id] = (ts, execution)
+
+        conn.executemany(upsert_sql, [entry.params(*key) for key, entry in acc.items()])
+        conn.executemany(_DERIVED_SQL, list(acc.keys()))
+        conn.executemany(_FINALIZE_SQL, list(finalize))
+
+
+# ========================================
+# QUERIES
+# ========================================
+
+def get_daily_summaries(conn: sqlite3.Connection, date: str) -> List[Dict]:
+    """Report rows for one day, read straight from daily_summaries"""
+    rows = conn.execute("""
+        SELECT * FROM daily_summaries
+        WHERE date = ? AND sample_count > 0
+        ORDER BY machine_id
+    """, (date,)).fetchall()
+
+    summaries = []
+    for row in rows:
+        runtime = row['total_runtime_minutes'] or 0
+        tracked = (
+            runtime + (row['total_idle_minutes'] or 0)
+            + (row['total_alarm_minutes'] or 0) + (row['total_stopped_minutes'] or 0)
+        )
+        summaries.append({
+            'date': row['date'],
+            'machine_id': row['machine_id'],
+            'machine_name': row['machine_name'],
+            'total_parts': row['total_parts'] or 0,
+            'total_cycles': row['total_cycles'] or 0,
+            'avg_spindle_load': round(row['avg_spindle_load'] or 0, 2),
+            'max_spindle_load': round(row['max_spindle_load'] or 0, 2),
+            'avg_spindle_temp': round(row['avg_spindle_temp'] or 0, 2),
+            'max_spindle_temp': round(row['max_spindle_temp'] or 0, 2),
+            'runtime_minutes': round(runtime, 2),
+            'idle_minutes': round(row['total_idle_minutes'] or 0, 2),
+            'alarm_minutes': round(row['total_alarm_minutes'] or 0, 2),
+            'stopped_minutes': round(row['total_stopped_minutes'] or 0, 2),
+            'alarm_count': row['alarm_count'] or 0,
+            'avg_production_rate': round(row['avg_production_rate'] or 0, 2),
+            'utilization_percent': round((runtime / tracked) * 100, 2) if tracked else 0.0,
+            'finalized': bool(row['finalized']),
+        })
+    return summaries
@@ -0,0 +1,120 @@
+"""
+Delta snapshots
+Every published tick gets a version; per machine and top-level field the
+tracker remembers the version it last changed in. A client that holds the
+state of some version only needs the fields changed since - usually the
+live sensor values, not specs, tools or alarm history.
+
+Changes are found where the state lives (HaasMachine.to_delta,
+FleetSimulator.changes, the shard workers), so a tick never builds or
+compares the fields that did not change.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+
+class _Dropped:
+    """A field the machine no longer has; sent to clients as null"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "DROPPED"
+
+    def __reduce__(self) -> str:
+        return "DROPPED"   # unpickles as this module's singleton (shard workers)
+
+
+DROPPED = _Dropped()
+
+
+def merge_fields(state: Optional[Dict[str, Any]], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """A new dict: state with the changed fields applied (DROPPED removes a field)"""
+    merged = dict(state) if state else {}
+    for key, value in fields.items():
+        if value is DROPPED:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+class DeltaTracker:
+    """Versioned, field-level change tracking over published fleet snapshots.
+
+    publish() is given only what changed, with fresh values: a dict or list
+    that is edited in place after being published is not seen as changed.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._changed: Dict[str, Dict[str, int]] = {}   # machine -> field -> version
+        self._machine_version: Dict[str, int] = {}
+        self._last_delta: Dict[str, Dict[str, Any]] = {}
+
+    def publish(self, changes: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Record the next tick from the fields that changed in it, per machine (a
+        machine's first entry holds all its fields); returns the delta for clients"""
+        self.version += 1
+        version = self.version
+        # A new outer dict per tick: the previous snapshot stays as published
+        state = dict(self._state)
+        delta: Dict[str, Dict[str, Any]] = {}
+        for machine_id, fields in changes.items():
+            if not fields:
+                continue
+            state[machine_id] = merge_fields(state.get(machine_id), fields)
+            changed = self._changed.setdefault(machine_id, {})
+            for key in fields:
+                changed[key] = version
+            self._machine_version[machine_id] = version
+            if any(value is DROPPED for value in fields.values()):
+                fields = {key: None if value is DROPPED else value for key, value in fields.items()}
+            delta[machine_id] = fields
+        self._state = state
+        self._last_delta = delta
+        return delta
+
+    def delta(self, since: int) -> Dict[str, Dict[str, Any]]:
+        """Fields changed after version `since`, for the machines that have any"""
+        if since == self.version - 1:
+            return self._last_delta
+        result: Dict[str, Dict[str, Any]] = {}
+        for machine_id, changed in self._changed.items():
+            if self._machine_version[machine_id] <= since:
+                continue
+            state = self._state[machine_id]
+            result[machine_id] = {key: state.get(key) for key, at in changed.items() if at > since}
+        return result
+
+    def machine_delta(self, machine_id: str, since: int) -> Dict[str, Any]:
+        state = self._state.get(machine_id, {})
+        changed = self._changed.get(machine_id, {})
+        return {key: state.get(key) for key, at in changed.items() if at > since}
+
+    def changed_since(self, since: int, machine_ids: Optional[Iterable[str]] = None,
+                      fields: Optional[Iterable[str]] = None) -> bool:
+        """Whether any of the fields (default: all) of the machines (default: all) changed after `since`"""
+        ids = self._machine_version.keys() if machine_ids is None else machine_ids
+        for machine_id in ids:
+            if self._machine_version.get(machine_id, 0) <= since:
+                continue
+            if fields is None:
+                return True
+            changed = self._changed[machine_id]
+            if any(changed.get(field, 0) > since for field in fields):
+                return True
+        return False
+
+    def machine_version(self, machine_id: str) -> int:
+        """Version in which the machine last changed (0: never published)"""
+        return self._machine_version.get(machine_id, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Full state as of `version`"""
+        return self._state
+
+    def can_answer(self, since: Optional[int]) -> bool:
+        """False when the client needs a full snapshot instead (no or foreign baseline)"""
+        return since is not None and 0 < since <= self.version
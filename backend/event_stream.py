@@ -0,0 +1,100 @@
+"""
+Server-Sent Events
+/api/stream pushes the same messages as /ws over one long-lived HTTP
+response, for viewers behind proxies that break WebSockets. Every tick's
+delta is formatted as an SSE event once and kept in a short replay buffer;
+all stream readers share it, each only remembering the id of the last
+event it sent. A client reconnecting with Last-Event-ID (browsers send it
+by themselves) gets the events it missed from the buffer, or a new
+snapshot when it fell out of it.
+
+Event ids are "<run>-<version>": versions start over when the server
+restarts, so an id from an earlier run must not pass for a current one.
+
+A client that accepts gzip gets its stream compressed, each event flushed
+on its own so nothing waits in the compressor.
+"""
+
+import asyncio
+import zlib
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# Tells EventSource to reconnect after 1 s
+RETRY = b"retry: 1000\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+def format_event(run: str, event_id: int, data: bytes) -> bytes:
+    """One SSE event; data must be a single line (compact JSON is)"""
+    return b"id: %s-%d\ndata: %s\n\n" % (run.encode(), event_id, data)
+
+
+def parse_last_event_id(value: Optional[str], run: str) -> Optional[int]:
+    """The Last-Event-ID header as a version, None when absent or not from this run"""
+    if not value:
+        return None
+    prefix, _, version = value.partition("-")
+    if prefix != run:
+        return None
+    try:
+        return int(version)
+    except ValueError:
+        return None
+
+
+class EventStream:
+    """The last max_events events of a run, by consecutive id, and a wake-up for their readers"""
+
+    def __init__(self, max_events: int, run: str):
+        self.run = run
+        self.events: Deque[Tuple[int, bytes]] = deque(maxlen=max_events)
+        self.last_id = 0
+        self._published: Optional[asyncio.Event] = None
+
+    def publish(self, event_id: int, data: bytes) -> bytes:
+        """Add the next event (event_id: last_id + 1) and wake the readers"""
+        if self.events and event_id != self.last_id + 1:
+            self.events.clear()   # a gap can't be replayed across
+        event = format_event(self.run, event_id, data)
+        self.events.append((event_id, event))
+        self.last_id = event_id
+        if self._published is not None:
+            self._published.set()
+            self._published = None
+        return event
+
+    def since(self, last_id: Optional[int]) -> Optional[List[bytes]]:
+        """Events after last_id, or None when the buffer doesn't reach back that far
+        (or last_id is ahead of it) and the reader needs a snapshot; ids from
+        another run are already None from parse_last_event_id"""
+        if last_id is None or last_id > self.last_id or not self.events:
+            return None
+        if last_id == self.last_id:
+            return []
+        first_id = self.events[0][0]
+        if last_id < first_id - 1:
+            return None
+        return [event for event_id, event in self.events if event_id > last_id]
+
+    async def wait(self, last_id: int, timeout: float) -> bool:
+        """Wait until an event after last_id is published; False on timeout"""
+        if self.last_id > last_id:
+            return True
+        if self._published is None:
+            self._published = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._published.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class GzipStream:
+    """One response's gzip stream; every chunk is flushed so it can be decoded at once"""
+
+    def __init__(self, level: int = 6):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def encode(self, chunk: bytes) -> bytes:
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
@@ -0,0 +1,180 @@
+"""
+Bulk sample export
+Rows are read from one cursor in fixed-size batches and encoded as they
+arrive, so exports of any size run in constant memory:
+
+- csv: gzip-compressed CSV, compressed batch by batch and streamed out
+- npz: NumPy columnar archive, one .npy array per column. Columns are
+  spooled to anonymous temp files while reading (the .npy header needs the
+  row count), then zipped out column by column. Text columns are stored
+  as int32 codes plus a `<column>_categories` string array (-1 = NULL).
+"""
+
+import csv
+import io
+import tempfile
+import zipfile
+import zlib
+from typing import IO, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from sample_writer import SAMPLE_COLUMNS
+
+
+# Always exported first: rows are ordered and keyed by them
+KEY_COLUMNS = ("ts", "machine_id")
+
+_INT_COLUMNS = {"id", "ts", "part_count", "total_cycles", "production_rate"}
+_TEXT_COLUMNS = {"machine_id", "machine_name", "execution", "cycle_phase", "alarm", "warnings"}
+
+_COPY_CHUNK_BYTES = 1 << 20
+
+
+def parse_columns(spec: Optional[str]) -> List[str]:
+    """Comma separated column list -> export columns (keys first, all when empty)"""
+    if not spec:
+        return list(SAMPLE_COLUMNS)
+    requested = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in SAMPLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return list(KEY_COLUMNS) + [name for name in dict.fromkeys(requested) if name not in KEY_COLUMNS]
+
+
+def open_export_cursor(
+    conn,
+    columns: Sequence[str],
+    machine_ids: Sequence[str],
+    since_ms: int,
+    until_ms: int,
+):
+    """Cursor over samples in [since_ms, until_ms), oldest first"""
+    where = ["ts >= ?", "ts < ?"]
+    params: List = [since_ms, until_ms]
+    if machine_ids:
+        where.insert(0, f"machine_id IN ({', '.join('?' for _ in machine_ids)})")
+        params[:0] = machine_ids
+    # Plain tuples: no sqlite3.Row objects for millions of rows
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(f"""
+        SELECT {', '.join(columns)} FROM machine_samples
+        WHERE {' AND '.join(where)}
+        ORDER BY ts ASC, id ASC
+    """, params)
+
+
+# ========================================
+# GZIP CSV
+# ========================================
+
+class CsvGzipEncoder:
+    """Turns row batches into consecutive pieces of one .csv.gz stream"""
+
+    def __init__(self, columns: Sequence[str], level: int = 6):
+        self.columns = list(columns)
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def header(self) -> bytes:
+        return self.encode([self.columns])
+
+    def encode(self, rows: Sequence[Sequence]) -> bytes:
+        text = io.StringIO()
+        csv.writer(text, lineterminator="\n").writerows(rows)
+        return self._zlib.compress(text.getvalue().encode("utf-8"))
+
+    def finish(self) -> bytes:
+        return self._zlib.flush()
+
+
+# ========================================
+# NUMPY .NPZ
+# ========================================
+
+class _ZipSink:
+    """Write-only stream zipfile writes into; written bytes are collected by take()"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class NpzColumnSpooler:
+    """Collects row batches column by column, then streams them as a .npz"""
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self.rows = 0
+        self._files: Dict[str, IO[bytes]] = {name: tempfile.TemporaryFile() for name in self.columns}
+        self._categories: Dict[str, Dict[str, int]] = {
+            name: {} for name in self.columns if name in _TEXT_COLUMNS
+        }
+
+    def dtype(self, column: str) -> np.dtype:
+        if column in _TEXT_COLUMNS:
+            return np.dtype("<i4")
+        if column in _INT_COLUMNS:
+            return np.dtype("<i8")
+        return np.dtype("<f8")
+
+    def add(self, rows: Sequence[Sequence]) -> None:
+        if not rows:
+            return
+        for index, column in enumerate(self.columns):
+            values = [row[index] for row in rows]
+            if column in _TEXT_COLUMNS:
+                codes = self._categories[column]
+                values = [-1 if v is None else codes.setdefault(v, len(codes)) for v in values]
+            elif column in _INT_COLUMNS:
+                values = [0 if v is None else v for v in values]
+            else:
+                values = [np.nan if v is None else v for v in values]
+            np.asarray(values, dtype=self.dtype(column)).tofile(self._files[column])
+        self.rows += len(rows)
+
+    def iter_npz(self) -> Iterator[bytes]:
+        """Yield the archive in pieces; temp files are closed as it goes"""
+        sink = _ZipSink()
+        try:
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for column in self.columns:
+                    spool = self._files[column]
+                    spool.seek(0)
+                    with archive.open(f"{column}.npy", "w", force_zip64=True) as entry:
+                        np.lib.format.write_array_header_1_0(entry, {
+                            "descr": np.lib.format.dtype_to_descr(self.dtype(column)),
+                            "fortran_order": False,
+                            "shape": (self.rows,),
+                        })
+                        while True:
+                            chunk = spool.read(_COPY_CHUNK_BYTES)
+                            if not chunk:
+                                break
+                            entry.write(chunk)
+                            yield sink.take()
+                    spool.close()
+                    yield sink.take()
+
+                for column, codes in self._categories.items():
+                    buffer = io.BytesIO()
+                    np.save(buffer, np.array(list(codes), dtype=str))
+                    archive.writestr(f"{column}_categories.npy", buffer.getvalue())
+            yield sink.take()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for spool in self._files.values():
+            spool.close()
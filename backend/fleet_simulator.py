@@ -0,0 +1,1182 @@
+"""
+Vectorized fleet simulator
+Same machine model as HaasMachine.update, but the whole fleet is stepped
+at once: every state field is one NumPy array (struct of arrays), phases
+and execution states are small int codes, and each machine type / cycle
+phase is a boolean mask. Per tick the cost is a few dozen array
+operations regardless of fleet size; Python only runs per machine for
+rare events (alarms) and when a to_dict() is requested. Alarm and warning
+rules (alarm_rules) are evaluated as one array predicate per rule.
+changes() finds each output field's changed rows with one array
+comparison and only builds values for those.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import alarm_rules
+from alarm_rules import Condition, Rule, RuleSet
+from deltas import DROPPED
+from haas_machine import HaasMachine, create_fleet_machines
+
+
+PHASES = ("IDLE", "SPINDLE_RAMP", "RAPID", "CUTTING", "RETRACT", "DWELL", "FINISH", "RUNNING")
+EXECUTIONS = ("IDLE", "RUNNING", "ALARM", "STOPPED")
+TYPES = ("CNC_MILL", "LATHE", "PRESS_BRAKE", "LASER")
+AXES = ("X", "Y", "Z")
+COOLANT_FIELDS = ("level", "pressure", "temperature", "flow")
+
+(P_IDLE, P_SPINDLE_RAMP, P_RAPID, P_CUTTING,
+ P_RETRACT, P_DWELL, P_FINISH, P_RUNNING) = range(len(PHASES))
+E_IDLE, E_RUNNING, E_ALARM, E_STOPPED = range(len(EXECUTIONS))
+T_MILL, T_LATHE, T_PRESS, T_LASER = range(len(TYPES))
+
+_PHASE_CODES = {name: code for code, name in enumerate(PHASES)}
+_EXECUTION_CODES = {name: code for code, name in enumerate(EXECUTIONS)}
+_TYPE_CODES = {name: code for code, name in enumerate(TYPES)}
+
+# splitmix64 constants (per-machine counter-based random streams)
+_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def uniform_draws(keys: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """Draw number `counters[i]` of stream `keys[i]`, uniform in [0, 1).
+
+    A pure function of (key, counter), so every machine's stream is
+    independent of which other machines are drawn alongside it.
+    """
+    z = keys + (counters + np.uint64(1)) * _GAMMA
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+_TOOL_STATIC_FIELDS = ("number", "type", "diameter", "length", "maxLife", "flutes", "coating", "description")
+
+
+class FleetSimulator:
+    """All machines of a fleet in NumPy arrays, stepped together.
+
+    Built from HaasMachine objects (their current state is copied in), so
+    both engines start from identical machines. Index i is the i-th
+    machine passed in; machine(i) / machines() give HaasMachine-like
+    views for the REST/WebSocket layer.
+
+    Each machine draws from its own stream, keyed by HaasMachine.seed
+    (fleet seed + machine id) and advanced by a per-machine counter: a
+    machine's trajectory is bit-identical whether it is stepped in this
+    fleet or in a smaller one, in any order. The stream is not
+    HaasMachine's random.Random and draws happen in another order, so the
+    same seed gives different trajectories than the objects engine.
+    """
+
+    def __init__(self, machines: Iterable[HaasMachine]):
+        source = list(machines)
+        n = len(source)
+        self.size = n
+        self.rng_key = np.array([m.seed for m in source], dtype=np.uint64)
+        self.rng_counter = np.zeros(n, dtype=np.uint64)
+        self.timestamp: datetime = max((m.timestamp for m in source), default=datetime.utcnow())
+
+        # === IDENTITY / SPECS (static) ===
+        self.ids = [m.id for m in source]
+        self.names = [m.name for m in source]
+        self.models = [m.model for m in source]
+        self.types = [m.type for m in source]
+        self.specs = [m.specs for m in source]
+        self.index = {machine_id: i for i, machine_id in enumerate(self.ids)}
+
+        self.type_code = np.array([_TYPE_CODES[t] for t in self.types], dtype=np.int8)
+        self.is_cnc = (self.type_code == T_MILL) | (self.type_code == T_LATHE)
+        self.is_press = self.type_code == T_PRESS
+        self.is_laser = self.type_code == T_LASER
+        self.axis_min = np.array([[s["axisLimits"][a][0] for a in AXES] for s in self.specs], dtype=np.float64).reshape(n, 3)
+        self.axis_max = np.array([[s["axisLimits"][a][1] for a in AXES] for s in self.specs], dtype=np.float64).reshape(n, 3)
+        self.max_rpm = np.array([s["maxRPM"] for s in self.specs], dtype=np.float64)
+        self.rapid_traverse = np.array([s["rapidTraverse"] for s in self.specs], dtype=np.float64)
+
+        def floats(attr: str) -> np.ndarray:
+            return np.array([getattr(m, attr) for m in source], dtype=np.float64)
+
+        def ints(attr: str) -> np.ndarray:
+            return np.array([getattr(m, attr) for m in source], dtype=np.int64)
+
+        def per_axis(attr: str) -> np.ndarray:
+            return np.array([[getattr(m, attr)[a] for a in AXES] for m in source], dtype=np.float64).reshape(n, 3)
+
+        # === CORE STATE ===
+        self.power = np.array([m.power for m in source], dtype=bool)
+        self.execution = np.array([_EXECUTION_CODES[m.execution] for m in source], dtype=np.int8)
+        self.phase = np.array([_PHASE_CODES[m.cyclePhase] for m in source], dtype=np.int8)
+        self.time_in_phase = floats("timeInPhase")
+        self.cycle_time_target = floats("cycleTimeTarget")
+
+        # === SPINDLE / MOTION ===
+        self.spindle_speed = floats("spindleSpeed")
+        self.target_spindle_speed = floats("targetSpindleSpeed")
+        self.spindle_load = floats("spindleLoad")
+        self.spindle_temp = floats("spindleTemp")
+        self.spindle_hours = floats("spindleHours")
+        self.spindle_orientation = floats("spindleOrientation")
+        self.feed_rate = floats("feedRate")
+        self.target_feed = floats("targetFeed")
+        self.rapid_rate = floats("rapidRate")
+        self.axis = per_axis("axisPositions")
+
+        # === SERVOS ===
+        self.servo_load = per_axis("servoLoad")
+        self.servo_following_error = per_axis("servoFollowingError")
+        self.servo_temp = per_axis("servoTemp")
+
+        # === PRODUCTION / HEALTH ===
+        self.part_count = ints("partCount")
+        self.total_cycles = ints("totalCycles")
+        self.machine_on_hours = floats("machineOnHours")
+        self.production_rate = ints("productionRate")
+        self.battery_voltage = floats("batteryVoltage")
+        self.temperature = floats("temperature")
+        self.vibration = floats("vibration")
+        self.current_amps = floats("currentAmps")
+        self.oil_pressure = floats("oilPressure")
+        self.oil_level = floats("oilLevel")
+
+        # === TOOLS / COOLANT (CNC and lathe) ===
+        self.current_tool = np.array([m.currentTool or 0 for m in source], dtype=np.int64)
+        self.tool_change_count = ints("toolChangeCount")
+        self.tool_wear = floats("toolWear")
+        self.has_coolant = np.array([m.coolant is not None for m in source], dtype=bool)
+        self.coolant = np.array(
+            [[m.coolant[f] if m.coolant is not None else 0.0 for f in COOLANT_FIELDS] for m in source],
+            dtype=np.float64,
+        ).reshape(n, 4)
+
+        # Every machine's tool table, concatenated; machine i owns
+        # tool_offset[i] : tool_offset[i] + tool_count[i]
+        tables = [m.tools.to_list() if m.tools is not None else [] for m in source]
+        self.has_tools = np.array([m.tools is not None for m in source], dtype=bool)
+        self.tool_count = np.array([len(t) for t in tables], dtype=np.int64)
+        self.tool_offset = np.concatenate(([0], np.cumsum(self.tool_count)[:-1])).astype(np.int64) if n else np.zeros(0, np.int64)
+        all_tools = [tool for table in tables for tool in table]
+        self.tool_static = [{k: tool[k] for k in _TOOL_STATIC_FIELDS} for tool in all_tools]
+        self.tool_life = np.array([tool["currentLife"] for tool in all_tools], dtype=np.float64)
+        self.tool_in_use = np.array([tool["inUse"] for tool in all_tools], dtype=bool)
+        self.tool_cuts = np.array([tool["totalCuts"] for tool in all_tools], dtype=np.int64)
+        self.tool_version = np.zeros(n, dtype=np.int64)   # bumped when a machine's tools are written
+
+        # === PRESS BRAKE ===
+        self.tonnage = floats("tonnage")
+        self.max_tonnage = floats("maxTonnage")
+        self.ram_position = floats("ramPosition")
+        self.back_gauge = floats("backGauge")
+        self.bend_angle = floats("bendAngle")
+
+        # === LASER ===
+        self.laser_power = floats("laserPower")
+        self.max_laser_power = floats("maxLaserPower")
+        self.gas_pressure = floats("gasPressure")
+        self.resonator_temp = floats("resonatorTemp")
+        self.cut_speed = floats("cutSpeed")
+
+        # Program number (0 = none), shown as "O1234"
+        self.program = np.array(
+            [int(m.programRunning[1:]) if m.programRunning else 0 for m in source], dtype=np.int64
+        )
+
+        # === ALARMS / WARNINGS ===
+        # alarm[i] indexes alarm_table (-1 = no alarm); history and
+        # events are plain lists, they only change when an alarm does
+        self.alarm_table: List[Tuple[Optional[int], str]] = []
+        self._alarm_lookup: Dict[Tuple[Optional[int], str], int] = {}
+        self.alarm = np.array(
+            [self._alarm_id(m.alarmCode, m.alarm) if m.alarm else -1 for m in source], dtype=np.int64
+        )
+        self.alarm_raised_at: List[Optional[datetime]] = [m.alarmRaisedAt for m in source]
+        self.alarm_history: List[List[Dict[str, Any]]] = [list(m.alarmHistory) for m in source]
+        self.alarm_history_version = np.zeros(n, dtype=np.int64)
+        self._alarm_events: Dict[int, List[Dict[str, Any]]] = {}
+        # Bit k set: warning rule k of self._rules is active
+        self._rules: RuleSet = alarm_rules.active()
+        self._type_masks: Dict[Optional[Tuple[str, ...]], np.ndarray] = {}
+        self.warnings = np.array([self._warning_bits(m) for m in source], dtype=np.int64)
+        # [i, k]: ticks machine i has spent debouncing a change of warning k
+        self.warning_pending = np.zeros((self.size, len(self._rules.warnings)), dtype=np.int32)
+        self._warning_events: Dict[int, List[Dict[str, Any]]] = {}
+
+        # === DIRTY-FIELD TRACKING (see changes) ===
+        self.versions = np.zeros(n, dtype=np.int64)        # per machine, bumped when a field changes
+        self._field_versions: List[Dict[str, int]] = [{} for _ in range(n)]
+        self._emitted: Optional[List[Dict[str, Any]]] = None   # to_dict() per machine, as last found
+        self._emitted_at: Dict[str, np.ndarray] = {}        # the arrays _emitted was built from
+        self._emitted_timestamp: Optional[datetime] = None
+        self._unreported: Dict[int, Dict[str, Any]] = {}    # found but not returned by changes() yet
+
+        self._views: Optional[Dict[str, "FleetMachine"]] = None
+
+    # ========================================
+    # MAIN UPDATE (whole fleet)
+    # ========================================
+
+    def step(self, dt_sec: float, now: Optional[datetime] = None) -> None:
+        """Advance every machine by dt_sec; `now` stamps the new state (default: wall clock)"""
+        self.timestamp = now if now is not None else datetime.utcnow()
+
+        off = ~self.power
+        self.execution[off] = E_STOPPED
+        self.phase[off] = P_IDLE
+        self.spindle_speed[off] = 0.0
+        self.spindle_load[off] = 0.0
+        self.feed_rate[off] = 0.0
+
+        on = self.power
+        self.machine_on_hours[on] += dt_sec / 3600.0
+        self.time_in_phase[on] += dt_sec
+
+        # Active alarm: spin down, 2% chance of auto-recovery
+        alarmed = on & (self.alarm >= 0)
+        self.execution[alarmed] = E_ALARM
+        self.phase[alarmed] = P_IDLE
+        self.spindle_speed[alarmed] = np.maximum(0.0, self.spindle_speed[alarmed] - 500.0 * dt_sec)
+        self.feed_rate[alarmed] = 0.0
+        for i in np.flatnonzero(self._chance(alarmed, 0.02)):
+            self._clear_alarm(i)
+
+        active = on & ~alarmed
+        self._step_cnc(active & self.is_cnc, dt_sec)
+        self._step_press(active & self.is_press, dt_sec)
+        self._step_laser(active & self.is_laser, dt_sec)
+        self._update_health_sensors(active, dt_sec)
+        self._check_alarms(active)
+        self._update_warnings(active)
+
+    def _rand(self, mask: np.ndarray) -> np.ndarray:
+        """Uniform [0, 1) draws for the machines in mask, one from each one's stream"""
+        rows = np.flatnonzero(mask)
+        counters = self.rng_counter[rows]
+        self.rng_counter[rows] = counters + np.uint64(1)
+        return uniform_draws(self.rng_key[rows], counters)
+
+    def _chance(self, mask: np.ndarray, p: float) -> np.ndarray:
+        """Subset of mask where a draw < p came up"""
+        hit = np.zeros(self.size, dtype=bool)
+        hit[mask] = self._rand(mask) < p
+        return hit
+
+    def _enter_phase(self, mask: np.ndarray, phase: int) -> None:
+        self.phase[mask] = phase
+        self.time_in_phase[mask] = 0.0
+
+    # ========================================
+    # CNC CYCLE
+    # ========================================
+
+    def _step_cnc(self, cnc: np.ndarray, dt: float) -> None:
+        # Phase masks are taken up front: a machine moves at most one
+        # phase per tick, as in HaasMachine._update_cnc_cycle
+        phase = self.phase
+        idle = cnc & (phase == P_IDLE)
+        ramp = cnc & (phase == P_SPINDLE_RAMP)
+        rapid = cnc & (phase == P_RAPID)
+        cutting = cnc & (phase == P_CUTTING)
+        retract = cnc & (phase == P_RETRACT)
+        dwell = cnc & (phase == P_DWELL)
+        finish = cnc & (phase == P_FINISH)
+
+        self.execution[cnc & (phase != P_IDLE)] = E_RUNNING
+        self._phase_idle(idle, dt)
+        self._phase_spindle_ramp(ramp, dt)
+        self._phase_rapid(rapid)
+        self._phase_cutting(cutting, dt)
+        self._phase_retract(retract, dt)
+        self._phase_dwell(dwell, dt)
+        self._phase_finish(finish)
+
+    def _phase_idle(self, m: np.ndarray, dt: float) -> None:
+        self.execution[m] = E_IDLE
+        self.spindle_speed[m] = np.maximum(0.0, self.spindle_speed[m] - 500.0 * dt)
+        self.feed_rate[m] = np.maximum(0.0, self.feed_rate[m] - 500.0 * dt)
+        self.spindle_load[m] = np.maximum(0.0, self.spindle_load[m] - 5.0 * dt)
+
+        cool = m & self.has_coolant
+        self.coolant[cool, 0] = np.minimum(100.0, self.coolant[cool, 0] + 0.1)
+        self.coolant[cool, 3] = 0.0
+
+        # Start new cycle (5% chance)
+        start = self._chance(m, 0.05)
+        self._enter_phase(start, P_SPINDLE_RAMP)
+        self.execution[start] = E_RUNNING
+        self.cycle_time_target[start] = 20 + self._rand(start) * 25
+        self.target_spindle_speed[start] = 3000 + self._rand(start) * (self.max_rpm[start] - 3000)
+        self.target_feed[start] = 300 + self._rand(start) * 1500
+        new_program = start & (self.program == 0)
+        self.program[new_program] = 1000 + (self._rand(new_program) * 9000).astype(np.int64)
+
+    def _phase_spindle_ramp(self, m: np.ndarray, dt: float) -> None:
+        below = m & (self.spindle_speed < self.target_spindle_speed)
+        self.spindle_speed[below] += 350.0 * dt
+        reached = below & (self.spindle_speed >= self.target_spindle_speed)
+        self.spindle_speed[reached] = self.target_spindle_speed[reached]
+        self._enter_phase(reached, P_RAPID)
+
+        loaded = m & (self.target_spindle_speed > 0)
+        self.spindle_load[loaded] = np.minimum(
+            20.0, self.spindle_speed[loaded] / self.target_spindle_speed[loaded] * 15.0
+        )
+        self.spindle_orientation[m] = (self.spindle_orientation[m] + self.spindle_speed[m] * dt / 60.0) % 360.0
+
+    def _phase_rapid(self, m: np.ndarray) -> None:
+        # G0: random X/Y, safe Z
+        for a in (0, 1):
+            lo, hi = self.axis_min[m, a], self.axis_max[m, a]
+            self.axis[m, a] = lo + self._rand(m) * (hi - lo)
+        self.axis[m, 2] = self.axis_max[m, 2]
+
+        self.rapid_rate[m] = self.rapid_traverse[m]
+        self.feed_rate[m] = 0.0
+        self.spindle_load[m] = 5.0 + self._rand(m) * 5.0
+        self._enter_phase(m & (self.time_in_phase >= 3.0), P_CUTTING)
+
+    def _phase_cutting(self, m: np.ndarray, dt: float) -> None:
+        # Feed ramp-up
+        below = m & (self.feed_rate < self.target_feed)
+        self.feed_rate[below] = np.minimum(self.feed_rate[below] + 200.0 * dt, self.target_feed[below])
+
+        # Z descent
+        fed = m & (self.target_feed > 0)
+        self.axis[fed, 2] -= dt * (self.feed_rate[fed] / self.target_feed[fed])
+        self.axis[m, 2] = np.maximum(self.axis[m, 2], self.axis_min[m, 2] + 5.0)
+
+        # Spindle load (uses last tick's vibration), tool wear, vibration
+        noise = self._rand(m) * 4.5 - 2.0
+        self.spindle_load[m] = np.clip(
+            self.feed_rate[m] / 1800.0 * 35.0 + self.tool_wear[m] * 50.0 + self.vibration[m] * 8.0 + noise,
+            0.0, 100.0,
+        )
+        self.tool_wear[m] = np.minimum(self.tool_wear[m] + self.spindle_load[m] / 250000.0, 1.0)
+        self.vibration[m] = self.tool_wear[m] * 3.0 + self._rand(m) * 0.4
+
+        self.spindle_hours[m & (self.spindle_speed > 300.0)] += dt / 3600.0
+
+        # Current tool usage
+        users = self._tool_users(m)
+        tool = self.tool_offset[users] + self.current_tool[users] - 1
+        if tool.size:
+            self.tool_life[tool] = np.maximum(0.0, self.tool_life[tool] - self._rand(users) * 0.02)
+            self.tool_in_use[tool] = True
+            self.tool_cuts[tool] += 1
+            self.tool_version[users] += 1
+
+        # Coolant consumption
+        cool = m & self.has_coolant
+        self.coolant[cool, 0] = np.maximum(0.0, self.coolant[cool, 0] - self._rand(cool) * 0.08)
+        self.coolant[cool, 1] = 45.0 + self._rand(cool) * 15.0
+        self.coolant[cool, 2] = 72.0 + self._rand(cool) * 15.0
+        self.coolant[cool, 3] = 5.0 + self._rand(cool) * 3.0
+
+        # Servo loads and following error
+        self.servo_load[m, 0] = 20.0 + self._rand(m) * 30.0
+        self.servo_load[m, 1] = 20.0 + self._rand(m) * 30.0
+        self.servo_load[m, 2] = 30.0 + self.spindle_load[m] * 0.5
+        self.servo_following_error[m, 0] = self._rand(m) * 0.002
+        self.servo_following_error[m, 1] = self._rand(m) * 0.002
+        self.servo_following_error[m, 2] = self._rand(m) * 0.003
+
+        self._enter_phase(m & (self.time_in_phase >= self.cycle_time_target * 0.6), P_RETRACT)
+
+    def _phase_retract(self, m: np.ndarray, dt: float) -> None:
+        self.axis[m, 2] += 4.0 * dt
+        top = m & (self.axis[:, 2] >= self.axis_max[:, 2] - 10.0)
+        self.axis[top, 2] = self.axis_max[top, 2] - 10.0
+        self._enter_phase(top, P_DWELL)
+
+        self.spindle_load[m] = np.maximum(5.0, self.spindle_load[m] - 10.0 * dt)
+        self.feed_rate[m] = np.maximum(0.0, self.feed_rate[m] - 300.0 * dt)
+
+    def _phase_dwell(self, m: np.ndarray, dt: float) -> None:
+        self.feed_rate[m] = 0.0
+        self.spindle_load[m] = np.maximum(0.0, self.spindle_load[m] - 5.0 * dt)
+        self._enter_phase(m & (self.time_in_phase >= 2.0), P_FINISH)
+
+    def _phase_finish(self, m: np.ndarray) -> None:
+        self.part_count[m] += 1
+        self.total_cycles[m] += 1
+        self.spindle_load[m] *= 0.7
+        self.feed_rate[m] = 0.0
+
+        tool = self._current_tool_index(m)
+        self.tool_in_use[tool] = False
+        self.tool_version[m] += 1
+
+        rated = m & (self.machine_on_hours > 0)
+        self.production_rate[rated] = np.rint(self.part_count[rated] / self.machine_on_hours[rated])
+        self._enter_phase(m, P_IDLE)
+
+    def _tool_users(self, m: np.ndarray) -> np.ndarray:
+        """Machines in m with a valid current tool"""
+        return m & self.has_tools & (self.current_tool >= 1) & (self.current_tool <= self.tool_count)
+
+    def _current_tool_index(self, m: np.ndarray) -> np.ndarray:
+        """Rows of the tool table in use by the machines in m"""
+        valid = self._tool_users(m)
+        return self.tool_offset[valid] + self.current_tool[valid] - 1
+
+    # ========================================
+    # PRESS BRAKE / LASER CYCLES
+    # ========================================
+
+    def _step_press(self, m: np.ndarray, dt: float) -> None:
+        start = self._chance(m & (self.phase == P_IDLE), 0.05)
+        self._enter_phase(start, P_RUNNING)
+        self.bend_angle[start] = 45.0 + self._rand(start) * 90.0
+
+        run = m & (self.phase == P_RUNNING)
+        self.execution[run] = E_RUNNING
+        self.ram_position[run] = np.minimum(100.0, self.ram_position[run] + 20.0 * dt)
+        self.tonnage[run] = self.ram_position[run] / 100.0 * (self.max_tonnage[run] * 0.8)
+        self.spindle_load[run] = self.tonnage[run] / self.max_tonnage[run] * 100.0
+        self.servo_load[run, 1] = self.tonnage[run] / self.max_tonnage[run] * 80.0
+
+        done = run & (self.time_in_phase >= 5.0)
+        self.part_count[done] += 1
+        self.total_cycles[done] += 1
+        self.ram_position[done] = 0.0
+        self.tonnage[done] = 0.0
+        self.execution[done] = E_IDLE
+        self._enter_phase(done, P_IDLE)
+
+        rest = m & ~run
+        self.execution[rest] = E_IDLE
+        self.spindle_load[rest] = 0.0
+        self.tonnage[rest] = 0.0
+
+    def _step_laser(self, m: np.ndarray, dt: float) -> None:
+        start = self._chance(m & (self.phase == P_IDLE), 0.07)
+        self._enter_phase(start, P_RUNNING)
+        self.laser_power[start] = 2000.0 + self._rand(start) * (self.max_laser_power[start] - 2000.0)
+        self.target_feed[start] = 800.0 + self._rand(start) * 2200.0
+
+        run = m & (self.phase == P_RUNNING)
+        self.execution[run] = E_RUNNING
+        self.spindle_load[run] = self.laser_power[run] / self.max_laser_power[run] * 100.0
+        below = run & (self.cut_speed < self.target_feed)
+        self.cut_speed[below] = np.minimum(self.cut_speed[below] + 300.0 * dt, self.target_feed[below])
+        self.feed_rate[run] = self.cut_speed[run]
+        self.axis[run, 0] += self._rand(run) * 10.0 - 5.0
+        self.axis[run, 1] += self._rand(run) * 10.0 - 5.0
+        self.resonator_temp[run] += self.laser_power[run] / self.max_laser_power[run] * 0.4
+
+        done = run & (self.time_in_phase >= 8.0)
+        self.part_count[done] += 1
+        self.total_cycles[done] += 1
+        self.execution[done] = E_IDLE
+        self._enter_phase(done, P_IDLE)
+        self.cut_speed[done] = 0.0
+        self.feed_rate[done] = 0.0
+
+        rest = m & ~run
+        self.execution[rest] = E_IDLE
+        self.spindle_load[rest] = 0.0
+        self.cut_speed[rest] = 0.0
+        self.feed_rate[rest] = 0.0
+        self.resonator_temp[rest] = np.maximum(26.0, self.resonator_temp[rest] - 0.05)
+
+    # ========================================
+    # HEALTH SENSORS
+    # ========================================
+
+    def _update_health_sensors(self, m: np.ndarray, dt: float) -> None:
+        running = m & (self.execution == E_RUNNING)
+        stopped = m & ~running
+        load = self.spindle_load[running] / 100.0
+
+        self.temperature[running] = np.minimum(120.0, self.temperature[running] + load * 0.3)
+        self.spindle_temp[running] = np.minimum(95.0, self.spindle_temp[running] + load * 0.15)
+        self.current_amps[running] = 7.0 + load * 8.0
+        self.temperature[stopped] = np.maximum(72.0, self.temperature[stopped] - 0.2)
+        self.spindle_temp[stopped] = np.maximum(25.0, self.spindle_temp[stopped] - 0.03)
+        self.current_amps[stopped] = np.maximum(7.0, self.current_amps[stopped] - 0.5)
+
+        self.battery_voltage[m] = np.maximum(2.8, self.battery_voltage[m] - 0.0001 * dt)
+        self.oil_pressure[m] = 45.0 + self._rand(m) * 10.0
+        self.oil_level[m] = np.maximum(20.0, self.oil_level[m] - 0.001)
+
+        self.servo_temp[running] = np.minimum(65.0, self.servo_temp[running] + 0.1)
+        self.servo_temp[stopped] = np.maximum(25.0, self.servo_temp[stopped] - 0.05)
+
+    # ========================================
+    # ALARM SYSTEM
+    # ========================================
+
+    def _check_alarms(self, m: np.ndarray) -> None:
+        rules = self._sync_rules()
+        metrics: Dict[str, np.ndarray] = {}
+        pending: Dict[str, np.ndarray] = {}   # chain -> machines it may still fire for
+        for rule in rules.alarms:
+            candidates = self._rule_mask(rule.conditions, rule.types, m, metrics)
+            if rule.chain is not None:
+                chain = pending.setdefault(rule.chain, m.copy())
+                candidates &= chain
+            hit = self._chance(candidates, rule.probability) if rule.probability < 1.0 else candidates
+            self._raise(hit, rule.code, rule.name)
+            if rule.chain is not None:
+                chain &= ~hit
+
+    def _rule_mask(
+        self,
+        conditions: Tuple[Condition, ...],
+        types: Optional[Tuple[str, ...]],
+        m: np.ndarray,
+        metrics: Dict[str, np.ndarray],
+    ) -> np.ndarray:
+        """Machines in m of the given types whose state meets all the conditions"""
+        type_mask = self._type_masks.get(types)
+        if type_mask is None:
+            type_mask = np.ones(self.size, dtype=bool) if types is None else np.isin(
+                self.type_code, [_TYPE_CODES[t] for t in types]
+            )
+            self._type_masks[types] = type_mask
+        mask = m & type_mask
+        for condition in conditions:
+            values = metrics.get(condition.metric)
+            if values is None:
+                values = metrics[condition.metric] = _METRIC_ARRAYS[condition.metric](self)
+            # NaN (metric not present) compares false
+            mask &= condition.compare(values, condition.threshold)
+        return mask
+
+    def _sync_rules(self) -> RuleSet:
+        """Switch to the rules in effect, carrying warning bits over by name"""
+        rules = alarm_rules.active()
+        old = self._rules
+        if rules is not old:
+            remapped = np.zeros(self.size, dtype=np.int64)
+            for k, rule in enumerate(old.warnings):
+                new_k = rules.warning_index(rule.name)
+                active = (self.warnings >> k) & 1 == 1
+                if new_k is not None:
+                    remapped[active] |= 1 << new_k
+                else:
+                    for i in np.flatnonzero(active):
+                        self._emit_warning_event(int(i), rule, "CLEARED", None)
+            self.warnings = remapped
+            self.warning_pending = np.zeros((self.size, len(rules.warnings)), dtype=np.int32)
+            self._rules = rules
+            # Messages and severities may have changed with the same bits
+            self._emitted_at.pop("warnings", None)
+        return rules
+
+    def _raise(self, hit: np.ndarray, code: Optional[int], message: str) -> None:
+        for i in np.flatnonzero(hit):
+            self._set_alarm(int(i), code, message)
+
+    def _alarm_id(self, code: Optional[int], message: str) -> int:
+        key = (code, message)
+        alarm_id = self._alarm_lookup.get(key)
+        if alarm_id is None:
+            alarm_id = self._alarm_lookup[key] = len(self.alarm_table)
+            self.alarm_table.append(key)
+        return alarm_id
+
+    def _set_alarm(self, i: int, code: Optional[int], message: str) -> None:
+        if self.alarm[i] >= 0:
+            # A new alarm replaces the active one: close it first
+            self._emit_alarm_event(i, "CLEARED")
+        self.alarm[i] = self._alarm_id(code, message)
+        self.alarm_raised_at[i] = self.timestamp
+        self._emit_alarm_event(i, "RAISED")
+        self.alarm_history_version[i] += 1
+        history = self.alarm_history[i]
+        history.append(
+            {
+                "code": code,
+                "message": message,
+                "timestamp": self.timestamp.isoformat() + "Z",
+                "cyclePhase": PHASES[self.phase[i]],
+                "spindleLoad": float(self.spindle_load[i]),
+                "cleared": False,
+            }
+        )
+        # Keep last 20
+        if len(history) > 20:
+            del history[:-20]
+
+    def _clear_alarm(self, i: int) -> None:
+        history = self.alarm_history[i]
+        if history:
+            # A new entry, not an in-place edit: published snapshots are diffed
+            history[-1] = {**history[-1], "cleared": True}
+            self.alarm_history_version[i] += 1
+        if self.alarm[i] >= 0:
+            self._emit_alarm_event(i, "CLEARED")
+        self.alarm[i] = -1
+        self.alarm_raised_at[i] = None
+        self.execution[i] = E_IDLE
+
+    def _emit_alarm_event(self, i: int, event: str) -> None:
+        code, message = self.alarm_table[self.alarm[i]]
+        raised_at = self.alarm_raised_at[i]
+        events = self._alarm_events.setdefault(i, [])
+        events.append(
+            {
+                "event": event,
+                "machineId": self.ids[i],
+                "machineName": self.names[i],
+                "code": code,
+                "message": message,
+                "timestamp": self.timestamp,
+                "raisedAt": raised_at,
+                "durationSeconds": (
+                    (self.timestamp - raised_at).total_seconds()
+                    if event == "CLEARED" and raised_at is not None else None
+                ),
+                "cyclePhase": PHASES[self.phase[i]],
+                "spindleLoad": float(self.spindle_load[i]),
+            }
+        )
+        # Nobody draining (standalone simulator): keep it bounded
+        if len(events) > 1000:
+            del events[:-1000]
+
+    def rng_state(self) -> np.ndarray:
+        """Snapshot of every machine's stream position; restore_rng_state() replays from here"""
+        return self.rng_counter.copy()
+
+    def restore_rng_state(self, state: np.ndarray) -> None:
+        self.rng_counter[:] = state
+
+    def drain_alarm_events(self, i: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return and forget alarm transitions since the last call (one machine or all)"""
+        if i is not None:
+            return self._alarm_events.pop(i, [])
+        events = [event for machine_events in self._alarm_events.values() for event in machine_events]
+        self._alarm_events = {}
+        return events
+
+    # ========================================
+    # WARNING SYSTEM
+    # ========================================
+
+    def _update_warnings(self, m: np.ndarray) -> None:
+        rules = self._sync_rules()
+        metrics: Dict[str, np.ndarray] = {}
+        for k, rule in enumerate(rules.warnings):
+            bit = 1 << k
+            was = (self.warnings & bit) != 0
+            if rule.exit_conditions[0].threshold == rule.conditions[0].threshold:
+                held = self._rule_mask(rule.conditions, rule.types, m, metrics)
+            else:
+                # Hysteresis: active warnings are held by the exit threshold
+                held = self._rule_mask(rule.conditions, rule.types, m & ~was, metrics)
+                held |= self._rule_mask(rule.exit_conditions, rule.types, m & was, metrics)
+            changed = m & (held != was)
+            count = self.warning_pending[:, k]
+            count[m & ~changed] = 0
+            if not changed.any():
+                continue
+            count[changed] += 1
+            flip = changed & (count >= rule.debounce)
+            count[flip] = 0
+            self.warnings[flip] ^= bit
+            values = metrics[rule.conditions[0].metric]
+            for i in np.flatnonzero(flip):
+                self._emit_warning_event(int(i), rule, "RAISED" if held[i] else "CLEARED", values[i])
+
+    def _emit_warning_event(self, i: int, rule: Rule, event: str, value: Optional[float]) -> None:
+        events = self._warning_events.setdefault(i, [])
+        events.append(
+            {
+                "event": event,
+                "machineId": self.ids[i],
+                "machineName": self.names[i],
+                "type": rule.name,
+                "severity": rule.severity,
+                "message": rule.warning(int(self.current_tool[i]) or None)["message"],
+                "value": float(value) if value is not None and value == value else None,
+                "timestamp": self.timestamp,
+            }
+        )
+        if len(events) > 1000:
+            del events[:-1000]
+
+    def drain_warning_events(self, i: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return and forget warning transitions since the last call (one machine or all)"""
+        if i is not None:
+            return self._warning_events.pop(i, [])
+        events = [event for machine_events in self._warning_events.values() for event in machine_events]
+        self._warning_events = {}
+        return events
+
+    def _warning_bits(self, machine: HaasMachine) -> int:
+        bits = 0
+        for warning in machine.warnings:
+            k = self._rules.warning_index(warning["type"])
+            if k is not None:
+                bits |= 1 << k
+        return bits
+
+    def _warning_list(self, i: int) -> List[Dict[str, Any]]:
+        bits = int(self.warnings[i])
+        if not bits:
+            return []
+        current_tool = int(self.current_tool[i]) or None
+        return [rule.warning(current_tool) for k, rule in enumerate(self._rules.warnings) if bits >> k & 1]
+
+    # ========================================
+    # RULE METRICS
+    # ========================================
+
+    def _tool_life(self) -> np.ndarray:
+        """Current tool's remaining life per machine (NaN: no valid tool)"""
+        life = np.full(self.size, np.nan)
+        valid = self._tool_users(np.ones(self.size, dtype=bool))
+        life[valid] = self.tool_life[self.tool_offset[valid] + self.current_tool[valid] - 1]
+        return life
+
+    # ========================================
+    # MANUAL CONTROLS
+    # ========================================
+
+    def set_power(self, i: int, state: bool) -> None:
+        self.power[i] = state
+        if not state:
+            self.execution[i] = E_STOPPED
+            self.phase[i] = P_IDLE
+
+    def inject_alarm(self, i: int, code: Optional[int], message: str) -> None:
+        self._set_alarm(i, code, message)
+
+    def clear_alarm(self, i: int) -> None:
+        self._clear_alarm(i)
+
+    # ========================================
+    # JSON / DICT OUTPUT
+    # ========================================
+
+    def _axis_dict(self, values: np.ndarray, i: int) -> Dict[str, float]:
+        return {a: float(values[i, k]) for k, a in enumerate(AXES)}
+
+    def to_dict(self, i: int, tools: bool = True) -> Dict[str, Any]:
+        """Machine i in exactly the HaasMachine.to_dict() shape"""
+        alarm = int(self.alarm[i])
+        code, message = self.alarm_table[alarm] if alarm >= 0 else (None, None)
+        axis = self.axis[i]
+        data: Dict[str, Any] = {
+            "id": self.ids[i],
+            "name": self.names[i],
+            "model": self.models[i],
+            "type": self.types[i],
+            "specs": self.specs[i],
+            "power": bool(self.power[i]),
+            "execution": EXECUTIONS[self.execution[i]],
+            "cyclePhase": PHASES[self.phase[i]],
+            "alarm": message,
+            "alarmCode": code,
+            "alarmHistory": self.alarm_history[i][-5:],  # last 5
+            "warnings": self._warning_list(i),
+            "spindleSpeed": round(float(self.spindle_speed[i])),
+            "spindleLoad": round(float(self.spindle_load[i]), 1),
+            "spindleTemp": round(float(self.spindle_temp[i]), 1),
+            "spindleHours": round(float(self.spindle_hours[i]), 3),
+            "spindleOrientation": round(float(self.spindle_orientation[i])),
+            "feedRate": round(float(self.feed_rate[i])),
+            "rapidRate": round(float(self.rapid_rate[i])),
+            "axisPositions": {
+                "X": round(float(axis[0]), 2),
+                "Y": round(float(axis[1]), 2),
+                "Z": round(float(axis[2]), 2),
+            },
+            "servoLoad": self._axis_dict(self.servo_load, i),
+            "servoFollowingError": self._axis_dict(self.servo_following_error, i),
+            "servoTemp": self._axis_dict(self.servo_temp, i),
+            "partCount": int(self.part_count[i]),
+            "totalCycles": int(self.total_cycles[i]),
+            "machineOnHours": round(float(self.machine_on_hours[i]), 3),
+            "productionRate": int(self.production_rate[i]),
+            "batteryVoltage": round(float(self.battery_voltage[i]), 2),
+            "temperature": round(float(self.temperature[i])),
+            "vibration": round(float(self.vibration[i]), 2),
+            "currentAmps": round(float(self.current_amps[i]), 1),
+            "oilPressure": round(float(self.oil_pressure[i])),
+            "oilLevel": round(float(self.oil_level[i])),
+            "timestamp": self.timestamp.isoformat() + "Z",
+        }
+
+        if self.is_cnc[i]:
+            data["currentTool"] = int(self.current_tool[i]) or None
+            if tools:
+                data["tools"] = self._tool_list(i) if self.has_tools[i] else None
+            data["toolChangeCount"] = int(self.tool_change_count[i])
+            data["toolWear"] = round(float(self.tool_wear[i]), 3)
+            data["coolant"] = (
+                {f: float(self.coolant[i, k]) for k, f in enumerate(COOLANT_FIELDS)}
+                if self.has_coolant[i] else None
+            )
+
+        if self.is_press[i]:
+            data["tonnage"] = round(float(self.tonnage[i]))
+            data["maxTonnage"] = _number(self.max_tonnage[i])
+            data["ramPosition"] = round(float(self.ram_position[i]))
+            data["backGauge"] = float(self.back_gauge[i])
+            data["bendAngle"] = round(float(self.bend_angle[i]))
+
+        if self.is_laser[i]:
+            data["laserPower"] = round(float(self.laser_power[i]))
+            data["maxLaserPower"] = _number(self.max_laser_power[i])
+            data["gasPressure"] = round(float(self.gas_pressure[i]))
+            data["resonatorTemp"] = round(float(self.resonator_temp[i]), 1)
+            data["cutSpeed"] = round(float(self.cut_speed[i]))
+
+        if self.program[i]:
+            data["programRunning"] = f"O{int(self.program[i])}"
+
+        return data
+
+    def _tool_list(self, i: int) -> List[Dict[str, Any]]:
+        start = int(self.tool_offset[i])
+        tools = []
+        for t in range(start, start + int(self.tool_count[i])):
+            static = self.tool_static[t]
+            tools.append(
+                {
+                    "number": static["number"],
+                    "type": static["type"],
+                    "diameter": static["diameter"],
+                    "length": static["length"],
+                    "currentLife": float(self.tool_life[t]),
+                    "maxLife": static["maxLife"],
+                    "flutes": static["flutes"],
+                    "coating": static["coating"],
+                    "description": static["description"],
+                    "inUse": bool(self.tool_in_use[t]),
+                    "totalCuts": int(self.tool_cuts[t]),
+                }
+            )
+        return tools
+
+    def all_dicts(self) -> Dict[str, Dict[str, Any]]:
+        return {machine_id: self.to_dict(i) for i, machine_id in enumerate(self.ids)}
+
+    # ========================================
+    # DIRTY-FIELD TRACKING
+    # ========================================
+
+    def changes(self) -> Dict[str, Dict[str, Any]]:
+        """Per machine id, the to_dict() fields that changed since the previous
+        call (the first call returns everything); dropped fields are DROPPED"""
+        self._find_changes()
+        unreported, self._unreported = self._unreported, {}
+        ids = self.ids
+        return {ids[i]: fields for i, fields in unreported.items()}
+
+    def to_delta(self, i: int, since: int) -> Dict[str, Any]:
+        """Machine i's fields that changed after its version `since` (0: all), like HaasMachine.to_delta"""
+        self._find_changes()
+        emitted = self._emitted[i]
+        if since <= 0:
+            return dict(emitted)
+        return {key: emitted.get(key, DROPPED) for key, at in self._field_versions[i].items() if at > since}
+
+    def _find_changes(self) -> None:
+        """Compare every output field's arrays with the ones last emitted; rebuild
+        the field only for the rows where they differ"""
+        if self._emitted is None:
+            self._emitted = [self.to_dict(i) for i in range(self.size)]
+            for i, emitted in enumerate(self._emitted):
+                self._record(i, emitted)
+                self._unreported[i] = dict(emitted)
+            self._emitted_at = {attr: getattr(self, attr).copy() for attr in _TRACKED_ARRAYS}
+            self._emitted_timestamp = self.timestamp
+            return
+
+        found: Dict[int, Dict[str, Any]] = {}
+        if self.timestamp != self._emitted_timestamp:
+            stamp = self.timestamp.isoformat() + "Z"
+            for i in range(self.size):
+                found[i] = {"timestamp": stamp}
+            self._emitted_timestamp = self.timestamp
+
+        diffs: Dict[str, np.ndarray] = {}
+        for attr in _TRACKED_ARRAYS:
+            now, before = getattr(self, attr), self._emitted_at.get(attr)
+            if before is None or before.shape != now.shape:
+                diffs[attr] = np.ones(self.size, dtype=bool)
+            else:
+                diff = now != before
+                diffs[attr] = diff.any(axis=1) if diff.ndim > 1 else diff
+            self._emitted_at[attr] = now.copy()
+
+        emitted = self._emitted
+        for key, attrs, only, build in _DELTA_FIELDS:
+            mask = diffs[attrs[0]]
+            for attr in attrs[1:]:
+                mask = mask | diffs[attr]
+            if only is not None:
+                mask = mask & getattr(self, only)
+            rows = np.flatnonzero(mask)
+            if not rows.size:
+                continue
+            for i, value in zip(rows.tolist(), build(self, rows)):
+                if emitted[i].get(key, DROPPED) != value:
+                    found.setdefault(i, {})[key] = value
+
+        for i, fields in found.items():
+            state = emitted[i]
+            for key, value in fields.items():
+                if value is DROPPED:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+            self._record(i, fields)
+            self._unreported.setdefault(i, {}).update(fields)
+
+    def _record(self, i: int, fields: Dict[str, Any]) -> None:
+        self.versions[i] += 1
+        version = int(self.versions[i])
+        versions = self._field_versions[i]
+        for key in fields:
+            versions[key] = version
+
+    def machine(self, machine_id: str) -> "FleetMachine":
+        return self.machines()[machine_id]
+
+    def machines(self) -> Dict[str, "FleetMachine"]:
+        """HaasMachine-like views (to_dict, controls) keyed by machine id"""
+        if self._views is None:
+            self._views = {machine_id: FleetMachine(self, i) for i, machine_id in enumerate(self.ids)}
+        return self._views
+
+
+def _coolant(k: int):
+    return lambda f: np.where(f.has_coolant, f.coolant[:, k], np.nan)
+
+
+def _per_axis(attr: str, k: int):
+    return lambda f: getattr(f, attr)[:, k]
+
+
+# alarm_rules.METRICS as whole-fleet arrays
+_METRIC_ARRAYS = {
+    "spindleSpeed": lambda f: f.spindle_speed,
+    "spindleLoad": lambda f: f.spindle_load,
+    "spindleTemp": lambda f: f.spindle_temp,
+    "feedRate": lambda f: f.feed_rate,
+    "batteryVoltage": lambda f: f.battery_voltage,
+    "temperature": lambda f: f.temperature,
+    "vibration": lambda f: f.vibration,
+    "currentAmps": lambda f: f.current_amps,
+    "oilPressure": lambda f: f.oil_pressure,
+    "oilLevel": lambda f: f.oil_level,
+    "toolWear": lambda f: f.tool_wear,
+    "tonnage": lambda f: f.tonnage,
+    "laserPower": lambda f: f.laser_power,
+    "gasPressure": lambda f: f.gas_pressure,
+    "resonatorTemp": lambda f: f.resonator_temp,
+    "cutSpeed": lambda f: f.cut_speed,
+    "toolLife": lambda f: f._tool_life(),
+    "hasTool": lambda f: (f.has_tools & (f.current_tool > 0)).astype(np.float64),
+    "tonnagePct": lambda f: np.divide(
+        f.tonnage, f.max_tonnage, out=np.full(f.size, np.nan), where=f.max_tonnage != 0
+    ) * 100.0,
+}
+_METRIC_ARRAYS.update({f"coolant.{field}": _coolant(k) for k, field in enumerate(COOLANT_FIELDS)})
+_METRIC_ARRAYS.update({
+    f"{name}.{a}": _per_axis(attr, k)
+    for attr, name in (("servo_load", "servoLoad"), ("servo_following_error", "servoFollowingError"),
+                       ("servo_temp", "servoTemp"))
+    for k, a in enumerate(AXES)
+})
+
+
+# ========================================
+# OUTPUT FIELDS FOR changes()
+# ========================================
+
+def _rounded(attr: str, ndigits: Optional[int] = None):
+    if ndigits is None:
+        return lambda f, rows: [round(x) for x in getattr(f, attr)[rows].tolist()]
+    return lambda f, rows: [round(x, ndigits) for x in getattr(f, attr)[rows].tolist()]
+
+
+def _plain(attr: str):
+    return lambda f, rows: getattr(f, attr)[rows].tolist()
+
+
+def _axes(attr: str, ndigits: Optional[int] = None):
+    def build(f: "FleetSimulator", rows: np.ndarray) -> List[Dict[str, float]]:
+        values = getattr(f, attr)[rows].tolist()
+        if ndigits is None:
+            return [dict(zip(AXES, xyz)) for xyz in values]
+        return [{a: round(x, ndigits) for a, x in zip(AXES, xyz)} for xyz in values]
+    return build
+
+
+def _alarm_field(k: int):
+    def build(f: "FleetSimulator", rows: np.ndarray) -> List[Any]:
+        table = f.alarm_table
+        return [table[a][k] if a >= 0 else None for a in f.alarm[rows].tolist()]
+    return build
+
+
+def _coolant_dicts(f: "FleetSimulator", rows: np.ndarray) -> List[Any]:
+    has = f.has_coolant[rows].tolist()
+    return [dict(zip(COOLANT_FIELDS, values)) if ok else None
+            for ok, values in zip(has, f.coolant[rows].tolist())]
+
+
+def _program(f: "FleetSimulator", rows: np.ndarray) -> List[Any]:
+    return [f"O{p}" if p else DROPPED for p in f.program[rows].tolist()]
+
+
+# (to_dict() key, arrays whose change may change it, rows that have it
+# (None: all), its values for some rows) - built exactly like to_dict()
+_DELTA_FIELDS = (
+    ("power", ("power",), None, _plain("power")),
+    ("execution", ("execution",), None, lambda f, rows: [EXECUTIONS[c] for c in f.execution[rows].tolist()]),
+    ("cyclePhase", ("phase",), None, lambda f, rows: [PHASES[c] for c in f.phase[rows].tolist()]),
+    ("alarm", ("alarm",), None, _alarm_field(1)),
+    ("alarmCode", ("alarm",), None, _alarm_field(0)),
+    ("alarmHistory", ("alarm_history_version",), None,
+     lambda f, rows: [f.alarm_history[i][-5:] for i in rows.tolist()]),
+    ("warnings", ("warnings", "current_tool"), None, lambda f, rows: [f._warning_list(i) for i in rows.tolist()]),
+    ("spindleSpeed", ("spindle_speed",), None, _rounded("spindle_speed")),
+    ("spindleLoad", ("spindle_load",), None, _rounded("spindle_load", 1)),
+    ("spindleTemp", ("spindle_temp",), None, _rounded("spindle_temp", 1)),
+    ("spindleHours", ("spindle_hours",), None, _rounded("spindle_hours", 3)),
+    ("spindleOrientation", ("spindle_orientation",), None, _rounded("spindle_orientation")),
+    ("feedRate", ("feed_rate",), None, _rounded("feed_rate")),
+    ("rapidRate", ("rapid_rate",), None, _rounded("rapid_rate")),
+    ("axisPositions", ("axis",), None, _axes("axis", 2)),
+    ("servoLoad", ("servo_load",), None, _axes("servo_load")),
+    ("servoFollowingError", ("servo_following_error",), None, _axes("servo_following_error")),
+    ("servoTemp", ("servo_temp",), None, _axes("servo_temp")),
+    ("partCount", ("part_count",), None, _plain("part_count")),
+    ("totalCycles", ("total_cycles",), None, _plain("total_cycles")),
+    ("machineOnHours", ("machine_on_hours",), None, _rounded("machine_on_hours", 3)),
+    ("productionRate", ("production_rate",), None, _plain("production_rate")),
+    ("batteryVoltage", ("battery_voltage",), None, _rounded("battery_voltage", 2)),
+    ("temperature", ("temperature",), None, _rounded("temperature")),
+    ("vibration", ("vibration",), None, _rounded("vibration", 2)),
+    ("currentAmps", ("current_amps",), None, _rounded("current_amps", 1)),
+    ("oilPressure", ("oil_pressure",), None, _rounded("oil_pressure")),
+    ("oilLevel", ("oil_level",), None, _rounded("oil_level")),
+    ("currentTool", ("current_tool",), "is_cnc", lambda f, rows: [t or None for t in f.current_tool[rows].tolist()]),
+    ("tools", ("tool_version",), "is_cnc",
+     lambda f, rows: [f._tool_list(i) if f.has_tools[i] else None for i in rows.tolist()]),
+    ("toolChangeCount", ("tool_change_count",), "is_cnc", _plain("tool_change_count")),
+    ("toolWear", ("tool_wear",), "is_cnc", _rounded("tool_wear", 3)),
+    ("coolant", ("coolant",), "is_cnc", _coolant_dicts),
+    ("tonnage", ("tonnage",), "is_press", _rounded("tonnage")),
+    ("ramPosition", ("ram_position",), "is_press", _rounded("ram_position")),
+    ("backGauge", ("back_gauge",), "is_press", _plain("back_gauge")),
+    ("bendAngle", ("bend_angle",), "is_press", _rounded("bend_angle")),
+    ("laserPower", ("laser_power",), "is_laser", _rounded("laser_power")),
+    ("gasPressure", ("gas_pressure",), "is_laser", _rounded("gas_pressure")),
+    ("resonatorTemp", ("resonator_temp",), "is_laser", _rounded("resonator_temp", 1)),
+    ("cutSpeed", ("cut_speed",), "is_laser", _rounded("cut_speed")),
+    ("programRunning", ("program",), None, _program),
+)
+_TRACKED_ARRAYS = tuple(sorted({attr for _, attrs, _, _ in _DELTA_FIELDS for attr in attrs}))
+
+
+def _number(value: float) -> Any:
+    """Spec values were ints in the specs dict; keep them ints in the output"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class FleetMachine:
+    """One machine of a FleetSimulator, usable where a HaasMachine is expected
+    (except update(): the fleet is stepped as a whole)"""
+
+    __slots__ = ("fleet", "i")
+
+    def __init__(self, fleet: FleetSimulator, i: int):
+        self.fleet = fleet
+        self.i = i
+
+    @property
+    def id(self) -> str:
+        return self.fleet.ids[self.i]
+
+    @property
+    def name(self) -> str:
+        return self.fleet.names[self.i]
+
+    @property
+    def model(self) -> str:
+        return self.fleet.models[self.i]
+
+    @property
+    def type(self) -> str:
+        return self.fleet.types[self.i]
+
+    @property
+    def power(self) -> bool:
+        return bool(self.fleet.power[self.i])
+
+    def set_power(self, state: bool) -> None:
+        self.fleet.set_power(self.i, state)
+
+    def inject_alarm(self, code: Optional[int], message: str) -> None:
+        self.fleet.inject_alarm(self.i, code, message)
+
+    def clear_alarm(self) -> None:
+        self.fleet.clear_alarm(self.i)
+
+    def drain_alarm_events(self) -> List[Dict[str, Any]]:
+        return self.fleet.drain_alarm_events(self.i)
+
+    def drain_warning_events(self) -> List[Dict[str, Any]]:
+        return self.fleet.drain_warning_events(self.i)
+
+    def to_dict(self, tools: bool = True) -> Dict[str, Any]:
+        return self.fleet.to_dict(self.i, tools)
+
+    @property
+    def version(self) -> int:
+        return int(self.fleet.versions[self.i])
+
+    def to_delta(self, since: int) -> Dict[str, Any]:
+        return self.fleet.to_delta(self.i, since)
+
+
+# ========================================
+# FACTORY: N COPIES OF THE DEFAULT FLEET
+# ========================================
+
+def create_default_fleet(copies: int = 1, fleet_seed: Optional[int] = None) -> FleetSimulator:
+    """FleetSimulator over create_fleet_machines(copies, fleet_seed)"""
+    return FleetSimulator(create_fleet_machines(copies, fleet_seed).values())
+
+
+# ========================================
+# SIMPLE LOCAL BENCHMARK
+# ========================================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    fleet = create_default_fleet(copies, fleet_seed=1)
+    started = time.perf_counter()
+    for _ in range(ticks):
+        fleet.step(1.0)
+    vector_ms = (time.perf_counter() - started) * 1000.0 / ticks
+
+    objects = list(create_fleet_machines(copies, fleet_seed=1).values())
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for m in objects:
+            m.update(1.0)
+    object_ms = (time.perf_counter() - started) * 1000.0 / ticks
+
+    print(f"{fleet.size} machines, {ticks} ticks")
+    print(f"  FleetSimulator.step:   {vector_ms:8.2f} ms/tick")
+    print(f"  HaasMachine.update:    {object_ms:8.2f} ms/tick")
@@ -0,0 +1,61 @@
+"""
+Fleet summary counters
+The totals behind /api/reports/summary (running and alarmed machines,
+parts, spindle load), kept up to date from each tick's delta: only the
+machines whose execution, alarm, part count or spindle load changed are
+touched, instead of scanning every machine's state on every request.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# The machine fields the counters depend on
+FIELDS = ("execution", "alarm", "partCount", "spindleLoad")
+
+
+class FleetSummary:
+    """Running totals over the published fleet state"""
+
+    def __init__(self):
+        self.version = 0
+        self.timestamp: Optional[datetime] = None
+        self._machines: Dict[str, Dict[str, Any]] = {}   # machine -> its FIELDS values
+        self.running = 0
+        self.alarms = 0
+        self.parts = 0
+        self.load = 0.0
+
+    def apply(self, delta: Dict[str, Dict[str, Any]], version: int, now: Optional[datetime] = None) -> None:
+        """Fold in one tick's delta (DeltaTracker.publish; the first one holds every machine)"""
+        for machine_id, fields in delta.items():
+            held = self._machines.get(machine_id)
+            if held is None:
+                held = self._machines[machine_id] = dict.fromkeys(FIELDS)
+            elif not any(key in fields for key in FIELDS):
+                continue
+            else:
+                self._count(held, -1)
+            for key in FIELDS:
+                if key in fields:
+                    held[key] = fields[key]
+            self._count(held, 1)
+        self.version = version
+        self.timestamp = now or datetime.utcnow()
+
+    def _count(self, held: Dict[str, Any], sign: int) -> None:
+        self.running += sign * (held["execution"] == "RUNNING")
+        self.alarms += sign * bool(held["alarm"])
+        self.parts += sign * (held["partCount"] or 0)
+        self.load += sign * (held["spindleLoad"] or 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = len(self._machines)
+        return {
+            'total_machines': total,
+            'running_machines': self.running,
+            'idle_machines': total - self.running - self.alarms,
+            'alarm_machines': self.alarms,
+            'total_parts_today': self.parts,
+            'average_spindle_load': round(max(self.load, 0.0) / total, 2) if total else 0.0,
+            'timestamp': (self.timestamp or datetime.utcnow()).isoformat()
+        }
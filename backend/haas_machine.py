@@ -1,8 +1,184 @@
+import hashlib
+import math
 import random
+from array import array
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import alarm_rules
+from alarm_rules import Condition, Rule
+from deltas import DROPPED
+
+AXES = ("X", "Y", "Z")
+TOOL_TYPES = ("DRILL", "END_MILL", "FACE_MILL", "REAMER", "TAP", "BORING_BAR")
+TOOL_COATINGS = ("TiN", "TiCN", "AlTiN", "Uncoated")
+
+# to_dict() fields that to_delta() does not rebuild every tick: missing
+# from the fresh fields does not mean dropped
+_KEPT_FIELDS = frozenset(("id", "name", "model", "type", "specs", "tools"))
+_UNSET = object()
+
+# Per-tick chances of the waiting states; drawn once as a countdown
+START_CHANCE = {"CNC_MILL": 0.05, "LATHE": 0.05, "PRESS_BRAKE": 0.05, "LASER": 0.07}
+RECOVERY_CHANCE = 0.02
+
+# How rule metrics move per quiet tick (see advance_quiet): (per tick,
+# per second of dt, bound). None: redrawn every tick. Unlisted: constant.
+QUIET_DRIFT = {
+    "spindleSpeed": (0.0, -500.0, 0.0),
+    "feedRate": (0.0, -500.0, 0.0),
+    "spindleLoad": (0.0, -5.0, 0.0),
+    "coolant.level": (0.1, 0.0, 100.0),
+    "resonatorTemp": (-0.05, 0.0, 26.0),
+    "temperature": (-0.2, 0.0, 72.0),
+    "spindleTemp": (-0.03, 0.0, 25.0),
+    "currentAmps": (-0.5, 0.0, 7.0),
+    "batteryVoltage": (0.0, -0.0001, 2.8),
+    "oilPressure": None,
+    "oilLevel": (-0.001, 0.0, 20.0),
+    "servoTemp.X": (-0.05, 0.0, 25.0),
+    "servoTemp.Y": (-0.05, 0.0, 25.0),
+    "servoTemp.Z": (-0.05, 0.0, 25.0),
+}
+
+
+def ticks_until(p: float, rng: random.Random) -> int:
+    """Ticks until a per-tick chance p first comes up (geometric, >= 1).
+
+    Same distribution as rolling random() < p every tick, in one draw.
+    """
+    return int(math.log1p(-rng.random()) / math.log1p(-p)) + 1
+
+
+def machine_seed(fleet_seed: Optional[int], machine_id: str) -> int:
+    """64-bit seed of one machine's random stream.
+
+    Depends only on the fleet seed and the machine id, so a machine draws
+    the same numbers whatever else is in the fleet and whichever process
+    steps it. fleet_seed=None gives a fresh, unreproducible seed.
+    """
+    if fleet_seed is None:
+        return random.SystemRandom().getrandbits(64)
+    digest = hashlib.sha256(f"{fleet_seed}:{machine_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+# ========================================
+# COMPACT STATE RECORDS
+# ========================================
+
+class _Record:
+    """Fixed set of slotted fields, also readable/writable as record["field"]"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> float:
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: float) -> None:
+        setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AxisValues(_Record):
+    __slots__ = AXES
+
+    def __init__(self, x: float, y: float, z: float):
+        self.X = x
+        self.Y = y
+        self.Z = z
+
+
+class CoolantState(_Record):
+    __slots__ = ("level", "pressure", "temperature", "flow")
+
+    def __init__(self, level: float, pressure: float, temperature: float, flow: float):
+        self.level = level
+        self.pressure = pressure
+        self.temperature = temperature
+        self.flow = flow
+
+
+class ToolTable:
+    """Tool magazine as typed arrays, one slot per tool (tool number = index + 1).
+
+    Type and coating are stored as indexes into TOOL_TYPES / TOOL_COATINGS;
+    to_list() gives the per-tool dicts the API has always returned. Writers
+    add the slot to `dirty`, so a delta only rebuilds the tools that changed.
+    """
+
+    __slots__ = ("toolType", "diameter", "length", "currentLife", "maxLife", "flutes", "coating", "inUse",
+                 "totalCuts", "dirty")
+
+    def __init__(self, count: int):
+        self.toolType = array("B", bytes(count))
+        self.diameter = array("d", bytes(8 * count))
+        self.length = array("d", bytes(8 * count))
+        self.currentLife = array("d", bytes(8 * count))
+        self.maxLife = array("H", [100]) * count
+        self.flutes = array("B", bytes(count))
+        self.coating = array("B", bytes(count))
+        self.inUse = array("B", bytes(count))
+        self.totalCuts = array("q", bytes(8 * count))
+        self.dirty: Set[int] = set()
+
+    @classmethod
+    def random(cls, count: int, rng: random.Random) -> "ToolTable":
+        table = cls(count)
+        for i in range(count):
+            table.toolType[i] = TOOL_TYPES.index(rng.choice(TOOL_TYPES))
+            table.diameter[i] = round(rng.random() * 20 + 2, 2)
+            table.length[i] = round(rng.random() * 100 + 50, 2)
+            table.currentLife[i] = 100 - rng.random() * 80
+            table.flutes[i] = rng.randint(2, 5)
+            table.coating[i] = TOOL_COATINGS.index(rng.choice(TOOL_COATINGS))
+        return table
+
+    def __len__(self) -> int:
+        return len(self.currentLife)
+
+    def tool_dict(self, i: int) -> Dict[str, Any]:
+        return {
+            "number": i + 1,
+            "type": TOOL_TYPES[self.toolType[i]],
+            "diameter": self.diameter[i],
+            "length": self.length[i],
+            "currentLife": self.currentLife[i],
+            "maxLife": self.maxLife[i],
+            "flutes": self.flutes[i],
+            "coating": TOOL_COATINGS[self.coating[i]],
+            "description": f"Tool {i + 1}",
+            "inUse": bool(self.inUse[i]),
+            "totalCuts": self.totalCuts[i],
+        }
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [self.tool_dict(i) for i in range(len(self))]
+
 
 class HaasMachine:
+    # No per-instance __dict__: thousands of machines stay small
+    __slots__ = (
+        "id", "name", "model", "type", "specs",
+        "power", "execution", "cyclePhase", "timeInPhase", "cycleTimeTarget",
+        "alarm", "alarmCode", "alarmHistory", "alarmEvents", "alarmRaisedAt", "warnings",
+        "warningBits", "warningPending", "warningRules", "warningEvents",
+        "spindleSpeed", "targetSpindleSpeed", "spindleLoad", "spindleTemp", "spindleHours", "spindleOrientation",
+        "feedRate", "targetFeed", "rapidRate", "axisPositions",
+        "servoLoad", "servoFollowingError", "servoTemp",
+        "partCount", "totalCycles", "machineOnHours", "productionRate",
+        "batteryVoltage", "temperature", "vibration", "currentAmps", "oilPressure", "oilLevel",
+        "currentTool", "tools", "toolChangeCount", "toolWear", "coolant",
+        "tonnage", "maxTonnage", "ramPosition", "backGauge", "bendAngle",
+        "laserPower", "maxLaserPower", "gasPressure", "resonatorTemp", "cutSpeed",
+        "material", "programRunning", "timestamp",
+        "startCountdown", "recoveryCountdown",
+        "seed", "rng",
+        "version", "fieldVersions", "emitted",
+    )
+
     def __init__(
         self,
         machine_id: str,
@@ -10,6 +186,7 @@ class HaasMachine:
         model: str,       # "VF-2", "VF-4", "HMC", "LATHE", "PRESS", "LASER"
         mtype: str,       # "CNC_MILL", "LATHE", "PRESS_BRAKE", "LASER"
         specs: Optional[Dict[str, Any]] = None,
+        fleet_seed: Optional[int] = None,
     ):
         if specs is None:
             specs = {}
@@ -19,6 +196,11 @@ class HaasMachine:
         self.model = model
         self.type = mtype
 
+        # Every draw (tool table included) comes from this machine's own
+        # stream, see machine_seed()
+        self.seed: int = machine_seed(fleet_seed, machine_id)
+        self.rng = random.Random(self.seed)
+
         # Machine Specifications
         axis_limits = specs.get(
             "axisLimits",
@@ -39,13 +221,19 @@ class HaasMachine:
         self.execution: str = "IDLE"     # IDLE, RUNNING, ALARM, STOPPED
         self.cyclePhase: str = "IDLE"    # IDLE, SPINDLE_RAMP, RAPID, CUTTING, RETRACT, DWELL, FINISH
         self.timeInPhase: float = 0.0
-        self.cycleTimeTarget: float = 20 + random.random() * 25
+        self.cycleTimeTarget: float = 20 + self.rng.random() * 25
 
         # === CRITICAL ALARMS ===
         self.alarm: Optional[str] = None
         self.alarmCode: Optional[int] = None
         self.alarmHistory: List[Dict[str, Any]] = []
+        self.alarmEvents: List[Dict[str, Any]] = []   # RAISED/CLEARED transitions not yet drained
+        self.alarmRaisedAt: Optional[datetime] = None
         self.warnings: List[Dict[str, Any]] = []
+        self.warningBits: int = 0                     # active warnings, bit k = warningRules[k]
+        self.warningPending: Dict[int, int] = {}      # bit -> ticks spent debouncing a change
+        self.warningRules: Tuple[Rule, ...] = ()
+        self.warningEvents: List[Dict[str, Any]] = []  # RAISED/CLEARED transitions not yet drained
 
         # === SPINDLE DATA ===
         self.spindleSpeed: float = 0.0
@@ -60,16 +248,16 @@ class HaasMachine:
         self.targetFeed: float = 0.0
         self.rapidRate: float = 0.0
 
-        self.axisPositions: Dict[str, float] = {
-            "X": (axis_limits["X"][0] + axis_limits["X"][1]) / 2.0,
-            "Y": (axis_limits["Y"][0] + axis_limits["Y"][1]) / 2.0,
-            "Z": axis_limits["Z"][1],  # Safe Z
-        }
+        self.axisPositions = AxisValues(
+            (axis_limits["X"][0] + axis_limits["X"][1]) / 2.0,
+            (axis_limits["Y"][0] + axis_limits["Y"][1]) / 2.0,
+            axis_limits["Z"][1],  # Safe Z
+        )
 
         # === SERVO MONITORING ===
-        self.servoLoad: Dict[str, float] = {"X": 0.0, "Y": 0.0, "Z": 0.0}
-        self.servoFollowingError: Dict[str, float] = {"X": 0.0, "Y": 0.0, "Z": 0.0}
-        self.servoTemp: Dict[str, float] = {"X": 25.0, "Y": 25.0, "Z": 25.0}
+        self.servoLoad = AxisValues(0.0, 0.0, 0.0)
+        self.servoFollowingError = AxisValues(0.0, 0.0, 0.0)
+        self.servoTemp = AxisValues(25.0, 25.0, 25.0)
 
         # === PRODUCTION METRICS ===
         self.partCount: int = 0
@@ -87,22 +275,17 @@ class HaasMachine:
 
         # === TOOL MANAGEMENT (CNC/LATHE only) ===
         self.currentTool: Optional[int] = None
-        self.tools: Optional[List[Dict[str, Any]]] = None
+        self.tools: Optional[ToolTable] = None
         self.toolChangeCount: int = 0
         self.toolWear: float = 0.0
-        self.coolant: Optional[Dict[str, float]] = None
+        self.coolant: Optional[CoolantState] = None
 
         if self.type in ("CNC_MILL", "LATHE"):
             self.currentTool = 1
             self.tools = self._initialize_tools()
             self.toolChangeCount = 0
             self.toolWear = 0.0
-            self.coolant = {
-                "level": 100.0,
-                "pressure": 50.0,
-                "temperature": 72.0,
-                "flow": 0.0,
-            }
+            self.coolant = CoolantState(level=100.0, pressure=50.0, temperature=72.0, flow=0.0)
 
         # === PRESS BRAKE SPECIFIC ===
         self.tonnage: float = 0.0
@@ -122,40 +305,32 @@ class HaasMachine:
         self.programRunning: Optional[str] = None
         self.timestamp: datetime = datetime.utcnow()
 
+        # === WAITING STATES ===
+        # Ticks left until an idle machine starts a cycle / an alarm
+        # auto-clears; None = not drawn yet
+        self.startCountdown: Optional[int] = None
+        self.recoveryCountdown: Optional[int] = None
+
+        # === DIRTY-FIELD TRACKING (see to_delta) ===
+        self.version: int = 0                      # bumped by each to_delta() that finds a change
+        self.fieldVersions: Dict[str, int] = {}    # to_dict() key -> version it last changed in
+        self.emitted: Dict[str, Any] = {}          # to_dict() as of `version`
+
     # ========================================
     # TOOL INITIALIZATION
     # ========================================
 
-    def _initialize_tools(self) -> List[Dict[str, Any]]:
-        tools: List[Dict[str, Any]] = []
+    def _initialize_tools(self) -> ToolTable:
         count = self.specs["toolCapacity"] if self.type == "CNC_MILL" else 12
-        tool_types = ["DRILL", "END_MILL", "FACE_MILL", "REAMER", "TAP", "BORING_BAR"]
-        coatings = ["TiN", "TiCN", "AlTiN", "Uncoated"]
-
-        for i in range(1, count + 1):
-            tools.append(
-                {
-                    "number": i,
-                    "type": random.choice(tool_types),
-                    "diameter": round(random.random() * 20 + 2, 2),
-                    "length": round(random.random() * 100 + 50, 2),
-                    "currentLife": 100 - random.random() * 80,
-                    "maxLife": 100,
-                    "flutes": random.randint(2, 5),
-                    "coating": random.choice(coatings),
-                    "description": f"Tool {i}",
-                    "inUse": False,
-                    "totalCuts": 0,
-                }
-            )
-        return tools
+        return ToolTable.random(count, self.rng)
 
     # ========================================
     # MAIN UPDATE LOOP
     # ========================================
 
-    def update(self, dt_sec: float) -> None:
-        self.timestamp = datetime.utcnow()
+    def update(self, dt_sec: float, now: Optional[datetime] = None) -> None:
+        """Advance dt_sec of machine time; `now` stamps the new state (default: wall clock)"""
+        self.timestamp = now if now is not None else datetime.utcnow()
 
         if not self.power:
             self.execution = "STOPPED"
@@ -175,8 +350,11 @@ class HaasMachine:
             self.spindleSpeed = max(0.0, self.spindleSpeed - 500.0 * dt_sec)
             self.feedRate = 0.0
 
-            # Auto-recovery (2% chance)
-            if random.random() < 0.02:
+            # Auto-recovery (2% chance per tick)
+            if self.recoveryCountdown is None:
+                self.recoveryCountdown = ticks_until(RECOVERY_CHANCE, self.rng)
+            self.recoveryCountdown -= 1
+            if self.recoveryCountdown <= 0:
                 self._clear_alarm()
             return
 
@@ -225,23 +403,33 @@ class HaasMachine:
 
         # Coolant recovery
         if self.coolant is not None:
-            self.coolant["level"] = min(100.0, self.coolant["level"] + 0.1)
-            self.coolant["flow"] = 0.0
+            self.coolant.level = min(100.0, self.coolant.level + 0.1)
+            self.coolant.flow = 0.0
 
-        # Start new cycle (5% chance)
-        if random.random() < 0.05:
+        # Start new cycle (5% chance per tick)
+        if self._start_due():
             self._start_new_cycle()
 
+    def _start_due(self) -> bool:
+        """Count down one idle tick; True when the next cycle starts now"""
+        if self.startCountdown is None:
+            self.startCountdown = ticks_until(START_CHANCE[self.type], self.rng)
+        self.startCountdown -= 1
+        if self.startCountdown > 0:
+            return False
+        self.startCountdown = None
+        return True
+
     def _start_new_cycle(self) -> None:
         self.cyclePhase = "SPINDLE_RAMP"
         self.execution = "RUNNING"
         self.timeInPhase = 0.0
-        self.cycleTimeTarget = 20 + random.random() * 25
-        self.targetSpindleSpeed = 3000 + random.random() * (self.specs["maxRPM"] - 3000)
-        self.targetFeed = 300 + random.random() * 1500
+        self.cycleTimeTarget = 20 + self.rng.random() * 25
+        self.targetSpindleSpeed = 3000 + self.rng.random() * (self.specs["maxRPM"] - 3000)
+        self.targetFeed = 300 + self.rng.random() * 1500
 
         if not self.programRunning:
-            self.programRunning = f"O{random.randint(1000, 9999)}"
+            self.programRunning = f"O{self.rng.randint(1000, 9999)}"
 
     def _phase_spindle_ramp(self, dt_sec: float) -> None:
         self.execution = "RUNNING"
@@ -265,13 +453,13 @@ class HaasMachine:
         limits = self.specs["axisLimits"]
 
         # G0: random position
-        self.axisPositions["X"] = limits["X"][0] + random.random() * (limits["X"][1] - limits["X"][0])
-        self.axisPositions["Y"] = limits["Y"][0] + random.random() * (limits["Y"][1] - limits["Y"][0])
-        self.axisPositions["Z"] = limits["Z"][1]
+        self.axisPositions.X = limits["X"][0] + self.rng.random() * (limits["X"][1] - limits["X"][0])
+        self.axisPositions.Y = limits["Y"][0] + self.rng.random() * (limits["Y"][1] - limits["Y"][0])
+        self.axisPositions.Z = limits["Z"][1]
 
         self.rapidRate = self.specs["rapidTraverse"]
         self.feedRate = 0.0
-        self.spindleLoad = 5.0 + random.random() * 5.0
+        self.spindleLoad = 5.0 + self.rng.random() * 5.0
 
         if self.timeInPhase >= 3.0:
             self.cyclePhase = "CUTTING"
@@ -290,15 +478,15 @@ class HaasMachine:
         # Z descent
         limits = self.specs["axisLimits"]
         if self.targetFeed > 0:
-            self.axisPositions["Z"] -= 1.0 * dt_sec * (self.feedRate / self.targetFeed)
-        if self.axisPositions["Z"] < limits["Z"][0] + 5.0:
-            self.axisPositions["Z"] = limits["Z"][0] + 5.0
+            self.axisPositions.Z -= 1.0 * dt_sec * (self.feedRate / self.targetFeed)
+        if self.axisPositions.Z < limits["Z"][0] + 5.0:
+            self.axisPositions.Z = limits["Z"][0] + 5.0
 
         # Spindle load
         base_load = (self.feedRate / 1800.0) * 35.0
         wear_load = self.toolWear * 50.0
         vib_load = self.vibration * 8.0
-        noise = random.random() * 4.5 - 2.0
+        noise = self.rng.random() * 4.5 - 2.0
 
         self.spindleLoad = max(0.0, min(100.0, base_load + wear_load + vib_load + noise))
 
@@ -307,7 +495,7 @@ class HaasMachine:
         self.toolWear = min(self.toolWear, 1.0)
 
         # Vibration
-        self.vibration = self.toolWear * 3.0 + random.random() * 0.4
+        self.vibration = self.toolWear * 3.0 + self.rng.random() * 0.4
 
         # Spindle hours
         if self.spindleSpeed > 300.0:
@@ -317,27 +505,28 @@ class HaasMachine:
         if self.tools is not None and self.currentTool is not None:
             idx = self.currentTool - 1
             if 0 <= idx < len(self.tools):
-                tool = self.tools[idx]
-                tool["currentLife"] = max(0.0, tool["currentLife"] - random.random() * 0.02)
-                tool["inUse"] = True
-                tool["totalCuts"] += 1
+                tools = self.tools
+                tools.currentLife[idx] = max(0.0, tools.currentLife[idx] - self.rng.random() * 0.02)
+                tools.inUse[idx] = True
+                tools.totalCuts[idx] += 1
+                tools.dirty.add(idx)
 
         # Coolant consumption
         if self.coolant is not None:
-            self.coolant["level"] = max(0.0, self.coolant["level"] - random.random() * 0.08)
-            self.coolant["pressure"] = 45.0 + random.random() * 15.0
-            self.coolant["temperature"] = 72.0 + random.random() * 15.0
-            self.coolant["flow"] = 5.0 + random.random() * 3.0
+            self.coolant.level = max(0.0, self.coolant.level - self.rng.random() * 0.08)
+            self.coolant.pressure = 45.0 + self.rng.random() * 15.0
+            self.coolant.temperature = 72.0 + self.rng.random() * 15.0
+            self.coolant.flow = 5.0 + self.rng.random() * 3.0
 
         # Servo loads
-        self.servoLoad["X"] = 20.0 + random.random() * 30.0
-        self.servoLoad["Y"] = 20.0 + random.random() * 30.0
-        self.servoLoad["Z"] = 30.0 + self.spindleLoad * 0.5
+        self.servoLoad.X = 20.0 + self.rng.random() * 30.0
+        self.servoLoad.Y = 20.0 + self.rng.random() * 30.0
+        self.servoLoad.Z = 30.0 + self.spindleLoad * 0.5
 
         # Following error simulation
-        self.servoFollowingError["X"] = random.random() * 0.002
-        self.servoFollowingError["Y"] = random.random() * 0.002
-        self.servoFollowingError["Z"] = random.random() * 0.003
+        self.servoFollowingError.X = self.rng.random() * 0.002
+        self.servoFollowingError.Y = self.rng.random() * 0.002
+        self.servoFollowingError.Z = self.rng.random() * 0.003
 
         # Cycle completion
         if self.timeInPhase >= self.cycleTimeTarget * 0.6:
@@ -348,9 +537,9 @@ class HaasMachine:
         self.execution = "RUNNING"
         limits = self.specs["axisLimits"]
 
-        self.axisPositions["Z"] += 4.0 * dt_sec
-        if self.axisPositions["Z"] >= limits["Z"][1] - 10.0:
-            self.axisPositions["Z"] = limits["Z"][1] - 10.0
+        self.axisPositions.Z += 4.0 * dt_sec
+        if self.axisPositions.Z >= limits["Z"][1] - 10.0:
+            self.axisPositions.Z = limits["Z"][1] - 10.0
             self.cyclePhase = "DWELL"
             self.timeInPhase = 0.0
 
@@ -377,7 +566,8 @@ class HaasMachine:
         if self.tools is not None and self.currentTool is not None:
             idx = self.currentTool - 1
             if 0 <= idx < len(self.tools):
-                self.tools[idx]["inUse"] = False
+                self.tools.inUse[idx] = False
+                self.tools.dirty.add(idx)
 
         if self.machineOnHours > 0:
             self.productionRate = round(self.partCount / self.machineOnHours)
@@ -390,18 +580,18 @@ class HaasMachine:
     # ========================================
 
     def _update_press_cycle(self, dt_sec: float) -> None:
-        if self.cyclePhase == "IDLE" and random.random() < 0.05:
+        if self.cyclePhase == "IDLE" and self._start_due():
             self.cyclePhase = "RUNNING"
             self.execution = "RUNNING"
             self.timeInPhase = 0.0
-            self.bendAngle = 45.0 + random.random() * 90.0
+            self.bendAngle = 45.0 + self.rng.random() * 90.0
 
         if self.cyclePhase == "RUNNING":
             self.execution = "RUNNING"
             self.ramPosition = min(100.0, self.ramPosition + 20.0 * dt_sec)
             self.tonnage = (self.ramPosition / 100.0) * (self.maxTonnage * 0.8)
             self.spindleLoad = (self.tonnage / self.maxTonnage) * 100.0
-            self.servoLoad["Y"] = self.tonnage / self.maxTonnage * 80.0
+            self.servoLoad.Y = self.tonnage / self.maxTonnage * 80.0
 
             if self.timeInPhase >= 5.0:
                 self.partCount += 1
@@ -421,12 +611,12 @@ class HaasMachine:
     # ========================================
 
     def _update_laser_cycle(self, dt_sec: float) -> None:
-        if self.cyclePhase == "IDLE" and random.random() < 0.07:
+        if self.cyclePhase == "IDLE" and self._start_due():
             self.cyclePhase = "RUNNING"
             self.execution = "RUNNING"
             self.timeInPhase = 0.0
-            self.laserPower = 2000.0 + random.random() * (self.maxLaserPower - 2000.0)
-            self.targetFeed = 800.0 + random.random() * 2200.0
+            self.laserPower = 2000.0 + self.rng.random() * (self.maxLaserPower - 2000.0)
+            self.targetFeed = 800.0 + self.rng.random() * 2200.0
 
         if self.cyclePhase == "RUNNING":
             self.execution = "RUNNING"
@@ -439,8 +629,8 @@ class HaasMachine:
 
             self.feedRate = self.cutSpeed
 
-            self.axisPositions["X"] += random.random() * 10.0 - 5.0
-            self.axisPositions["Y"] += random.random() * 10.0 - 5.0
+            self.axisPositions.X += self.rng.random() * 10.0 - 5.0
+            self.axisPositions.Y += self.rng.random() * 10.0 - 5.0
 
             self.resonatorTemp += (self.laserPower / self.maxLaserPower) * 0.4
 
@@ -479,71 +669,45 @@ class HaasMachine:
             self.batteryVoltage = 2.8
 
         # Oil system
-        self.oilPressure = 45.0 + random.random() * 10.0
+        self.oilPressure = 45.0 + self.rng.random() * 10.0
         self.oilLevel = max(20.0, self.oilLevel - 0.001)
 
         # Servo temperatures
         if self.execution == "RUNNING":
-            for axis in ("X", "Y", "Z"):
-                self.servoTemp[axis] = min(65.0, self.servoTemp[axis] + 0.1)
+            servo = self.servoTemp
+            servo.X = min(65.0, servo.X + 0.1)
+            servo.Y = min(65.0, servo.Y + 0.1)
+            servo.Z = min(65.0, servo.Z + 0.1)
         else:
-            for axis in ("X", "Y", "Z"):
-                self.servoTemp[axis] = max(25.0, self.servoTemp[axis] - 0.05)
+            servo = self.servoTemp
+            servo.X = max(25.0, servo.X - 0.05)
+            servo.Y = max(25.0, servo.Y - 0.05)
+            servo.Z = max(25.0, servo.Z - 0.05)
 
     # ========================================
     # ALARM SYSTEM
     # ========================================
 
     def _check_alarms(self) -> None:
-        if self.type in ("CNC_MILL", "LATHE"):
-            # Axis following error
-            if self.servoFollowingError["X"] > 0.005 and random.random() < 0.02:
-                self._set_alarm(103, "X AXIS FOLLOWING ERROR")
-            elif self.servoFollowingError["Y"] > 0.005 and random.random() < 0.02:
-                self._set_alarm(104, "Y AXIS FOLLOWING ERROR")
-            elif self.servoFollowingError["Z"] > 0.005 and random.random() < 0.02:
-                self._set_alarm(105, "Z AXIS FOLLOWING ERROR")
-            # Low battery
-            elif self.batteryVoltage < 3.0 and random.random() < 0.05:
-                self._set_alarm(9100, "LOW BATTERY")
-            # Coolant pump fault
-            elif self.coolant is not None and self.coolant["level"] < 10.0 and random.random() < 0.1:
-                self._set_alarm(115, "COOLANT PUMP FAULT")
-            # Spindle overload
-            elif self.spindleLoad > 95.0 and random.random() < 0.05:
-                self._set_alarm(None, "SPINDLE_OVERLOAD")
-            # High temperature
-            elif self.spindleTemp > 85.0 and random.random() < 0.08:
-                self._set_alarm(200, "SPINDLE OVER TEMP")
-            # Tool life expired
-            elif self.tools is not None and self.currentTool is not None:
-                idx = self.currentTool - 1
-                if 0 <= idx < len(self.tools):
-                    tool = self.tools[idx]
-                    if tool["currentLife"] < 5.0 and random.random() < 0.15:
-                        self._set_alarm(None, "TOOL_LIFE_EXPIRED")
-            # High vibration
-            elif self.vibration > 5.0 and random.random() < 0.08:
-                self._set_alarm(None, "HIGH_VIBRATION")
-
-        if self.type == "PRESS_BRAKE":
-            if self.tonnage > self.maxTonnage * 0.9 and random.random() < 0.1:
-                self._set_alarm(None, "OVER_TONNAGE")
+        alarm_rules.active().check_alarms(self, self.rng, self._fire_alarm_rule)
 
-        if self.type == "LASER":
-            if self.spindleLoad > 95.0 and random.random() < 0.1:
-                self._set_alarm(None, "LASER_POWER_FAULT")
-            if self.resonatorTemp > 85.0 and random.random() < 0.08:
-                self._set_alarm(None, "RESONATOR_OVERHEAT")
+    def _fire_alarm_rule(self, rule: Rule) -> None:
+        self._set_alarm(rule.code, rule.name)
 
     def _set_alarm(self, code: Optional[int], message: str) -> None:
+        if self.alarm:
+            # A new alarm replaces the active one: close it first
+            self._emit_alarm_event("CLEARED")
         self.alarm = message
         self.alarmCode = code
+        self.alarmRaisedAt = self.timestamp
+        self.recoveryCountdown = None
+        self._emit_alarm_event("RAISED")
         self.alarmHistory.append(
             {
                 "code": code,
                 "message": message,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": self.timestamp.isoformat() + "Z",
                 "cyclePhase": self.cyclePhase,
                 "spindleLoad": self.spindleLoad,
                 "cleared": False,
@@ -555,50 +719,263 @@ class HaasMachine:
 
     def _clear_alarm(self) -> None:
         if self.alarmHistory:
-            self.alarmHistory[-1]["cleared"] = True
+            # A new entry, not an in-place edit: published snapshots are diffed
+            self.alarmHistory[-1] = {**self.alarmHistory[-1], "cleared": True}
+        if self.alarm:
+            self._emit_alarm_event("CLEARED")
         self.alarm = None
         self.alarmCode = None
+        self.alarmRaisedAt = None
+        self.recoveryCountdown = None
         self.execution = "IDLE"
 
+    def _emit_alarm_event(self, event: str) -> None:
+        now = self.timestamp
+        self.alarmEvents.append(
+            {
+                "event": event,
+                "machineId": self.id,
+                "machineName": self.name,
+                "code": self.alarmCode,
+                "message": self.alarm,
+                "timestamp": now,
+                "raisedAt": self.alarmRaisedAt,
+                "durationSeconds": (
+                    (now - self.alarmRaisedAt).total_seconds()
+                    if event == "CLEARED" and self.alarmRaisedAt is not None else None
+                ),
+                "cyclePhase": self.cyclePhase,
+                "spindleLoad": self.spindleLoad,
+            }
+        )
+        # Nobody draining (standalone simulator): keep it bounded
+        if len(self.alarmEvents) > 1000:
+            self.alarmEvents = self.alarmEvents[-1000:]
+
+    def drain_alarm_events(self) -> List[Dict[str, Any]]:
+        """Return and forget the alarm transitions recorded since the last call"""
+        events = self.alarmEvents
+        self.alarmEvents = []
+        return events
+
     # ========================================
     # WARNING SYSTEM
     # ========================================
 
     def _update_warnings(self) -> None:
-        self.warnings = []
+        rules = alarm_rules.active()
+        type_rules = rules.warnings_for(self.type)
+        if type_rules is not self.warningRules:
+            self._remap_warnings(type_rules)
+        active = self.warningBits
+        held = rules.check_warnings(self, active)
+        if held != active or self.warningPending:
+            self._warning_transitions(type_rules, held)
+        if self.warningBits != active or self.warningBits & rules.templated(self.type):
+            bits = self.warningBits
+            self.warnings = [
+                rule.warning(self.currentTool) for k, rule in enumerate(type_rules) if bits >> k & 1
+            ]
+
+    def _warning_transitions(self, rules: Tuple[Rule, ...], held: int) -> None:
+        """Flip the warnings whose state has differed for `debounce` ticks"""
+        pending = self.warningPending
+        changed = held ^ self.warningBits
+        for k, rule in enumerate(rules):
+            bit = 1 << k
+            if not changed & bit:
+                pending.pop(bit, None)
+                continue
+            count = pending.get(bit, 0) + 1
+            if count < rule.debounce:
+                pending[bit] = count
+                continue
+            pending.pop(bit, None)
+            self.warningBits ^= bit
+            self._emit_warning_event(rule, "RAISED" if held & bit else "CLEARED")
+
+    def _remap_warnings(self, rules: Tuple[Rule, ...]) -> None:
+        """Carry active warnings over to a reloaded rule set, by name"""
+        positions = {rule.name: k for k, rule in enumerate(rules)}
+        bits = 0
+        for k, rule in enumerate(self.warningRules):
+            if not self.warningBits >> k & 1:
+                continue
+            if rule.name in positions:
+                bits |= 1 << positions[rule.name]
+            else:
+                self._emit_warning_event(rule, "CLEARED")
+        self.warningBits = bits
+        self.warningPending = {}
+        self.warningRules = rules
+        # Force a rebuild of the list: messages or severities may have changed
+        self.warnings = [rules[k].warning(self.currentTool) for k in range(len(rules)) if bits >> k & 1]
+
+    def _emit_warning_event(self, rule: Rule, event: str) -> None:
+        value = rule.conditions[0].value(self)
+        self.warningEvents.append(
+            {
+                "event": event,
+                "machineId": self.id,
+                "machineName": self.name,
+                "type": rule.name,
+                "severity": rule.severity,
+                "message": rule.warning(self.currentTool)["message"],
+                "value": value if value == value else None,
+                "timestamp": self.timestamp,
+            }
+        )
+        if len(self.warningEvents) > 1000:
+            self.warningEvents = self.warningEvents[-1000:]
 
-        if self.batteryVoltage < 3.2:
-            self.warnings.append(
-                {"type": "BATTERY_LOW", "severity": "warning", "message": "Battery voltage low"}
-            )
+    def drain_warning_events(self) -> List[Dict[str, Any]]:
+        """Return and forget the warning transitions recorded since the last call"""
+        events = self.warningEvents
+        self.warningEvents = []
+        return events
 
-        if self.coolant is not None and self.coolant["level"] < 20.0:
-            self.warnings.append(
-                {"type": "COOLANT_LOW", "severity": "warning", "message": "Coolant level below 20%"}
-            )
+    # ========================================
+    # NEXT-EVENT SUPPORT (see scheduler.py)
+    # ========================================
 
-        if self.tools is not None and self.currentTool is not None:
-            idx = self.currentTool - 1
-            if 0 <= idx < len(self.tools):
-                tool = self.tools[idx]
-                if tool["currentLife"] < 15.0:
-                    self.warnings.append(
-                        {
-                            "type": "TOOL_WEAR",
-                            "severity": "warning",
-                            "message": f"Tool {self.currentTool} life below 15%",
-                        }
-                    )
-
-        if self.spindleTemp > 75.0:
-            self.warnings.append(
-                {"type": "HIGH_TEMP", "severity": "warning", "message": "Spindle temperature elevated"}
-            )
+    def quiet_ticks(self, dt_sec: float) -> Optional[int]:
+        """How many upcoming update(dt_sec) calls only apply deterministic decay.
 
-        if self.spindleLoad > 85.0:
-            self.warnings.append(
-                {"type": "HIGH_LOAD", "severity": "caution", "message": "Spindle load above 85%"}
-            )
+        True while the machine is off (None: until a manual control), in an
+        alarm waiting to auto-clear, or idle waiting for its next cycle with
+        no alarm condition able to fire and no warning about to change. Those
+        ticks can be applied later, in one go, with advance_quiet().
+        """
+        if not self.power:
+            return None
+        if self.alarm:
+            return max(0, self.recoveryCountdown - 1) if self.recoveryCountdown is not None else 0
+        if self.cyclePhase != "IDLE" or self.startCountdown is None:
+            return 0
+
+        rules = alarm_rules.active()
+        ticks = self.startCountdown - 1
+        for rule in rules.alarms_for(self.type):
+            if rule.holds(self):
+                return 0
+            ticks = min(ticks, self._ticks_until_all(rule.conditions, dt_sec))
+
+        # Warnings: wake for the tick that raises or clears one
+        type_rules = rules.warnings_for(self.type)
+        if self.warningPending or type_rules is not self.warningRules:
+            return 0
+        for k, rule in enumerate(type_rules):
+            if self.warningBits >> k & 1:
+                for condition in rule.exit_conditions:
+                    ticks = min(ticks, self._ticks_keeping(condition, condition.value(self), dt_sec))
+            else:
+                ticks = min(ticks, self._ticks_until_all(rule.conditions, dt_sec))
+        return max(0, ticks)
+
+    def _ticks_until_all(self, conditions: Tuple[Condition, ...], dt_sec: float) -> float:
+        """Quiet ticks during which `conditions` (not all holding now) surely still won't (inf: never)"""
+        soonest = 0
+        for condition in conditions:
+            value = condition.value(self)
+            if value != value:
+                return math.inf   # metric not present: never met
+            if condition.compare(value, condition.threshold):
+                continue
+            if QUIET_DRIFT.get(condition.metric, ()) is None:
+                return 0
+            # All conditions must hold: the last one to get there decides
+            soonest = max(soonest, self._ticks_keeping(condition, value, dt_sec))
+        return soonest
+
+    def _ticks_keeping(self, condition: Condition, value: float, dt_sec: float) -> float:
+        """Quiet ticks during which `condition` keeps its current truth value (inf: for good)"""
+        if value != value:
+            return math.inf
+        drift = QUIET_DRIFT.get(condition.metric, (0.0, 0.0, 0.0))
+        if drift is None:
+            return 0
+        per_tick, per_second, bound = drift
+        rate = per_tick + per_second * dt_sec
+        holds = condition.compare(value, condition.threshold)
+        falling = condition.op in ("<", "<=")
+        if rate == 0 or ((rate < 0) == falling) == holds or condition.compare(bound, condition.threshold) == holds:
+            return math.inf   # moves away from the threshold, or stops short of it
+        gap = abs(value - condition.threshold) / abs(rate)
+        # Strict ops flip once past the threshold, the others once it is reached
+        reached = math.ceil(gap) - 1
+        if condition.op in ("<", ">"):
+            return reached if holds else int(gap)
+        return int(gap) if holds else reached
+
+    def advance_quiet(self, ticks: int, dt_sec: float, now: Optional[datetime] = None) -> None:
+        """Apply `ticks` quiet updates (see quiet_ticks) in closed form"""
+        if ticks <= 0:
+            return
+        self.timestamp = now if now is not None else datetime.utcnow()
+        elapsed = ticks * dt_sec
+
+        if not self.power:
+            self.execution = "STOPPED"
+            self.cyclePhase = "IDLE"
+            self.spindleSpeed = 0.0
+            self.spindleLoad = 0.0
+            self.feedRate = 0.0
+            return
+
+        self.machineOnHours += elapsed / 3600.0
+        self.timeInPhase += elapsed
+
+        if self.alarm:
+            self.execution = "ALARM"
+            self.cyclePhase = "IDLE"
+            self.spindleSpeed = max(0.0, self.spindleSpeed - 500.0 * elapsed)
+            self.feedRate = 0.0
+            self.recoveryCountdown -= ticks
+            return
+
+        # Idle, per machine type
+        self.execution = "IDLE"
+        self.startCountdown -= ticks
+        if self.type in ("CNC_MILL", "LATHE"):
+            self.spindleSpeed = max(0.0, self.spindleSpeed - 500.0 * elapsed)
+            self.feedRate = max(0.0, self.feedRate - 500.0 * elapsed)
+            self.spindleLoad = max(0.0, self.spindleLoad - 5.0 * elapsed)
+            if self.coolant is not None:
+                self.coolant.level = min(100.0, self.coolant.level + 0.1 * ticks)
+                self.coolant.flow = 0.0
+        elif self.type == "PRESS_BRAKE":
+            self.spindleLoad = 0.0
+            self.tonnage = 0.0
+        elif self.type == "LASER":
+            self.spindleLoad = 0.0
+            self.cutSpeed = 0.0
+            self.feedRate = 0.0
+            self.resonatorTemp = max(26.0, self.resonatorTemp - 0.05 * ticks)
+
+        # Health sensors, not-running branch
+        self.temperature = max(72.0, self.temperature - 0.2 * ticks)
+        self.spindleTemp = max(25.0, self.spindleTemp - 0.03 * ticks)
+        self.currentAmps = max(7.0, self.currentAmps - 0.5 * ticks)
+        self.batteryVoltage = max(2.8, self.batteryVoltage - 0.0001 * elapsed)
+        self.oilPressure = 45.0 + self.rng.random() * 10.0  # only the last tick's reading shows
+        self.oilLevel = max(20.0, self.oilLevel - 0.001 * ticks)
+        servo = self.servoTemp
+        servo.X = max(25.0, servo.X - 0.05 * ticks)
+        servo.Y = max(25.0, servo.Y - 0.05 * ticks)
+        servo.Z = max(25.0, servo.Z - 0.05 * ticks)
+
+        self._update_warnings()
+
+    # ========================================
+    # RANDOM STREAM
+    # ========================================
+
+    def rng_state(self) -> Any:
+        """Snapshot of the random stream; restore_rng_state() replays from here"""
+        return self.rng.getstate()
+
+    def restore_rng_state(self, state: Any) -> None:
+        self.rng.setstate(state)
 
     # ========================================
     # MANUAL CONTROLS
@@ -620,13 +997,21 @@ class HaasMachine:
     # JSON / DICT OUTPUT
     # ========================================
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, tools: bool = True) -> Dict[str, Any]:
+        """API/WebSocket payload; tools=False leaves out the per-tool list (samples don't need it)"""
         data: Dict[str, Any] = {
             "id": self.id,
             "name": self.name,
             "model": self.model,
             "type": self.type,
             "specs": self.specs,
+        }
+        self._live_fields(data, tools)
+        return data
+
+    def _live_fields(self, data: Dict[str, Any], tools: bool) -> None:
+        """to_dict() after the static id, name, model, type and specs"""
+        data.update({
             "power": self.power,
             "execution": self.execution,
             "cyclePhase": self.cyclePhase,
@@ -642,13 +1027,13 @@ class HaasMachine:
             "feedRate": round(self.feedRate),
             "rapidRate": round(self.rapidRate),
             "axisPositions": {
-                "X": round(self.axisPositions["X"], 2),
-                "Y": round(self.axisPositions["Y"], 2),
-                "Z": round(self.axisPositions["Z"], 2),
+                "X": round(self.axisPositions.X, 2),
+                "Y": round(self.axisPositions.Y, 2),
+                "Z": round(self.axisPositions.Z, 2),
             },
-            "servoLoad": self.servoLoad,
-            "servoFollowingError": self.servoFollowingError,
-            "servoTemp": self.servoTemp,
+            "servoLoad": self.servoLoad.to_dict(),
+            "servoFollowingError": self.servoFollowingError.to_dict(),
+            "servoTemp": self.servoTemp.to_dict(),
             "partCount": self.partCount,
             "totalCycles": self.totalCycles,
             "machineOnHours": round(self.machineOnHours, 3),
@@ -660,14 +1045,15 @@ class HaasMachine:
             "oilPressure": round(self.oilPressure),
             "oilLevel": round(self.oilLevel),
             "timestamp": self.timestamp.isoformat() + "Z",
-        }
+        })
 
         if self.type in ("CNC_MILL", "LATHE"):
             data["currentTool"] = self.currentTool
-            data["tools"] = self.tools
+            if tools:
+                data["tools"] = self.tools.to_list() if self.tools is not None else None
             data["toolChangeCount"] = self.toolChangeCount
             data["toolWear"] = round(self.toolWear, 3)
-            data["coolant"] = self.coolant
+            data["coolant"] = self.coolant.to_dict() if self.coolant is not None else None
 
         if self.type == "PRESS_BRAKE":
             data["tonnage"] = round(self.tonnage)
@@ -688,19 +1074,82 @@ class HaasMachine:
         if self.programRunning is not None:
             data["programRunning"] = self.programRunning
 
-        return data
+    # ========================================
+    # DIRTY-FIELD TRACKING
+    # ========================================
+
+    def to_delta(self, since: int) -> Dict[str, Any]:
+        """The to_dict() fields that changed after this machine's version `since`
+        (0: all of them); a field the machine no longer has is deltas.DROPPED.
+
+        Each call first records what changed since the previous one: specs
+        never change, only the tools written since are rebuilt, the other
+        fields are compared with what was emitted last.
+        """
+        emitted = self.emitted
+        previous = self.version
+        tools = self.tools
+        if not emitted:
+            current = self.to_dict()
+        else:
+            current = {}
+            self._live_fields(current, tools=False)
+            if tools is not None and tools.dirty:
+                tool_list = list(emitted["tools"])
+                for i in tools.dirty:
+                    tool_list[i] = tools.tool_dict(i)
+                current["tools"] = tool_list
+        if tools is not None:
+            tools.dirty.clear()
+
+        changed = [key for key, value in current.items() if emitted.get(key, _UNSET) != value]
+        # Only a conditional field (programRunning) can go; count before scanning
+        kept = sum(1 for key in _KEPT_FIELDS if key in emitted and key not in current)
+        dropped = []
+        if len(emitted) > len(current) + kept:
+            dropped = [key for key in emitted if key not in current and key not in _KEPT_FIELDS]
+        if changed or dropped:
+            self.version += 1
+            versions = self.fieldVersions
+            for key in changed:
+                emitted[key] = current[key]
+                versions[key] = self.version
+            for key in dropped:
+                del emitted[key]
+                versions[key] = self.version
+
+        if since <= 0:
+            return dict(emitted)
+        if since == previous:
+            # The usual caller: exactly what this call found
+            fields = {key: current[key] for key in changed}
+            for key in dropped:
+                fields[key] = DROPPED
+            return fields
+        return {key: emitted.get(key, DROPPED) for key, at in self.fieldVersions.items() if at > since}
+
 
 # ========================================
 # FACTORY: 6 MACHINES WE'VE BEEN USING
 # ========================================
 
-def create_default_machines() -> Dict[str, HaasMachine]:
+def create_default_machines(fleet_seed: Optional[int] = None, copy: int = 1) -> Dict[str, HaasMachine]:
+    """The 6 default machines; copy k > 1 gets ids/names suffixed _k / #k.
+
+    Ids are final before construction: they key each machine's random stream.
+    """
     machines: Dict[str, HaasMachine] = {}
 
+    def add(machine_id: str, name: str, **kwargs: Any) -> None:
+        if copy > 1:
+            machine_id = f"{machine_id}_{copy}"
+            name = f"{name} #{copy}"
+        machines[machine_id] = HaasMachine(machine_id=machine_id, name=name, fleet_seed=fleet_seed, **kwargs)
+
     # 1) Haas VF-2 - small vertical mill
-    machines["haas_vf2"] = HaasMachine(
-        machine_id="haas_vf2",
-        name="Haas VF-2",
+    add(
+        "haas_vf2",
+        "Haas VF-2",
         model="VF-2",
         mtype="CNC_MILL",
         specs={
@@ -713,9 +1162,9 @@ def create_default_machines() -> Dict[str, HaasMachine]:
     )
 
     # 2) Haas VF-4 - larger mill
-    machines["haas_vf4"] = HaasMachine(
-        machine_id="haas_vf4",
-        name="Haas VF-4",
+    add(
+        "haas_vf4",
+        "Haas VF-4",
         model="VF-4",
         mtype="CNC_MILL",
         specs={
@@ -728,9 +1177,9 @@ def create_default_machines() -> Dict[str, HaasMachine]:
     )
 
     # 3) Toyoda HMC
-    machines["toyoda_hmc"] = HaasMachine(
-        machine_id="toyoda_hmc",
-        name="Toyoda HMC",
+    add(
+        "toyoda_hmc",
+        "Toyoda HMC",
         model="HMC",
         mtype="CNC_MILL",
         specs={
@@ -743,9 +1192,9 @@ def create_default_machines() -> Dict[str, HaasMachine]:
     )
 
     # 4) CNC Lathe
-    machines["cnc_lathe"] = HaasMachine(
-        machine_id="cnc_lathe",
-        name="CNC Lathe",
+    add(
+        "cnc_lathe",
+        "CNC Lathe",
         model="ST-20",
         mtype="LATHE",
         specs={
@@ -758,9 +1207,9 @@ def create_default_machines() -> Dict[str, HaasMachine]:
     )
 
     # 5) Press Brake
-    machines["press_brake"] = HaasMachine(
-        machine_id="press_brake",
-        name="Press Brake 200T",
+    add(
+        "press_brake",
+        "Press Brake 200T",
         model="PRESS",
         mtype="PRESS_BRAKE",
         specs={
@@ -770,9 +1219,9 @@ def create_default_machines() -> Dict[str, HaasMachine]:
     )
 
     # 6) Laser Cutter
-    machines["laser_cut"] = HaasMachine(
-        machine_id="laser_cut",
-        name="Fiber Laser 6kW",
+    add(
+        "laser_cut",
+        "Fiber Laser 6kW",
         model="LASER",
         mtype="LASER",
         specs={
@@ -783,6 +1232,17 @@ def create_default_machines() -> Dict[str, HaasMachine]:
 
     return machines
 
+
+def create_fleet_machines(copies: int = 1, fleet_seed: Optional[int] = None) -> Dict[str, HaasMachine]:
+    """The default machines repeated `copies` times, e.g. for load testing.
+
+    The first copy keeps the default ids; later ones get a _2, _3... suffix.
+    """
+    machines: Dict[str, HaasMachine] = {}
+    for copy in range(1, copies + 1):
+        machines.update(create_default_machines(fleet_seed, copy))
+    return machines
+
 # ========================================
 # SIMPLE LOCAL LOOP (for quick testing)
 # ========================================
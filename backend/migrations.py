@@ -0,0 +1,100 @@
+"""
+Online schema migrations
+Older databases kept every sample in one machine_samples table (first with
+an ISO TEXT timestamp, later with integer epoch-ms `ts`). At startup that
+table is renamed to machine_samples_legacy so the day-partitioned storage
+can take its place; rows are then copied over in small chunks by the
+sample writer thread while the server keeps running.
+"""
+
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from sample_writer import SAMPLE_COLUMNS
+
+
+LEGACY_SAMPLES_TABLE = "machine_samples_legacy"
+
+# Rows copied per writer step; small enough to keep each transaction short
+MIGRATION_CHUNK_ROWS = 20000
+
+# Everything but ts, which legacy rows may still hold as text
+_COPY_COLUMNS = SAMPLE_COLUMNS[1:]
+
+# ISO text (with or without a trailing Z) -> epoch ms
+TEXT_TO_MS_SQL = "CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _columns(c: sqlite3.Cursor, table: str) -> List[str]:
+    return [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+
+
+def table_exists(c: sqlite3.Cursor, table: str) -> bool:
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return c.fetchone() is not None
+
+
+def prepare_sample_migration(c: sqlite3.Cursor) -> bool:
+    """Move a single-table machine_samples out of the way.
+
+    Must run before the machine_samples view is created. Returns True when
+    legacy rows are waiting to be copied (including a migration that was
+    interrupted by a restart).
+    """
+    if table_exists(c, "machine_samples"):
+        c.execute(f"ALTER TABLE machine_samples RENAME TO {LEGACY_SAMPLES_TABLE}")
+        # Only the primary key is needed to copy and delete in id order
+        for index in ("idx_samples_timestamp", "idx_samples_machine",
+                      "idx_samples_machine_ts", "idx_samples_ts"):
+            c.execute(f"DROP INDEX IF EXISTS {index}")
+    return table_exists(c, LEGACY_SAMPLES_TABLE)
+
+
+def legacy_has_text_timestamps(c: sqlite3.Cursor) -> bool:
+    """True for the original TEXT-timestamp schema (rows never summarized)"""
+    return "ts" not in _columns(c, LEGACY_SAMPLES_TABLE)
+
+
+def legacy_ts_expr(c: sqlite3.Cursor) -> str:
+    """SQL expression giving epoch ms for a legacy row"""
+    return TEXT_TO_MS_SQL if legacy_has_text_timestamps(c) else "ts"
+
+
+def migrate_samples_step(
+    conn: sqlite3.Connection,
+    insert_rows: Callable[[sqlite3.Connection, List[Tuple]], None],
+    on_copied: Optional[Callable[[sqlite3.Connection, List[Tuple]], None]] = None,
+) -> bool:
+    """Copy one chunk of legacy rows into the sample storage.
+
+    Rows (SAMPLE_COLUMNS order) are stored with insert_rows(conn, rows) and
+    deleted from the legacy table in the same transaction, so a restart
+    simply resumes. on_copied(conn, rows) sees them inside that
+    transaction, for derived tables the writer's flush hooks would
+    otherwise have maintained. Returns False once the legacy table is gone.
+    """
+    c = conn.cursor()
+    if not table_exists(c, LEGACY_SAMPLES_TABLE):
+        return False
+
+    c.execute(f"SELECT MAX(id) FROM (SELECT id FROM {LEGACY_SAMPLES_TABLE} ORDER BY id LIMIT ?)",
+              (MIGRATION_CHUNK_ROWS,))
+    upto = c.fetchone()[0]
+
+    with conn:
+        if upto is None:
+            conn.execute(f"DROP TABLE {LEGACY_SAMPLES_TABLE}")
+            print("✅ machine_samples migration to day partitions complete")
+            return False
+
+        copied = conn.execute(f"""
+            SELECT {legacy_ts_expr(c)}, {", ".join(_COPY_COLUMNS)}
+            FROM {LEGACY_SAMPLES_TABLE}
+            WHERE id <= ?
+            ORDER BY id
+        """, (upto,)).fetchall()
+        insert_rows(conn, copied)
+        conn.execute(f"DELETE FROM {LEGACY_SAMPLES_TABLE} WHERE id <= ?", (upto,))
+        if on_copied is not None:
+            on_copied(conn, copied)
+    return True
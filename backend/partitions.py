@@ -0,0 +1,170 @@
+"""
+Day-partitioned raw sample storage
+Raw samples live in one table per UTC day (samples_YYYYMMDD) and
+machine_samples is a UNION ALL view over them, rebuilt whenever a partition
+is created or dropped. SQLite pushes the WHERE clause into every arm and
+merges the per-partition index scans, so range queries and keyset
+pagination on the view behave like they did on a single table, while
+expiring a day is a DROP TABLE instead of a huge DELETE.
+
+A compound SELECT may have at most 500 terms in SQLite, so with more
+partitions than that (long or unlimited retention) the view unions
+nested unions of at most VIEW_ARMS partitions each; the WHERE clause is
+still pushed down to every partition's index.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+from sample_writer import SAMPLE_COLUMNS, datetime_to_ms
+
+
+PARTITION_PREFIX = "samples_"
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Terms per compound SELECT in the view (SQLite's limit is 500)
+VIEW_ARMS = 400
+
+# Column declarations, SAMPLE_COLUMNS order (ts = epoch ms, UTC)
+_COLUMN_TYPES = {
+    "ts": "INTEGER NOT NULL",
+    "machine_id": "TEXT NOT NULL",
+    "part_count": "INTEGER",
+    "total_cycles": "INTEGER",
+    "production_rate": "INTEGER",
+    "machine_name": "TEXT",
+    "execution": "TEXT",
+    "cycle_phase": "TEXT",
+    "alarm": "TEXT",
+    "warnings": "TEXT",
+}
+
+_TS_INDEX = SAMPLE_COLUMNS.index("ts")
+
+_VIEW_COLUMNS = ", ".join(("id",) + SAMPLE_COLUMNS)
+
+_INSERT_SQL = "INSERT INTO {} (%s) VALUES (%s)" % (
+    ", ".join(SAMPLE_COLUMNS), ", ".join("?" for _ in SAMPLE_COLUMNS)
+)
+
+
+def day_start(ts_ms: int) -> int:
+    return ts_ms // DAY_MS * DAY_MS
+
+
+def partition_name(ts_ms: int) -> str:
+    """Partition table holding the sample taken at ts_ms"""
+    return PARTITION_PREFIX + datetime.utcfromtimestamp(day_start(ts_ms) / 1000).strftime("%Y%m%d")
+
+
+def partition_day_ms(name: str) -> int:
+    """Start of the UTC day (epoch ms) a partition table covers"""
+    day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d")
+    return int((day - datetime(1970, 1, 1)).total_seconds()) * 1000
+
+
+def union_sql(names: List[str]) -> str:
+    """UNION ALL over the partitions, nested so no compound has more than VIEW_ARMS terms"""
+    if len(names) <= VIEW_ARMS:
+        return " UNION ALL ".join(f"SELECT {_VIEW_COLUMNS} FROM {name}" for name in names)
+    # VIEW_ARMS partitions per arm; larger (and nested again) past VIEW_ARMS arms
+    size = max(VIEW_ARMS, -(-len(names) // VIEW_ARMS))
+    return " UNION ALL ".join(
+        f"SELECT {_VIEW_COLUMNS} FROM ({union_sql(names[k:k + size])})"
+        for k in range(0, len(names), size)
+    )
+
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    """Partition tables, oldest first"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+        (PARTITION_PREFIX + "[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]",),
+    ).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def max_sample_id(conn: sqlite3.Connection) -> int:
+    """Highest sample id handed out so far (0 when there are no samples).
+
+    Read from sqlite_sequence, so no partition is scanned.
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        return 0
+    row = conn.execute(
+        "SELECT MAX(seq) FROM sqlite_sequence WHERE name GLOB ?", (PARTITION_PREFIX + "*",)
+    ).fetchone()
+    return row[0] or 0
+
+
+class SamplePartitions:
+    """Creates, fills and drops the per-day sample tables.
+
+    Used only from the sample writer thread (and init_db before it starts).
+    Partitions use AUTOINCREMENT seeded from the previous highest id, so
+    sample ids stay unique and increasing across the whole view.
+    """
+
+    def __init__(self) -> None:
+        self._known: Set[str] = set()
+
+    def create_view(self, conn: sqlite3.Connection) -> None:
+        """(Re)create the machine_samples view over the current partitions.
+
+        With no partitions yet, today's is created so the view always has
+        a concrete shape.
+        """
+        names = list_partitions(conn)
+        if not names:
+            self.ensure(conn, datetime_to_ms(datetime.utcnow()))
+            return
+        self._known = set(names)
+        conn.execute("DROP VIEW IF EXISTS machine_samples")
+        conn.execute("CREATE VIEW machine_samples AS " + union_sql(names))
+
+    def ensure(self, conn: sqlite3.Connection, ts_ms: int) -> str:
+        """Partition for ts_ms, created (and added to the view) if missing"""
+        name = partition_name(ts_ms)
+        if name in self._known:
+            return name
+
+        first_id = max_sample_id(conn)
+        columns = ",\n".join(
+            f"{column} {_COLUMN_TYPES.get(column, 'REAL')}" for column in SAMPLE_COLUMNS
+        )
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {columns}
+            )
+        """)
+        # (machine_id, ts) serves per-machine range scans; ts serves fleet-wide scans
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_machine_ts ON {name}(machine_id, ts)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_ts ON {name}(ts)")
+        if first_id and not conn.execute(
+            "SELECT 1 FROM sqlite_sequence WHERE name = ?", (name,)
+        ).fetchone():
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, first_id))
+
+        self._known.add(name)
+        self.create_view(conn)
+        return name
+
+    def insert(self, conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+        """Insert SAMPLE_COLUMNS rows, each into the partition for its day"""
+        by_partition: Dict[str, List[Tuple]] = {}
+        for row in rows:
+            by_partition.setdefault(partition_name(row[_TS_INDEX]), []).append(row)
+        for name, partition_rows in by_partition.items():
+            # Created only now, so its id seed covers the rows inserted above
+            if name not in self._known:
+                self.ensure(conn, partition_rows[0][_TS_INDEX])
+            conn.executemany(_INSERT_SQL.format(name), partition_rows)
+
+    def drop(self, conn: sqlite3.Connection, name: str) -> None:
+        """Drop a whole partition and take it out of the view (one transaction)"""
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self._known.discard(name)
+            self.create_view(conn)
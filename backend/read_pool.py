@@ -0,0 +1,254 @@
+"""
+Read-only SQLite connection pool
+Report and history queries run on worker threads against WAL readers so a
+long scan never blocks the event loop (simulation tick, WebSocket pushes).
+Streams (history and export downloads) last as long as the client takes
+to read them, so they have their own connections, threads and limit: a
+few slow downloads can't starve the short queries.
+"""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+
+class QueryTimeout(Exception):
+    """Raised when a pooled query does not finish within its timeout."""
+
+
+class ReadPool:
+    """Fixed set of read-only connections served from a thread pool.
+
+    At most max_concurrent queries run at once; the rest wait on a
+    semaphore. Each query gets a timeout covering both the wait and the
+    execution; on expiry the connection is interrupted so the worker
+    thread is released instead of finishing a scan nobody is waiting for.
+    Streams are limited the same way by max_streams, on max_streams
+    connections of their own.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 4,
+        max_concurrent: Optional[int] = None,
+        timeout: float = 10.0,
+        max_streams: int = 2,
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.max_concurrent = min(max_concurrent or size, size)
+        self.timeout = timeout
+        self.max_streams = max_streams
+
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stream_connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._stream_executor: Optional[ThreadPoolExecutor] = None
+        self._stream_semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+        # === STATS ===
+        self._active = 0
+        self._active_streams = 0
+        self._completed = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._streams = 0
+
+    # ========================================
+    # LIFECYCLE
+    # ========================================
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def start(self) -> None:
+        """Open the connections. The database must already exist (init_db)."""
+        if self._executor is not None:
+            return
+        for _ in range(self.size):
+            self._connections.put(self._connect())
+        for _ in range(self.max_streams):
+            self._stream_connections.put(self._connect())
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="db-read")
+        self._stream_executor = ThreadPoolExecutor(max_workers=max(1, self.max_streams),
+                                                   thread_name_prefix="db-stream")
+
+    def close(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._stream_executor.shutdown(wait=True)
+        self._executor = None
+        self._stream_executor = None
+        for connections in (self._connections, self._stream_connections):
+            while True:
+                try:
+                    connections.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    # ========================================
+    # QUERIES
+    # ========================================
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Run fn(conn, *args, **kwargs) on a pooled read connection."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = asyncio.get_running_loop().time() + timeout
+
+        conn = await self._acquire(timeout)
+        pending: List[Optional["asyncio.Future[Any]"]] = [None]
+        try:
+            return await self._call(conn, lambda: fn(conn, *args, **kwargs), deadline, timeout, pending)
+        finally:
+            self._release_after(conn, pending[0])
+
+    async def stream(
+        self,
+        fn: Callable[..., sqlite3.Cursor],
+        *args: Any,
+        batch_size: int = 500,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[List[sqlite3.Row]]:
+        """Yield fn(conn, *args, **kwargs).fetchmany(batch_size) batches.
+
+        One stream connection (not a query one) is held until the iterator
+        is exhausted or closed (e.g. the client went away); the timeout
+        applies to each batch rather than to the whole stream.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+
+        conn = await self._acquire(timeout, streaming=True)
+        with self._lock:
+            self._streams += 1
+        pending: List[Optional["asyncio.Future[Any]"]] = [None]
+        cursor: Optional[sqlite3.Cursor] = None
+        try:
+            cursor = await self._call(
+                conn, lambda: fn(conn, *args, **kwargs), loop.time() + timeout, timeout, pending,
+                streaming=True,
+            )
+            while True:
+                rows = await self._call(
+                    conn, lambda: cursor.fetchmany(batch_size), loop.time() + timeout, timeout, pending,
+                    streaming=True,
+                )
+                if not rows:
+                    break
+                yield rows
+        finally:
+            self._release_after(conn, pending[0], cursor, streaming=True)
+
+    async def _acquire(self, timeout: float, streaming: bool = False) -> sqlite3.Connection:
+        if self._executor is None:
+            raise RuntimeError("ReadPool is not started")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._stream_semaphore = asyncio.Semaphore(self.max_streams)
+
+        semaphore = self._stream_semaphore if streaming else self._semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            slot = "a stream slot" if streaming else "a connection"
+            raise QueryTimeout(f"Query waited more than {timeout}s for {slot}")
+
+        with self._lock:
+            if streaming:
+                self._active_streams += 1
+            else:
+                self._active += 1
+        connections = self._stream_connections if streaming else self._connections
+        return connections.get_nowait()
+
+    async def _call(
+        self,
+        conn: sqlite3.Connection,
+        call: Callable[[], Any],
+        deadline: float,
+        timeout: float,
+        pending: List[Optional["asyncio.Future[Any]"]],
+        streaming: bool = False,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._stream_executor if streaming else self._executor, call)
+        pending[0] = future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            conn.interrupt()
+            raise QueryTimeout(f"Query exceeded {timeout}s")
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def _release_after(
+        self,
+        conn: sqlite3.Connection,
+        future: Optional["asyncio.Future[Any]"],
+        cursor: Optional[sqlite3.Cursor] = None,
+        streaming: bool = False,
+    ) -> None:
+        # The connection goes back only once the worker is really done
+        # with it; after a timeout that is when interrupt() lands.
+        if future is None or future.done():
+            self._release(conn, future, cursor, streaming)
+        else:
+            future.add_done_callback(lambda done: self._release(conn, done, cursor, streaming))
+
+    def _release(
+        self,
+        conn: sqlite3.Connection,
+        done: Optional["asyncio.Future[Any]"],
+        cursor: Optional[sqlite3.Cursor] = None,
+        streaming: bool = False,
+    ) -> None:
+        if done is not None and not done.cancelled():
+            done.exception()  # mark retrieved; interrupted queries end in an error
+        if cursor is not None:
+            cursor.close()  # ends the read transaction of an abandoned stream
+        with self._lock:
+            if streaming:
+                self._active_streams -= 1
+            else:
+                self._active -= 1
+            self._completed += 1
+        if streaming:
+            self._stream_connections.put(conn)
+            self._stream_semaphore.release()
+        else:
+            self._connections.put(conn)
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': self.size,
+                'max_concurrent': self.max_concurrent,
+                'timeout_seconds': self.timeout,
+                'max_streams': self.max_streams,
+                'active': self._active,
+                'active_streams': self._active_streams,
+                'completed': self._completed,
+                'timeouts': self._timeouts,
+                'errors': self._errors,
+                'streams': self._streams,
+            }
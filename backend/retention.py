@@ -0,0 +1,187 @@
+"""
+Retention and background space reclamation
+Raw samples are kept for a number of whole days and expired by dropping
+their day partitions; rollups are kept longer and expired with short
+primary-key range deletes. Freed pages are handed back to the filesystem
+by incremental vacuum, a few hundred pages per writer step, so the
+database file stays bounded without ever blocking the sample writer.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+import rollups
+from partitions import DAY_MS, SamplePartitions, day_start, list_partitions, partition_day_ms
+from sample_writer import datetime_to_ms
+
+
+# Pages released per incremental_vacuum step (4 KiB pages -> ~1 MiB)
+VACUUM_PAGES_PER_STEP = 256
+
+_AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """Switch the database to auto_vacuum=INCREMENTAL.
+
+    Free for a new database; an existing one needs a single full VACUUM
+    for the setting to take effect, done here once.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+        print("Enabling incremental vacuum (one-off VACUUM)...")
+        conn.execute("VACUUM")
+
+
+class RetentionJob:
+    """Expires old data, then vacuums, as a sample writer background task.
+
+    raw_days / rollup_days[resolution] of 0 keep that data forever. Raw
+    samples are kept for raw_days whole days before today (UTC).
+    """
+
+    def __init__(
+        self,
+        partitions: SamplePartitions,
+        raw_days: int = 7,
+        rollup_days: Optional[Dict[str, int]] = None,
+        vacuum_pages: int = VACUUM_PAGES_PER_STEP,
+    ):
+        self.partitions = partitions
+        self.raw_days = raw_days
+        self.rollup_days = dict(rollup_days or {})
+        self.vacuum_pages = vacuum_pages
+
+        self._lock = threading.Lock()
+        self._steps_iter: Optional[Iterator[bool]] = None
+        self._scheduled = False
+
+        # === STATS ===
+        self._runs = 0
+        self._partitions_dropped = 0
+        self._rollup_rows_deleted = 0
+        self._pages_vacuumed = 0
+        self._last_run_at: Optional[str] = None
+
+    def schedule(self, writer) -> bool:
+        """Queue one pass on the writer thread; False if a pass is still pending"""
+        with self._lock:
+            if self._scheduled:
+                return False
+            self._scheduled = True
+        writer.add_task(self.step)
+        return True
+
+    def step(self, conn: sqlite3.Connection) -> bool:
+        if self._steps_iter is None:
+            self._steps_iter = self._steps(conn)
+        more = False
+        try:
+            more = next(self._steps_iter, False)
+        finally:
+            if not more:
+                self._steps_iter = None
+                with self._lock:
+                    self._scheduled = False
+        return more
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'raw_days': self.raw_days,
+                'rollup_days': dict(self.rollup_days),
+                'runs': self._runs,
+                'running': self._scheduled,
+                'partitions_dropped': self._partitions_dropped,
+                'rollup_rows_deleted': self._rollup_rows_deleted,
+                'pages_vacuumed': self._pages_vacuumed,
+                'last_run_at': self._last_run_at,
+            }
+
+    # ========================================
+    # STEPS (each a short transaction)
+    # ========================================
+
+    def _steps(self, conn: sqlite3.Connection) -> Iterator[bool]:
+        now = datetime_to_ms(datetime.utcnow())
+
+        if self.raw_days > 0:
+            cutoff = day_start(now) - self.raw_days * DAY_MS
+            for name in list_partitions(conn):
+                if partition_day_ms(name) >= cutoff:
+                    break
+                self.partitions.drop(conn, name)
+                with self._lock:
+                    self._partitions_dropped += 1
+                print(f"🗑️ Dropped expired sample partition {name}")
+                yield True
+
+        for resolution, days in self.rollup_days.items():
+            if days > 0:
+                yield from self._expire_rollups(conn, resolution, now - days * DAY_MS)
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                before = conn.execute("PRAGMA page_count").fetchone()[0]
+                conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+                released = before - conn.execute("PRAGMA page_count").fetchone()[0]
+                with self._lock:
+                    self._pages_vacuumed += released
+                if released <= 0:
+                    break
+                yield True
+
+        with self._lock:
+            self._runs += 1
+            self._last_run_at = datetime.utcnow().isoformat()
+
+    def _expire_rollups(self, conn: sqlite3.Connection, resolution: str, cutoff_ms: int) -> Iterator[bool]:
+        """Delete buckets older than cutoff_ms, one machine per transaction.
+
+        Machines are walked on the primary key (machine_id, metric, bucket)
+        so every delete is a range at the front of one (machine, metric).
+        """
+        table = rollups.rollup_table(resolution)
+        machine_id = ''
+        while True:
+            row = conn.execute(
+                f"SELECT machine_id FROM {table} WHERE machine_id > ? ORDER BY machine_id LIMIT 1",
+                (machine_id,),
+            ).fetchone()
+            if row is None:
+                return
+            machine_id = row[0]
+            deleted = 0
+            with conn:
+                for metric in rollups.ROLLUP_METRICS:
+                    deleted += conn.execute(
+                        f"DELETE FROM {table} WHERE machine_id = ? AND metric = ? AND bucket < ?",
+                        (machine_id, metric, cutoff_ms),
+                    ).rowcount
+            with self._lock:
+                self._rollup_rows_deleted += deleted
+            yield True
+
+
+def get_storage_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Database size, free pages and the sample partitions currently kept"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist_count,
+        'size_bytes': page_size * page_count,
+        'free_bytes': page_size * freelist_count,
+        'auto_vacuum': _AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        'partitions': [
+            {'table': name, 'day': datetime.utcfromtimestamp(partition_day_ms(name) / 1000).date().isoformat()}
+            for name in list_partitions(conn)
+        ],
+    }
@@ -0,0 +1,235 @@
+"""
+Incremental 1-minute / 1-hour rollups of machine_samples
+Each flush of the sample writer folds its rows into min/max/sum/count per
+machine, metric and bucket, so charts over long ranges read a few hundred
+rollup rows instead of every raw sample.
+"""
+
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sample_writer import SAMPLE_COLUMNS, ms_to_timestamp
+
+
+# Metrics that can be charted (same names as the machine_samples columns)
+ROLLUP_METRICS = (
+    'spindle_speed',
+    'spindle_load',
+    'spindle_temp',
+    'feed_rate',
+    'temperature',
+    'vibration',
+    'current_amps',
+    'part_count',
+)
+
+# Resolution name -> bucket size in seconds, finest first
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+}
+
+# Samples per RollupBackfill step (one writer transaction)
+BACKFILL_CHUNK_ROWS = 20000
+
+_TS_INDEX = SAMPLE_COLUMNS.index('ts')
+_MACHINE_INDEX = SAMPLE_COLUMNS.index('machine_id')
+_METRIC_INDEXES = [(metric, SAMPLE_COLUMNS.index(metric)) for metric in ROLLUP_METRICS]
+
+
+def rollup_table(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    return f"sample_rollup_{resolution}"
+
+
+def create_rollup_tables(c: sqlite3.Cursor) -> None:
+    for resolution in RESOLUTIONS:
+        c.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} (
+                machine_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (machine_id, metric, bucket)
+            ) WITHOUT ROWID
+        """)
+
+
+def _upsert_sql(table: str) -> str:
+    return f"""
+        INSERT INTO {table} (machine_id, metric, bucket, min_value, max_value, sum_value, count)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(machine_id, metric, bucket) DO UPDATE SET
+            min_value = MIN(min_value, excluded.min_value),
+            max_value = MAX(max_value, excluded.max_value),
+            sum_value = sum_value + excluded.sum_value,
+            count = count + excluded.count
+    """
+
+
+# ========================================
+# INCREMENTAL MAINTENANCE
+# ========================================
+
+def update_rollups(conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+    """Fold a batch of machine_samples rows into every rollup table.
+
+    Aggregates in Python first so each (machine, metric, bucket) costs one
+    upsert per flush, not one per sample. Runs inside the writer's
+    transaction.
+    """
+    for resolution, seconds in RESOLUTIONS.items():
+        bucket_ms = seconds * 1000
+        acc: Dict[Tuple[str, str, int], List[float]] = {}
+
+        for row in rows:
+            bucket = row[_TS_INDEX] // bucket_ms * bucket_ms
+            machine_id = row[_MACHINE_INDEX]
+            for metric, idx in _METRIC_INDEXES:
+                value = row[idx]
+                if value is None:
+                    continue
+                key = (machine_id, metric, bucket)
+                agg = acc.get(key)
+                if agg is None:
+                    acc[key] = [value, value, value, 1]
+                else:
+                    if value < agg[0]:
+                        agg[0] = value
+                    if value > agg[1]:
+                        agg[1] = value
+                    agg[2] += value
+                    agg[3] += 1
+
+        conn.executemany(
+            _upsert_sql(rollup_table(resolution)),
+            [key + tuple(agg) for key, agg in acc.items()],
+        )
+
+
+class RollupBackfill:
+    """Folds samples that predate the rollup tables into them, a chunk per step.
+
+    Registered with SampleWriter.add_task(); only rows with id <= upto_id
+    are read, later ones reach the rollups through the writer's flush hook.
+    Both go through update_rollups(), so a bucket holding old and new
+    samples is merged, never overwritten.
+    """
+
+    def __init__(self, upto_id: int, chunk_rows: int = BACKFILL_CHUNK_ROWS):
+        self.upto_id = upto_id
+        self.chunk_rows = chunk_rows
+        self._after = (-1, -1)   # keyset: (ts, id) of the last row folded
+
+    def step(self, conn: sqlite3.Connection) -> bool:
+        cur = conn.execute(
+            f"SELECT id, {', '.join(SAMPLE_COLUMNS)} FROM machine_samples "
+            "WHERE id <= ? AND (ts, id) > (?, ?) ORDER BY ts, id LIMIT ?",
+            (self.upto_id, *self._after, self.chunk_rows),
+        )
+        chunk = cur.fetchall()
+        if not chunk:
+            print("✅ Rollup backfill complete")
+            return False
+        self._after = (chunk[-1][1], chunk[-1][0])
+        with conn:
+            update_rollups(conn, [row[1:] for row in chunk])
+        return True
+
+
+# ========================================
+# QUERIES
+# ========================================
+
+def choose_resolution(span_seconds: float, points: int) -> Optional[str]:
+    """Coarsest rollup that still yields at least `points` buckets, or None for raw."""
+    best = None
+    for resolution, seconds in RESOLUTIONS.items():
+        if span_seconds / seconds >= points:
+            best = resolution
+    return best
+
+
+def get_rollup_series(
+    conn: sqlite3.Connection,
+    machine_id: str,
+    metric: str,
+    since_ms: int,
+    resolution: str,
+) -> List[Dict]:
+    """Chart series (avg as value, plus min/max/count) from a rollup table"""
+    rows = conn.execute(f"""
+        SELECT bucket, min_value, max_value, sum_value, count
+        FROM {rollup_table(resolution)}
+        WHERE machine_id = ? AND metric = ? AND bucket >= ?
+        ORDER BY bucket ASC
+    """, (machine_id, metric, since_ms // 1000 // RESOLUTIONS[resolution] * RESOLUTIONS[resolution] * 1000))
+
+    return [
+        {
+            'timestamp': ms_to_timestamp(row[0]),
+            'value': round(row[3] / row[4], 3) if row[4] else None,
+            'min': row[1],
+            'max': row[2],
+            'count': row[4],
+        }
+        for row in rows
+    ]
+
+
+def get_rollup_history(
+    conn: sqlite3.Connection,
+    machine_id: str,
+    since_ms: int,
+    resolution: str,
+    limit: Optional[int] = None,
+    before_ms: Optional[int] = None,
+    metrics: Sequence[str] = ROLLUP_METRICS,
+) -> List[Dict]:
+    """All metrics for a machine, one dict per bucket, newest first.
+
+    At most `limit` buckets, all older than before_ms when given (keyset
+    paging: pass the ts of the last bucket already seen).
+    """
+    bucket_ms = RESOLUTIONS[resolution] * 1000
+    where = f"machine_id = ? AND metric IN ({', '.join('?' for _ in metrics)}) AND bucket >= ?"
+    params: List = [machine_id, *metrics, since_ms // bucket_ms * bucket_ms]
+    if before_ms is not None:
+        where += " AND bucket < ?"
+        params.append(before_ms)
+    sql = f"""
+        SELECT bucket, metric, min_value, max_value, sum_value, count
+        FROM {rollup_table(resolution)}
+        WHERE {where}
+        ORDER BY bucket DESC
+    """
+    if limit is not None:
+        # A bucket has at most one row per metric, so this many rows always
+        # hold the newest `limit` buckets in full
+        sql += " LIMIT ?"
+        params.append(limit * len(metrics))
+    rows = conn.execute(sql, params)
+
+    buckets: Dict[int, Dict] = {}
+    for bucket, metric, min_value, max_value, sum_value, count in rows:
+        entry = buckets.get(bucket)
+        if entry is None:
+            if len(buckets) == limit:
+                break
+            entry = buckets[bucket] = {
+                'ts': bucket,
+                'timestamp': ms_to_timestamp(bucket),
+                'machine_id': machine_id,
+                'resolution': resolution,
+            }
+        entry[metric] = {
+            'min': min_value,
+            'max': max_value,
+            'avg': round(sum_value / count, 3) if count else None,
+            'count': count,
+        }
+    return list(buckets.values())
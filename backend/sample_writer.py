@@ -0,0 +1,423 @@
+"""
+Batched SQLite sample writer
+One long-lived connection fed by a bounded queue; every flush is a single
+executemany() transaction instead of one connect/INSERT/commit per sample.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+SAMPLE_COLUMNS = (
+    "ts", "machine_id", "machine_name", "execution", "cycle_phase",
+    "spindle_speed", "spindle_load", "spindle_temp",
+    "feed_rate", "rapid_rate",
+    "axis_x", "axis_y", "axis_z",
+    "servo_load_x", "servo_load_y", "servo_load_z",
+    "temperature", "current_amps", "vibration",
+    "part_count", "total_cycles", "production_rate",
+    "alarm", "warnings", "oil_pressure", "oil_level",
+)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def datetime_to_ms(dt: datetime) -> int:
+    """Convert a naive UTC datetime to epoch ms."""
+    return int((dt - EPOCH).total_seconds() * 1000)
+
+
+def timestamp_to_ms(value: str) -> int:
+    """Convert an ISO-8601 UTC timestamp (optional trailing Z) to epoch ms."""
+    return datetime_to_ms(datetime.fromisoformat(value.rstrip('Z')))
+
+
+def ms_to_timestamp(value: int) -> str:
+    """Convert epoch ms back to the ISO format used by the API."""
+    return datetime.utcfromtimestamp(value / 1000.0).isoformat()
+
+
+INSERT_SAMPLE_SQL = "INSERT INTO machine_samples ({}) VALUES ({})".format(
+    ", ".join(SAMPLE_COLUMNS), ", ".join("?" for _ in SAMPLE_COLUMNS)
+)
+
+
+def insert_samples(conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+    """Default insert: everything into a plain machine_samples table"""
+    conn.executemany(INSERT_SAMPLE_SQL, rows)
+
+
+def sample_to_row(machine_id: str, data: dict) -> Tuple:
+    """Flatten a HaasMachine.to_dict() payload into a machine_samples row.
+
+    The ISO timestamp (with its trailing Z) becomes integer epoch ms.
+
+    Done by the producer so the row is a snapshot: to_dict() shares the
+    servo/axis dicts with the live machine, which keeps changing.
+    """
+    axis = data.get('axisPositions', {})
+    servo = data.get('servoLoad', {})
+    return (
+        timestamp_to_ms(data.get('timestamp') or datetime.utcnow().isoformat()),
+        machine_id,
+        data.get('name', ''),
+        data.get('execution', ''),
+        data.get('cyclePhase', ''),
+        data.get('spindleSpeed', 0),
+        data.get('spindleLoad', 0),
+        data.get('spindleTemp', 0),
+        data.get('feedRate', 0),
+        data.get('rapidRate', 0),
+        axis.get('X', 0),
+        axis.get('Y', 0),
+        axis.get('Z', 0),
+        servo.get('X', 0),
+        servo.get('Y', 0),
+        servo.get('Z', 0),
+        data.get('temperature', 0),
+        data.get('currentAmps', 0),
+        data.get('vibration', 0),
+        data.get('partCount', 0),
+        data.get('totalCycles', 0),
+        data.get('productionRate', 0),
+        data.get('alarm'),
+        None,   # warnings: stored as transitions, see alarm_log.warning_events
+        data.get('oilPressure', 0),
+        data.get('oilLevel', 0),
+    )
+
+
+def machine_to_row(machine) -> Tuple:
+    """Same row as sample_to_row(machine.id, machine.to_dict()), read
+    straight off a HaasMachine without building the API dict first"""
+    axis = machine.axisPositions
+    servo = machine.servoLoad
+    return (
+        datetime_to_ms(machine.timestamp),
+        machine.id,
+        machine.name,
+        machine.execution,
+        machine.cyclePhase,
+        round(machine.spindleSpeed),
+        round(machine.spindleLoad, 1),
+        round(machine.spindleTemp, 1),
+        round(machine.feedRate),
+        round(machine.rapidRate),
+        round(axis.X, 2),
+        round(axis.Y, 2),
+        round(axis.Z, 2),
+        servo.X,
+        servo.Y,
+        servo.Z,
+        round(machine.temperature),
+        round(machine.currentAmps, 1),
+        round(machine.vibration, 2),
+        machine.partCount,
+        machine.totalCycles,
+        machine.productionRate,
+        machine.alarm,
+        None,
+        round(machine.oilPressure),
+        round(machine.oilLevel),
+    )
+
+
+class SampleWriter:
+    """Single writer thread that owns the only write connection to the DB.
+
+    Producers hand over whole ticks with submit_batch(); the thread drains
+    everything queued since the last flush and commits it in one
+    transaction, at most once every flush_interval_ms. When the queue is
+    full new batches are dropped (and counted) rather than blocking the
+    event loop.
+
+    insert_rows(conn, rows) stores the raw rows (day partitions plug in
+    here). flush_hooks are called as hook(conn, rows) inside the same
+    transaction as the insert, so derived tables (rollups, ...) commit with
+    the raw samples. Each hook and submit_call() function runs in its own
+    SAVEPOINT: one that fails is rolled back and logged, the samples and
+    the others are still committed. Long maintenance jobs (migrations, ...) are registered with
+    add_task() and run in small steps between flushes on the same thread.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_queue: int = 1000,
+        flush_interval_ms: int = 1000,
+        synchronous: str = "NORMAL",
+        flush_hooks: Sequence[Callable[[sqlite3.Connection, List[Tuple]], None]] = (),
+        insert_rows: Callable[[sqlite3.Connection, List[Tuple]], None] = insert_samples,
+    ):
+        self.db_path = db_path
+        self.insert_rows = insert_rows
+        self.flush_hooks = list(flush_hooks)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.synchronous = synchronous
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._tasks: List[Callable[[sqlite3.Connection], bool]] = []
+
+        # === STATS ===
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._batches_dropped = 0
+        self._calls_dropped = 0
+        self._flushes = 0
+        self._flush_errors = 0
+        self._last_flush_rows = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._queue_high_water = 0
+        self._last_flush_at: Optional[str] = None
+
+    # ========================================
+    # LIFECYCLE
+    # ========================================
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sample-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush whatever is still queued and close the connection."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ========================================
+    # PRODUCER API
+    # ========================================
+
+    def submit(self, machine_id: str, data: dict) -> bool:
+        return self.submit_batch([sample_to_row(machine_id, data)])
+
+    def submit_batch(self, rows: List[Tuple], block: bool = False) -> bool:
+        """Queue one tick worth of rows. Returns False if it was dropped.
+
+        block=True waits for room instead (bulk loaders that must not lose rows).
+        """
+        if not rows:
+            return True
+        try:
+            self._queue.put(rows, block=block)
+        except queue.Full:
+            with self._lock:
+                self._batches_dropped += 1
+                self._rows_dropped += len(rows)
+            return False
+        depth = self._queue.qsize()
+        if depth > self._queue_high_water:
+            self._queue_high_water = depth
+        return True
+
+    def submit_call(self, fn: Callable[[sqlite3.Connection], None], block: bool = False) -> bool:
+        """Queue fn(conn) to run inside the next flush transaction (after its samples).
+
+        For small non-sample writes (alarm events, ...) that must share the
+        single write connection. Returns False if it was dropped.
+        """
+        try:
+            self._queue.put(fn, block=block)
+        except queue.Full:
+            with self._lock:
+                self._calls_dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Block until everything queued before this call is committed.
+
+        Returns False if that did not happen within timeout seconds (the
+        queue stayed full, or the flush is still running).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def add_task(self, step: Callable[[sqlite3.Connection], bool]) -> None:
+        """Run step(conn) on the writer thread until it returns False.
+
+        Each call should do a bounded chunk of work in its own transaction.
+        """
+        with self._lock:
+            self._tasks.append(step)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'queue_high_water': self._queue_high_water,
+                'rows_written': self._rows_written,
+                'rows_dropped': self._rows_dropped,
+                'batches_dropped': self._batches_dropped,
+                'calls_dropped': self._calls_dropped,
+                'flushes': self._flushes,
+                'flush_errors': self._flush_errors,
+                'last_flush_rows': self._last_flush_rows,
+                'last_flush_ms': round(self._last_flush_ms, 2),
+                'max_flush_ms': round(self._max_flush_ms, 2),
+                'avg_flush_ms': round(self._total_flush_ms / self._flushes, 2) if self._flushes else 0.0,
+                'last_flush_at': self._last_flush_at,
+                'flush_interval_ms': round(self.flush_interval * 1000),
+                'synchronous': self.synchronous,
+                'background_tasks': len(self._tasks),
+            }
+
+    # ========================================
+    # WRITER THREAD
+    # ========================================
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                busy = bool(self._tasks)
+                try:
+                    first = self._queue.get(timeout=0 if busy else max(self.flush_interval, 0.1))
+                except queue.Empty:
+                    first = None
+                started = time.monotonic()
+                if first is not None:
+                    self._drain(conn, first)
+                if busy:
+                    # Keep stepping background work; samples still flush in between
+                    self._run_task(conn)
+                    continue
+                if first is None:
+                    continue
+                # Coalesce: at most one transaction per flush interval
+                remaining = self.flush_interval - (time.monotonic() - started)
+                if remaining > 0:
+                    self._stop.wait(remaining)
+
+            # Final drain on shutdown
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                first = None
+            if first is not None:
+                self._drain(conn, first)
+        finally:
+            conn.close()
+
+    def _drain(self, conn: sqlite3.Connection, first: Any) -> None:
+        rows: List[Tuple] = []
+        calls: List[Callable[[sqlite3.Connection], None]] = []
+        waiters: List[threading.Event] = []
+
+        item = first
+        while True:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif callable(item):
+                calls.append(item)
+            else:
+                rows.extend(item)
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+        try:
+            if rows or calls:
+                self._write(conn, rows, calls)
+        finally:
+            # Never leave a flush() caller hanging, whatever happened to the batch
+            for waiter in waiters:
+                waiter.set()
+
+    def _run_task(self, conn: sqlite3.Connection) -> None:
+        step = self._tasks[0]
+        try:
+            more = step(conn)
+        except Exception as e:
+            # Any failure, not only SQLite's: the writer thread must outlive it
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._flush_errors += 1
+            print(f"⚠️ Writer background task failed: {e!r}")
+            more = False
+        if not more:
+            with self._lock:
+                self._tasks.remove(step)
+
+    def _write(
+        self,
+        conn: sqlite3.Connection,
+        rows: List[Tuple],
+        calls: Sequence[Callable[[sqlite3.Connection], None]] = (),
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            with conn:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")   # one transaction, also for calls only
+                if rows:
+                    self.insert_rows(conn, rows)
+                    for hook in self.flush_hooks:
+                        self._savepoint(conn, "flush hook", hook, rows)
+                for fn in calls:
+                    self._savepoint(conn, "queued call", fn)
+        except Exception as e:
+            # `with conn` rolled the transaction back: the insert itself (or a
+            # savepoint) failed. That costs this batch, never the thread.
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._flush_errors += 1
+                self._rows_dropped += len(rows)
+            print(f"⚠️ Sample writer flush failed: {e!r}")
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._flushes += 1
+            self._rows_written += len(rows)
+            self._last_flush_rows = len(rows)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            self._last_flush_at = datetime.utcnow().isoformat()
+
+    def _savepoint(self, conn: sqlite3.Connection, what: str, fn: Callable, *args: Any) -> None:
+        """fn(conn, *args) inside a SAVEPOINT; on any error only its own writes are undone"""
+        conn.execute("SAVEPOINT writer_step")
+        try:
+            fn(conn, *args)
+        except Exception as e:
+            conn.execute("ROLLBACK TO writer_step")
+            conn.execute("RELEASE writer_step")
+            with self._lock:
+                self._flush_errors += 1
+            print(f"⚠️ Sample writer {what} failed, rolled back alone: {e!r}")
+        else:
+            conn.execute("RELEASE writer_step")
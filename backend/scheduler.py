@@ -0,0 +1,191 @@
+"""
+Next-event scheduling for HaasMachine fleets
+A machine that is idle waiting for its next cycle, off, or in an alarm
+waiting to auto-clear changes only by deterministic decay until its next
+event, whose tick is already drawn (HaasMachine.quiet_ticks). Such machines
+sit in a priority queue keyed by that tick and are not touched in between;
+when they come due, or when someone needs their state, the skipped ticks
+are applied in closed form (HaasMachine.advance_quiet). Per tick the cost
+is proportional to the machines doing something, not to the fleet size.
+The same goes for publishing a tick: only the machines stepped, woken or
+synced since the last drain_touched() can have changed, so only those are
+diffed (HaasMachine.to_delta); a sleeping machine's published state is
+the one it fell asleep with until it is touched again. Sampling likewise
+takes the machines touched since the last sample, and catches the
+sleeping ones up (sync_all) only every so often.
+
+A run is reproducible from its seed, but the closed-form quiet ticks do
+not draw from a machine's random stream the way update() would, so the
+trajectories are not those of stepping every machine every tick.
+"""
+
+import heapq
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from haas_machine import HaasMachine
+
+
+class EventScheduler:
+    """Steps a set of HaasMachines tick by tick, skipping quiet ticks.
+
+    Anything that changes a machine from outside (power, alarms) must call
+    wake(machine) afterwards, since a sleeping machine would otherwise miss
+    it until its scheduled event.
+    """
+
+    def __init__(self, machines: Iterable[HaasMachine], dt_sec: float = 1.0):
+        self.dt_sec = dt_sec
+        self.tick = 0
+        self.now: Optional[datetime] = None   # time of the last step (None: wall clock)
+        self.machines: Dict[str, HaasMachine] = {m.id: m for m in machines}
+
+        # Busy machines are updated every tick from a plain list; only
+        # sleeping ones go through the queue
+        self._active: List[HaasMachine] = list(self.machines.values())
+        self._is_active: Dict[str, bool] = {machine_id: True for machine_id in self.machines}
+
+        # (due tick, sequence, machine id); an entry is only valid while its
+        # sequence matches _entry[machine id] (wake() supersedes it)
+        self._queue: List[Tuple[int, int, str]] = []
+        self._entry: Dict[str, int] = {}
+        self._synced: Dict[str, int] = {machine_id: 0 for machine_id in self.machines}
+        self._sequence = 0
+        # Changed since the last drain_touched() / drain_unsampled()
+        self._touched: Dict[str, HaasMachine] = {}
+        self._unsampled: Dict[str, HaasMachine] = {}
+
+        # === STATS ===
+        self._updates = 0
+        self._skipped = 0
+
+    def _sleep(self, machine_id: str, due: Optional[int]) -> None:
+        """Park a machine until tick `due` (None: until wake())"""
+        self._sequence += 1
+        self._entry[machine_id] = self._sequence
+        self._is_active[machine_id] = False
+        if due is not None:
+            heapq.heappush(self._queue, (due, self._sequence, machine_id))
+
+    def step(self, now: Optional[datetime] = None) -> int:
+        """Advance one tick (stamped `now`, default wall clock); returns how many machines were updated"""
+        previous = self.now
+        self.tick += 1
+        self.now = now
+        tick, dt = self.tick, self.dt_sec
+        runnable = self._active
+
+        queue = self._queue
+        while queue and queue[0][0] <= tick:
+            _, sequence, machine_id = heapq.heappop(queue)
+            if self._entry.get(machine_id) != sequence or self._is_active[machine_id]:
+                continue  # superseded by wake()
+            machine = self.machines[machine_id]
+            self._catch_up(machine, tick - 1, previous)
+            self._is_active[machine_id] = True
+            runnable.append(machine)
+
+        synced = self._synced
+        touched, unsampled = self._touched, self._unsampled
+        active: List[HaasMachine] = []
+        for machine in runnable:
+            machine.update(dt, now)
+            synced[machine.id] = tick
+            touched[machine.id] = unsampled[machine.id] = machine
+            quiet = machine.quiet_ticks(dt)
+            if quiet == 0:
+                active.append(machine)
+            else:
+                self._sleep(machine.id, None if quiet is None else tick + 1 + quiet)
+        self._active = active
+        self._updates += len(runnable)
+        return len(runnable)
+
+    def _catch_up(self, machine: HaasMachine, tick: int, now: Optional[datetime]) -> None:
+        skipped = tick - self._synced[machine.id]
+        if skipped > 0:
+            machine.advance_quiet(skipped, self.dt_sec, now)
+            self._synced[machine.id] = tick
+            self._skipped += skipped
+
+    def sync(self, machine: HaasMachine) -> HaasMachine:
+        """Bring a (possibly sleeping) machine's state up to the current tick"""
+        self._catch_up(machine, self.tick, self.now)
+        self._touched[machine.id] = self._unsampled[machine.id] = machine
+        return machine
+
+    def sync_all(self) -> None:
+        """Catch every machine up (e.g. to sample the fleet); not counted as touched"""
+        for machine in self.machines.values():
+            self._catch_up(machine, self.tick, self.now)
+
+    def drain_touched(self) -> List[HaasMachine]:
+        """Machines stepped, woken or synced since the previous call"""
+        touched = list(self._touched.values())
+        self._touched = {}
+        return touched
+
+    def drain_unsampled(self) -> List[HaasMachine]:
+        """Like drain_touched, for the sampler (its own set, drained at its own pace)"""
+        unsampled = list(self._unsampled.values())
+        self._unsampled = {}
+        return unsampled
+
+    def wake(self, machine: HaasMachine) -> None:
+        """Reschedule after an outside change: updated again from the next tick"""
+        self.sync(machine)   # touched: the change is published with the next tick
+        if not self._is_active[machine.id]:
+            self._sequence += 1
+            self._entry[machine.id] = self._sequence
+            self._is_active[machine.id] = True
+            self._active.append(machine)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'tick': self.tick,
+            'machines': len(self.machines),
+            'active': len(self._active),
+            'sleeping': len(self.machines) - len(self._active),
+            'updates': self._updates,
+            'ticks_skipped': self._skipped,
+        }
+
+
+# ========================================
+# SIMPLE LOCAL BENCHMARK
+# ========================================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from haas_machine import START_CHANCE, create_fleet_machines
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    if len(sys.argv) > 3:
+        # e.g. 0.002: machines wait ~8 minutes between cycles (mostly idle fleet)
+        for mtype in START_CHANCE:
+            START_CHANCE[mtype] = float(sys.argv[3])
+
+    scheduler = EventScheduler(create_fleet_machines(copies).values())
+    started = time.perf_counter()
+    for _ in range(ticks):
+        scheduler.step()
+    step_ms = (time.perf_counter() - started) * 1000.0 / ticks
+    started = time.perf_counter()
+    scheduler.sync_all()
+    sync_ms = (time.perf_counter() - started) * 1000.0
+
+    objects = list(create_fleet_machines(copies).values())
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for m in objects:
+            m.update(1.0)
+    object_ms = (time.perf_counter() - started) * 1000.0 / ticks
+
+    stats = scheduler.stats()
+    print(f"{len(objects)} machines, {ticks} ticks")
+    print(f"  EventScheduler.step:   {step_ms:8.2f} ms/tick "
+          f"({stats['updates'] / ticks:.0f} updates/tick, sync_all {sync_ms:.1f} ms)")
+    print(f"  HaasMachine.update:    {object_ms:8.2f} ms/tick")
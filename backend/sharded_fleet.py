@@ -0,0 +1,480 @@
+"""
+Multi-process sharded simulation
+The fleet is split across worker processes; each owns a shard of
+HaasMachine objects and, per tick, updates them, serializes them and
+writes the result into a shared-memory buffer: the shard's part of the
+WebSocket snapshot (JSON, ready to splice), plus its sample rows, alarm
+transitions and the fields that changed (HaasMachine.to_delta), which the
+API process merges into its state instead of parsing the snapshot. The
+API process only reads those buffers, so
+simulation and serialization scale with cores and the event loop only
+does I/O.
+
+Every machine draws from its own seeded stream (haas_machine.machine_seed),
+so a sharded run produces exactly the trajectories of a serial one.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import traceback
+from datetime import datetime
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import alarm_rules
+from deltas import merge_fields
+from haas_machine import HaasMachine
+from sample_writer import machine_to_row
+from snapshot_cache import dumps as dumps_json
+
+# Initial buffer per shard; grown on demand (alarm history, long tool lists)
+BYTES_PER_MACHINE = 16 * 1024
+MIN_BUFFER_BYTES = 64 * 1024
+
+# Manual controls a worker applies (name -> HaasMachine method)
+CONTROLS = ("set_power", "clear_alarm", "inject_alarm")
+
+
+class ShardDied(RuntimeError):
+    """A worker process is gone (killed, crashed, out of memory)"""
+
+
+# ========================================
+# WORKER PROCESS
+# ========================================
+
+def _shard_worker(conn: Connection, machines: List[HaasMachine], buffer_name: str,
+                  rules_path: Optional[str] = None) -> None:
+    """Step a shard on command; results go to the shared buffer, an ack to conn.
+
+    Commands: ("step", dt, now, controls), ("rng_state",), ("stop",).
+    Replies to a step: ("done", json_len, aux_len), ("grow", needed) - then
+    ("attach", name) is expected before the tick is written - or ("error",
+    traceback); to rng_state: ("rng_state", {machine id: state}).
+    Alarm rules come from rules_path, re-read when the file changes.
+    """
+    if alarm_rules.rule_book().path != rules_path:
+        alarm_rules.configure(rules_path)   # spawned, not forked
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    by_id = {machine.id: machine for machine in machines}
+    sent = {machine.id: 0 for machine in machines}   # machine version the API side holds
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "stop":
+                break
+            if message[0] == "rng_state":
+                conn.send(("rng_state", {machine.id: machine.rng_state() for machine in machines}))
+                continue
+            try:
+                _, dt, now, controls = message
+                alarm_rules.rule_book().reload_if_changed()
+                for machine_id, action, args in controls:
+                    getattr(by_id[machine_id], action)(*args)
+                for machine in machines:
+                    machine.update(dt, now)
+
+                changes = {}
+                for machine in machines:
+                    fields = machine.to_delta(sent[machine.id])
+                    if fields:
+                        changes[machine.id] = fields
+                        sent[machine.id] = machine.version
+
+                # The shard's members of the snapshot object, without braces
+                # (to_delta keeps `emitted` equal to to_dict())
+                snapshot = dumps_json({machine.id: machine.emitted for machine in machines})
+                payload = snapshot[1:-1]
+                aux = pickle.dumps(
+                    (
+                        [machine_to_row(machine) for machine in machines],
+                        [event for machine in machines for event in machine.drain_alarm_events()],
+                        [event for machine in machines for event in machine.drain_warning_events()],
+                        changes,
+                    ),
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+                needed = len(payload) + len(aux)
+                if needed > buffer.size:
+                    conn.send(("grow", needed))
+                    _, name = conn.recv()
+                    buffer.close()
+                    buffer = shared_memory.SharedMemory(name=name)
+                buffer.buf[:len(payload)] = payload
+                buffer.buf[len(payload):needed] = aux
+                conn.send(("done", len(payload), len(aux)))
+            except Exception:
+                conn.send(("error", traceback.format_exc()))
+    finally:
+        buffer.close()
+
+
+# ========================================
+# API-SIDE VIEW
+# ========================================
+
+class ShardedFleet:
+    """A fleet stepped by worker processes; this side only reads their buffers.
+
+    Manual controls are queued and applied by the owning worker at the start
+    of the next tick. start() forks the workers, stop() ends them. A worker
+    that dies takes its machines with it: every later step raises ShardDied.
+    """
+
+    def __init__(self, machines: Iterable[HaasMachine], workers: Optional[int] = None):
+        source = list(machines)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(source) or 1))
+        self.ids = [m.id for m in source]
+        self.names = {m.id: m.name for m in source}
+        self.models = {m.id: m.model for m in source}
+        # Round-robin so every shard gets the same mix of machine types
+        self._shards: List[List[HaasMachine]] = [source[k::workers] for k in range(workers)]
+        self._shard_of = {m.id: k for k, shard in enumerate(self._shards) for m in shard}
+
+        self._buffers: List[shared_memory.SharedMemory] = []
+        self._conns: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._controls: List[List[Tuple[str, str, tuple]]] = [[] for _ in self._shards]
+
+        # Latest tick, as read from the buffers
+        self.tick = 0
+        self._fragments: List[str] = []
+        self._rows: List[Tuple] = []
+        self._alarm_events: List[Dict[str, Any]] = []
+        self._warning_events: List[Dict[str, Any]] = []
+        self._snapshot: Optional[str] = None
+        self._state: Dict[str, Dict[str, Any]] = {}     # merged from the workers' changes
+        self._changes: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}   # controlled since the last tick
+        self._pending_sent: Dict[str, Dict[str, Any]] = {}   # ...of which the tick in flight applies
+        self._dead: Optional[str] = None
+        self._views: Optional[Dict[str, "ShardMachine"]] = None
+
+    @property
+    def workers(self) -> int:
+        return len(self._shards)
+
+    # ========================================
+    # LIFECYCLE
+    # ========================================
+
+    def start(self) -> None:
+        if self._processes:
+            return
+        # fork where available: no re-import of the server module in the children
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(method)
+        for k, shard in enumerate(self._shards):
+            buffer = shared_memory.SharedMemory(
+                create=True, size=max(MIN_BUFFER_BYTES, BYTES_PER_MACHINE * len(shard))
+            )
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_shard_worker, args=(child_conn, shard, buffer.name, alarm_rules.rule_book().path),
+                name=f"shard-{k}", daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._buffers.append(buffer)
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(("stop",))
+            except (OSError, EOFError):
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for buffer in self._buffers:
+            buffer.close()
+            buffer.unlink()
+        self._buffers, self._conns, self._processes = [], [], []
+
+    # ========================================
+    # STEPPING
+    # ========================================
+
+    def step(self, dt_sec: float, now: Optional[datetime] = None) -> None:
+        """Advance every shard one tick and read back the results (blocking)"""
+        self._send_step(dt_sec, now)
+        self._apply(self._collect())
+
+    async def step_async(self, dt_sec: float, now: Optional[datetime] = None) -> None:
+        """step() without blocking the event loop while the workers compute.
+
+        Only the pipe reads run in the executor; the results are applied here,
+        on the loop thread, which is also where control() runs.
+        """
+        self._send_step(dt_sec, now)
+        self._apply(await asyncio.get_running_loop().run_in_executor(None, self._collect))
+
+    def _send_step(self, dt_sec: float, now: Optional[datetime]) -> None:
+        if self._dead is not None:
+            raise ShardDied(self._dead)
+        # One stamp for the whole fleet, whichever worker runs a machine
+        now = now if now is not None else datetime.utcnow()
+        for k, conn in enumerate(self._conns):
+            try:
+                conn.send(("step", dt_sec, now, self._controls[k]))
+            except (OSError, EOFError):
+                self._died(k)
+            self._controls[k] = []
+        self._pending_sent = dict(self._pending)
+
+    def _recv(self, k: int) -> Any:
+        try:
+            return self._conns[k].recv()
+        except (OSError, EOFError):
+            self._died(k)
+
+    def _died(self, k: int) -> None:
+        process = self._processes[k]
+        process.join(0.5)
+        self._dead = (
+            f"Shard {k} worker (pid {process.pid}) died with exit code {process.exitcode}; "
+            f"its {len(self._shards[k])} machines are gone, restart the server"
+        )
+        raise ShardDied(self._dead)
+
+    def _collect(self) -> Tuple:
+        """Read every shard's reply for the tick (executor thread: no shared state is set here)"""
+        fragments: List[str] = []
+        rows: List[Tuple] = []
+        events: List[Dict[str, Any]] = []
+        warnings: List[Dict[str, Any]] = []
+        changes: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        for k in range(len(self._conns)):
+            reply = self._recv(k)
+            if reply[0] == "grow":
+                self._grow(k, reply[1])
+                reply = self._recv(k)
+            if reply[0] == "error":
+                # Read the other shards' replies anyway, or the next tick gets this one's
+                failed.append(f"Shard {k} failed:\n{reply[1]}")
+                continue
+            _, json_len, aux_len = reply
+            view = self._buffers[k].buf
+            fragments.append(bytes(view[:json_len]).decode())
+            shard_rows, shard_events, shard_warnings, shard_changes = pickle.loads(
+                view[json_len:json_len + aux_len]
+            )
+            rows.extend(shard_rows)
+            events.extend(shard_events)
+            warnings.extend(shard_warnings)
+            changes.update(shard_changes)
+        if failed:
+            raise RuntimeError("\n".join(failed))
+        return fragments, rows, events, warnings, changes
+
+    def _apply(self, result: Tuple) -> None:
+        fragments, rows, events, warnings, changes = result
+        # A new outer dict per tick: what was handed out stays as it was
+        state = dict(self._state)
+        for machine_id, fields in changes.items():
+            state[machine_id] = merge_fields(state.get(machine_id), fields)
+
+        self._fragments = [fragment for fragment in fragments if fragment]
+        self._rows = rows
+        self._alarm_events.extend(events)
+        self._warning_events.extend(warnings)
+        self._snapshot = None
+        self._state = state
+        self._changes = changes
+        # Views of controls the tick applied are replaced by the real state;
+        # ones queued while it ran stay until the next
+        sent = self._pending_sent
+        self._pending = {
+            machine_id: data for machine_id, data in self._pending.items() if sent.get(machine_id) is not data
+        }
+        self._pending_sent = {}
+        self.tick += 1
+
+    def _grow(self, k: int, needed: int) -> None:
+        """Swap shard k's buffer for one with room for `needed` bytes (and then some)"""
+        old = self._buffers[k]
+        buffer = shared_memory.SharedMemory(create=True, size=max(needed * 2, old.size * 2))
+        self._buffers[k] = buffer
+        try:
+            self._conns[k].send(("attach", buffer.name))
+        except (OSError, EOFError):
+            self._died(k)
+        old.close()
+        old.unlink()
+
+    # ========================================
+    # SNAPSHOT ACCESS
+    # ========================================
+
+    def snapshot_json(self) -> str:
+        """The latest tick as one JSON object (machine id -> state), never re-encoded"""
+        if self._snapshot is None:
+            self._snapshot = "{" + ",".join(self._fragments) + "}"
+        return self._snapshot
+
+    def all_dicts(self) -> Dict[str, Dict[str, Any]]:
+        if self._pending:
+            return {**self._state, **self._pending}
+        return self._state
+
+    def changes(self) -> Dict[str, Dict[str, Any]]:
+        """Per machine id, the fields the latest tick changed (the first tick: all);
+        dropped fields are deltas.DROPPED"""
+        return self._changes
+
+    def to_dict(self, machine_id: str, tools: bool = True) -> Dict[str, Any]:
+        data = self._pending.get(machine_id) or self._state[machine_id]
+        if not tools and "tools" in data:
+            data = {key: value for key, value in data.items() if key != "tools"}
+        return data
+
+    def rng_states(self) -> Dict[str, Any]:
+        """HaasMachine.rng_state() of every machine, from its worker (between ticks only)"""
+        if self._dead is not None:
+            raise ShardDied(self._dead)
+        for k, conn in enumerate(self._conns):
+            try:
+                conn.send(("rng_state",))
+            except (OSError, EOFError):
+                self._died(k)
+        states: Dict[str, Any] = {}
+        for k in range(len(self._conns)):
+            states.update(self._recv(k)[1])
+        return states
+
+    def sample_rows(self) -> List[Tuple]:
+        """machine_samples rows of the latest tick, built by the workers"""
+        return self._rows
+
+    def drain_alarm_events(self) -> List[Dict[str, Any]]:
+        events = self._alarm_events
+        self._alarm_events = []
+        return events
+
+    def drain_warning_events(self) -> List[Dict[str, Any]]:
+        events = self._warning_events
+        self._warning_events = []
+        return events
+
+    # ========================================
+    # MANUAL CONTROLS
+    # ========================================
+
+    def control(self, machine_id: str, action: str, *args: Any) -> None:
+        """Queue a control for the next tick; the state shown meanwhile reflects it"""
+        if action not in CONTROLS:
+            raise ValueError(f"Unknown control: {action}")
+        self._controls[self._shard_of[machine_id]].append((machine_id, action, args))
+        data = dict(self.to_dict(machine_id))
+        if action == "set_power":
+            data["power"] = args[0]
+            if not args[0]:
+                data["execution"] = "STOPPED"
+                data["cyclePhase"] = "IDLE"
+        elif action == "clear_alarm":
+            history = data["alarmHistory"]
+            if history:
+                data["alarmHistory"] = history[:-1] + [{**history[-1], "cleared": True}]
+            data["alarm"] = None
+            data["alarmCode"] = None
+            data["execution"] = "IDLE"
+        elif action == "inject_alarm":
+            code, message = args
+            entry = {
+                "code": code,
+                "message": message,
+                "timestamp": data["timestamp"],
+                "cyclePhase": data["cyclePhase"],
+                "spindleLoad": data["spindleLoad"],
+                "cleared": False,
+            }
+            data["alarm"] = message
+            data["alarmCode"] = code
+            data["alarmHistory"] = (data["alarmHistory"] + [entry])[-5:]
+        self._pending[machine_id] = data
+
+    def machines(self) -> Dict[str, "ShardMachine"]:
+        if self._views is None:
+            self._views = {machine_id: ShardMachine(self, machine_id) for machine_id in self.ids}
+        return self._views
+
+
+class ShardMachine:
+    """HaasMachine-like handle on one machine of a ShardedFleet"""
+
+    __slots__ = ("fleet", "id")
+
+    def __init__(self, fleet: ShardedFleet, machine_id: str):
+        self.fleet = fleet
+        self.id = machine_id
+
+    @property
+    def name(self) -> str:
+        return self.fleet.names[self.id]
+
+    @property
+    def model(self) -> str:
+        return self.fleet.models[self.id]
+
+    @property
+    def power(self) -> bool:
+        return self.fleet.to_dict(self.id)["power"]
+
+    def set_power(self, state: bool) -> None:
+        self.fleet.control(self.id, "set_power", state)
+
+    def inject_alarm(self, code: Optional[int], message: str) -> None:
+        self.fleet.control(self.id, "inject_alarm", code, message)
+
+    def clear_alarm(self) -> None:
+        self.fleet.control(self.id, "clear_alarm")
+
+    def to_dict(self, tools: bool = True) -> Dict[str, Any]:
+        return self.fleet.to_dict(self.id, tools)
+
+
+# ========================================
+# SIMPLE LOCAL BENCHMARK
+# ========================================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from haas_machine import create_fleet_machines
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    fleet = ShardedFleet(create_fleet_machines(copies, fleet_seed=1).values(), workers)
+    fleet.start()
+    try:
+        started = time.perf_counter()
+        for _ in range(ticks):
+            fleet.step(1.0)
+            fleet.snapshot_json()
+        sharded_ms = (time.perf_counter() - started) * 1000.0 / ticks
+    finally:
+        fleet.stop()
+
+    objects = list(create_fleet_machines(copies, fleet_seed=1).values())
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for m in objects:
+            m.update(1.0)
+        dumps_json({m.id: m.to_dict() for m in objects})
+        [machine_to_row(m) for m in objects]
+    serial_ms = (time.perf_counter() - started) * 1000.0 / ticks
+
+    print(f"{len(objects)} machines, {ticks} ticks, {fleet.workers} workers")
+    print(f"  ShardedFleet.step + snapshot:       {sharded_ms:8.2f} ms/tick (API process blocked only while reading)")
+    print(f"  update + to_dict + dumps + rows:    {serial_ms:8.2f} ms/tick (in-process)")
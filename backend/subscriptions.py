@@ -0,0 +1,155 @@
+"""
+WebSocket subscriptions
+A /ws client can ask for less than the whole fleet: some machines, some of
+their fields, at most so many updates per second. Clients asking for the
+same thing share a group; a group's frame is projected and encoded once
+per send, whatever its number of clients, and is only sent when one of
+its fields changed (or a warning of its machines was raised or cleared).
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from deltas import DeltaTracker
+from snapshot_cache import dumps
+
+# (machine ids or None: all, fields or None: all, send every N ticks)
+SubscriptionKey = Tuple[Optional[Tuple[str, ...]], Optional[Tuple[str, ...]], int]
+
+MAX_PENDING_WARNINGS = 1000
+
+
+def parse_subscription(
+    message: Dict[str, Any],
+    machine_ids: Iterable[str],
+    field_names: Optional[Iterable[str]],
+    tick_seconds: float,
+) -> SubscriptionKey:
+    """Validate a {"type": "subscribe"} message; raises ValueError.
+
+    field_names: the fields machines have (None: not known yet, anything goes)
+    """
+    machines = message.get("machines")
+    if machines is not None:
+        if not isinstance(machines, list) or not all(isinstance(m, str) for m in machines):
+            raise ValueError("machines must be a list of machine ids")
+        known = set(machine_ids)
+        unknown = sorted(set(machines) - known)
+        if unknown:
+            raise ValueError(f"unknown machines: {', '.join(unknown)}")
+        machines = tuple(sorted(set(machines)))
+
+    fields = message.get("fields")
+    if fields is not None:
+        if not isinstance(fields, list) or not fields or not all(isinstance(f, str) for f in fields):
+            raise ValueError("fields must be a non-empty list of field names")
+        if field_names is not None:
+            unknown = sorted(set(fields) - set(field_names))
+            if unknown:
+                raise ValueError(f"unknown fields: {', '.join(unknown)}")
+        fields = tuple(sorted(set(fields)))
+
+    max_rate = message.get("maxRate")
+    every_ticks = 1
+    if max_rate is not None:
+        if isinstance(max_rate, bool) or not isinstance(max_rate, (int, float)) or not max_rate > 0:
+            raise ValueError("maxRate must be a positive number of updates per second")
+        # Never more often than asked: round the interval up to whole ticks
+        every_ticks = max(1, math.ceil(1.0 / (max_rate * tick_seconds) - 1e-9))
+    return machines, fields, every_ticks
+
+
+class SubscriptionGroup:
+    """The clients sharing one subscription, and what they were last sent"""
+
+    def __init__(self, key: SubscriptionKey):
+        self.machines, self.fields, self.every_ticks = key
+        self.clients: List[Any] = []
+        self.sent_version = 0      # tracker version of the last frame sent
+        self.next_tick = 0         # earliest tick the next frame may go out
+        self.warnings: List[Dict[str, Any]] = []   # transitions not sent yet
+        self._frame: Optional[str] = None
+        self._frame_version = -1
+
+    def wants_warnings(self) -> bool:
+        return self.fields is None or "warnings" in self.fields
+
+    def project(self, machines: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        ids = machines.keys() if self.machines is None else self.machines
+        if self.fields is None:
+            return {machine_id: machines[machine_id] for machine_id in ids if machine_id in machines}
+        fields = self.fields
+        projected = {}
+        for machine_id in ids:
+            data = machines.get(machine_id)
+            if data is not None:
+                projected[machine_id] = {field: data[field] for field in fields if field in data}
+        return projected
+
+    def frame(self, version: int, machines: Dict[str, Dict[str, Any]],
+              warnings: Optional[List[Dict[str, Any]]] = None) -> str:
+        """{"type": "update"} message for this group; encoded once per version"""
+        if warnings:
+            return dumps({"type": "update", "version": version, "machines": self.project(machines),
+                          "warnings": warnings}).decode()
+        if self._frame_version != version:
+            self._frame = dumps({"type": "update", "version": version,
+                                 "machines": self.project(machines)}).decode()
+            self._frame_version = version
+        return self._frame
+
+
+class SubscriptionHub:
+    """Subscription groups by key; each client is in at most one"""
+
+    def __init__(self):
+        self.groups: Dict[SubscriptionKey, SubscriptionGroup] = {}
+        self._client_groups: Dict[Any, SubscriptionGroup] = {}
+
+    def __len__(self) -> int:
+        return len(self._client_groups)
+
+    def subscribe(self, client: Any, key: SubscriptionKey) -> SubscriptionGroup:
+        """Put client in the group for key (leaving its previous one)"""
+        self.unsubscribe(client)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = SubscriptionGroup(key)
+        group.clients.append(client)
+        self._client_groups[client] = group
+        return group
+
+    def unsubscribe(self, client: Any) -> None:
+        group = self._client_groups.pop(client, None)
+        if group is None:
+            return
+        if client in group.clients:
+            group.clients.remove(client)
+        if not group.clients:
+            self.groups.pop((group.machines, group.fields, group.every_ticks), None)
+
+    def add_warnings(self, events: List[Dict[str, Any]]) -> None:
+        """Queue warning transitions for the groups covering their machines"""
+        for group in self.groups.values():
+            if not group.wants_warnings():
+                continue
+            if group.machines is None:
+                group.warnings.extend(events)
+            else:
+                group.warnings.extend(event for event in events if event["machineId"] in group.machines)
+            if len(group.warnings) > MAX_PENDING_WARNINGS:
+                del group.warnings[:-MAX_PENDING_WARNINGS]
+
+    def due(self, tick: int, tracker: DeltaTracker) -> List[Tuple[SubscriptionGroup, List[Dict[str, Any]]]]:
+        """Groups with something new to send at this tick, with their pending warnings"""
+        ready = []
+        for group in list(self.groups.values()):
+            if tick < group.next_tick:
+                continue
+            if not group.warnings and not tracker.changed_since(group.sent_version, group.machines, group.fields):
+                continue
+            warnings, group.warnings = group.warnings, []
+            group.sent_version = tracker.version
+            group.next_tick = tick + group.every_ticks
+            ready.append((group, warnings))
+        return ready
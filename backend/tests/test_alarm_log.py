@@ -0,0 +1,94 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import alarm_log
+from haas_machine import create_fleet_machines
+from sample_writer import SAMPLE_COLUMNS, datetime_to_ms
+
+START = datetime(2026, 1, 5, 8, 0, 0)
+
+
+def make_db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE alarm_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            machine_id TEXT NOT NULL,
+            machine_name TEXT,
+            alarm_code INTEGER,
+            alarm_message TEXT,
+            duration_seconds REAL
+        )
+    """)
+    conn.execute(f"CREATE TABLE machine_samples ({', '.join(SAMPLE_COLUMNS)})")
+    alarm_log.create_alarm_tables(conn.cursor())
+    return conn
+
+
+def at(machine, seconds):
+    machine.timestamp = START + timedelta(seconds=seconds)
+
+
+def test_raise_clear_and_restart_close_every_alarm():
+    conn = make_db()
+    machines = create_fleet_machines(1, fleet_seed=2)
+    mill, lathe = machines["haas_vf2"], machines["cnc_lathe"]
+
+    at(mill, 0)
+    mill.inject_alarm(200, "SPINDLE OVER TEMP")
+    at(mill, 45)
+    mill.clear_alarm()
+    at(mill, 100)
+    mill.inject_alarm(103, "X AXIS FOLLOWING ERROR")
+    at(mill, 130)
+    mill.inject_alarm(200, "SPINDLE OVER TEMP")     # replaces the active one
+    at(lathe, 10)
+    lathe.inject_alarm(200, "SPINDLE OVER TEMP")
+    alarm_log.record_events(conn, mill.drain_alarm_events() + lathe.drain_alarm_events())
+
+    stats = {entry["machine_id"]: entry for entry in alarm_log.get_alarm_stats(conn, 0)}
+    assert stats["haas_vf2"]["alarm_count"] == 3
+    assert stats["haas_vf2"]["active_count"] == 1
+    assert stats["haas_vf2"]["total_duration_seconds"] == 45 + 30
+    assert stats["cnc_lathe"]["active_count"] == 1
+
+    # Server stops; the last samples it stored are the last known alarm time
+    conn.execute("INSERT INTO machine_samples (ts, machine_id) VALUES (?, ?)",
+                 (datetime_to_ms(START + timedelta(seconds=190)), "haas_vf2"))
+    conn.execute("INSERT INTO machine_samples (ts, machine_id) VALUES (?, ?)",
+                 (datetime_to_ms(START + timedelta(seconds=12)), "cnc_lathe"))
+    alarm_log.close_dangling_alarms(conn.cursor())
+
+    alarms = alarm_log.get_alarms(conn, 0)
+    assert not any(alarm["active"] for alarm in alarms)
+    assert [(alarm["machine_id"], alarm["alarm_code"], alarm["duration_seconds"]) for alarm in alarms] == [
+        ("haas_vf2", 200, 60.0),
+        ("haas_vf2", 103, 30.0),
+        ("cnc_lathe", 200, 2.0),
+        ("haas_vf2", 200, 45.0),
+    ]
+
+    by_code = {entry["alarm_code"]: entry for entry in alarm_log.get_alarm_stats(conn, 0, group_by="code")}
+    assert by_code[200]["alarm_count"] == 3
+    assert by_code[200]["total_duration_seconds"] == 45 + 60 + 2
+    assert by_code[200]["max_duration_seconds"] == 60
+    assert by_code[103]["avg_duration_seconds"] == 30
+    [fleet] = alarm_log.get_alarm_stats(conn, 0, group_by="fleet")
+    assert (fleet["alarm_count"], fleet["active_count"], fleet["total_duration_seconds"]) == (4, 0, 137)
+
+    # A second restart leaves closed alarms alone
+    alarm_log.close_dangling_alarms(conn.cursor())
+    assert alarm_log.get_alarms(conn, 0) == alarms
+
+
+def test_alarm_without_samples_closes_at_zero_length():
+    conn = make_db()
+    machine = create_fleet_machines(1, fleet_seed=2)["haas_vf2"]
+    at(machine, 0)
+    machine.inject_alarm(None, "TOOL_LIFE_EXPIRED")
+    alarm_log.record_events(conn, machine.drain_alarm_events())
+    alarm_log.close_dangling_alarms(conn.cursor())
+    [alarm] = alarm_log.get_alarms(conn, 0)
+    assert alarm["duration_seconds"] == 0.0 and not alarm["active"]
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import alarm_rules
+from alarm_rules import RuleBook, RuleError, RuleSet
+from haas_machine import create_fleet_machines
+
+LOAD_RULE = {"warning": "HIGH_LOAD", "severity": "caution", "message": "Spindle load above 85%",
+             "metric": "spindleLoad", "op": ">", "threshold": 85.0, "exit": 80.0}
+
+
+def machine_with(monkeypatch, warnings):
+    monkeypatch.setattr(alarm_rules, "_book", RuleBook())
+    alarm_rules._book.rules = RuleSet({"alarms": [], "warnings": warnings})
+    return create_fleet_machines(1, fleet_seed=3)["haas_vf2"]
+
+
+def run(machine, loads):
+    """Warning transitions per tick for this sequence of spindle loads"""
+    transitions = []
+    for load in loads:
+        machine.spindleLoad = load
+        machine._update_warnings()
+        transitions.append([event["event"] for event in machine.drain_warning_events()])
+    return transitions
+
+
+def test_warning_clears_only_past_its_exit_band(monkeypatch):
+    machine = machine_with(monkeypatch, [LOAD_RULE])
+    assert run(machine, [84, 86, 83, 81, 79, 83, 86]) == [
+        [], ["RAISED"], [], [], ["CLEARED"], [], ["RAISED"],
+    ]
+    assert machine.warnings == [{"type": "HIGH_LOAD", "severity": "caution", "message": "Spindle load above 85%"}]
+
+
+def test_debounced_warning_ignores_a_one_tick_spike(monkeypatch):
+    machine = machine_with(monkeypatch, [dict(LOAD_RULE, debounce=3)])
+    assert run(machine, [90, 50, 90, 90, 50, 90, 90, 90, 79, 90, 79, 79, 79]) == [
+        [], [], [], [], [], [], [], ["RAISED"], [], [], [], [], ["CLEARED"],
+    ]
+
+
+def test_rule_set_rejects_bad_rules():
+    with pytest.raises(RuleError, match="unknown metric"):
+        RuleSet({"warnings": [dict(LOAD_RULE, metric="spindleLod")]})
+    with pytest.raises(RuleError, match="exit must not be past"):
+        RuleSet({"warnings": [dict(LOAD_RULE, exit=90.0)]})
+
+
+def test_bad_reload_keeps_the_previous_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"alarms": [], "warnings": [LOAD_RULE]}))
+    book = RuleBook(str(path), check_interval=0)
+    loaded, version = book.rules, book.version
+    assert [rule.name for rule in loaded.warnings] == ["HIGH_LOAD"]
+
+    path.write_text(json.dumps({"alarms": [], "warnings": [dict(LOAD_RULE, op="~")]}))
+    assert book.reload_if_changed() is False
+    assert book.rules is loaded and book.version == version
+    assert "op must be one of" in book.stats()["lastError"]
+
+    path.write_text("{not json")
+    assert book.reload_if_changed() is False
+    assert book.rules is loaded
+
+    path.write_text(json.dumps({"alarms": [], "warnings": [dict(LOAD_RULE, threshold=95.0)]}))
+    assert book.reload_if_changed() is True
+    assert book.rules.warnings[0].conditions[0].threshold == 95.0
+    assert book.version == version + 1 and book.stats()["lastError"] is None
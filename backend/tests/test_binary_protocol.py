@@ -0,0 +1,90 @@
+import json
+import math
+import struct
+
+import binary_protocol
+from binary_protocol import FIELDS, BinaryDecoder, BinaryEncoder
+from haas_machine import create_fleet_machines
+
+
+def fleet_dicts():
+    machines = create_fleet_machines(1, fleet_seed=5)
+    for _ in range(30):
+        for machine in machines.values():
+            machine.update(1.0)
+    machines["haas_vf4"].inject_alarm(200, "SPINDLE OVER TEMP")
+    data = {machine_id: machine.to_dict() for machine_id, machine in machines.items()}
+    data["cnc_lathe"]["execution"] = "WARMUP"            # not in the enum table
+    data["haas_vf2"]["warnings"] = [{"type": "x"}] * 300  # more than a u8 holds
+    return data
+
+
+def expected(data, name, kind):
+    if name == "alarmActive":
+        return data.get("alarm") is not None
+    if name == "alarmCode":
+        return -1 if data.get("alarmCode") is None else data["alarmCode"]
+    if name == "warningCount":
+        return min(len(data.get("warnings") or ()), 255)
+    if "." in name:
+        group, key = name.split(".")
+        value = (data.get(group) or {}).get(key)
+    else:
+        value = data.get(name)
+    if kind == "enum":
+        return value if value in binary_protocol.ENUMS[name] else None
+    if kind == "bool":
+        return bool(value)
+    if value is None:
+        return math.nan if kind == "f32" else 0
+    return value
+
+
+def test_every_field_type_round_trips():
+    data = fleet_dicts()
+    encoder = BinaryEncoder(list(data))
+    decoder = BinaryDecoder(json.loads(json.dumps(encoder.schema())))   # as a client receives it
+    decoded = decoder.decode(encoder.encode(77, data))
+    assert decoded["version"] == 77
+    assert set(decoded["machines"]) == set(data)
+    assert {kind for _, kind in FIELDS} == set(binary_protocol.TYPE_CODES)
+
+    for machine_id, original in data.items():
+        state = decoded["machines"][machine_id]
+        for name, kind in FIELDS:
+            group, _, key = name.partition(".")
+            got = state[group][key] if key else state[name]
+            want = expected(original, name, kind)
+            if kind == "f32":
+                want = struct.unpack("<f", struct.pack("<f", want))[0]   # as single precision
+                assert got == want or (math.isnan(got) and math.isnan(want)), (machine_id, name)
+            else:
+                assert got == want, (machine_id, name)
+
+    assert decoded["machines"]["haas_vf4"]["alarmCode"] == 200
+    assert decoded["machines"]["cnc_lathe"]["execution"] is None
+    assert decoded["machines"]["haas_vf2"]["warningCount"] == 255
+    assert math.isnan(decoded["machines"]["press_brake"]["coolant"]["level"])
+
+
+def test_frame_bytes_match_the_documented_layout():
+    # What a browser client hard-codes from API.md: subprotocol, a 16-byte
+    # little-endian header (type 1, schema 1, count, version, ms), 193-byte records
+    data = fleet_dicts()
+    encoder = BinaryEncoder(list(data))
+    schema = encoder.schema()
+    assert binary_protocol.SUBPROTOCOL == "cnc-binary.v1"
+    assert (schema["version"], schema["header"]["format"], schema["header"]["size"]) == (1, "<BBHIq", 16)
+    assert schema["record"]["size"] == 193
+    assert schema["enums"]["execution"][:4] == ["IDLE", "RUNNING", "ALARM", "STOPPED"]
+
+    frame = encoder.encode(0x01020304, data)
+    assert frame[0] == 1 and frame[1] == 1
+    assert frame[2:4] == len(data).to_bytes(2, "little")
+    assert frame[4:8] == bytes([4, 3, 2, 1])
+    timestamp = int.from_bytes(frame[8:16], "little", signed=True)
+    assert timestamp == binary_protocol._timestamp_ms(data["haas_vf2"]) > 0
+    assert len(frame) == 16 + 193 * len(data)
+    indexes = [int.from_bytes(frame[16 + 193 * k:18 + 193 * k], "little") for k in range(len(data))]
+    assert indexes == list(range(len(data)))
+    assert frame[18] == data["haas_vf2"]["power"]   # the first field, right after the index
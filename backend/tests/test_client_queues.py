@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from client_queues import CLOSE_TOO_SLOW, ClientQueue, ClientRegistry
+
+
+class FakeWebSocket:
+    """Records what it is sent; while `stalled` is set, every send hangs"""
+
+    def __init__(self, stalled=False):
+        self.received = []
+        self.closed = None
+        self.stalled = stalled
+        self._released = asyncio.Event()
+
+    def release(self):
+        self.stalled = False
+        self._released.set()
+
+    async def send_text(self, payload):
+        if self.stalled:
+            await self._released.wait()
+        self.received.append((time.monotonic(), payload))
+
+    send_bytes = send_text
+
+    async def close(self, code, reason=""):
+        self.closed = (code, reason)
+
+
+async def settle():
+    """Let the sender tasks run until they wait again"""
+    await asyncio.sleep(0.01)
+
+
+def test_stalled_delta_client_skips_frames_and_resyncs():
+    async def scenario():
+        websocket = FakeWebSocket(stalled=True)
+        asked = []
+
+        def resync(version):
+            asked.append(version)
+            return "catch-up", 3
+
+        queue = ClientQueue(websocket, "delta", send_timeout=5, max_behind_seconds=30, resync=resync)
+        queue.start()
+        for version in (1, 2, 3):
+            queue.offer(f"delta {version}", version)
+            await settle()
+        assert queue.dropped == 1            # 2 was replaced by 3 while 1 was stuck
+        websocket.release()
+        await settle()
+        assert [payload for _, payload in websocket.received] == ["delta 1", "catch-up"]
+        assert asked == [1]
+        assert (queue.resyncs, queue.sent_version, queue.lag) == (1, 3, 0)
+        queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_client_behind_too_long_is_closed_with_1013():
+    async def scenario():
+        websocket = FakeWebSocket(stalled=True)
+        queue = ClientQueue(websocket, "snapshot", send_timeout=5, max_behind_seconds=0.05)
+        queue.start()
+        while not queue.closing:
+            queue.offer("snapshot")
+            await asyncio.sleep(0.01)
+        assert queue.dropped >= 2
+        websocket.release()     # the send in progress finishes, then the close
+        await settle()
+        code, reason = websocket.closed
+        assert code == CLOSE_TOO_SLOW and reason.startswith("no frame taken")
+        assert queue.timeouts == 0
+
+    asyncio.run(scenario())
+
+
+def test_send_that_hangs_times_out_with_1013():
+    async def scenario():
+        websocket = FakeWebSocket(stalled=True)
+        queue = ClientQueue(websocket, "snapshot", send_timeout=0.05, max_behind_seconds=30)
+        queue.start()
+        queue.offer("snapshot")
+        await asyncio.sleep(0.2)
+        assert queue.timeouts == 1
+        assert websocket.closed == (CLOSE_TOO_SLOW, "send timed out after 0.05s")
+        queue.offer("ignored")      # nothing more is queued once closing
+        assert queue.stats()["closing"] and queue.lag == 0
+
+    asyncio.run(scenario())
+
+
+def test_stalled_client_does_not_delay_the_others():
+    async def scenario():
+        registry = ClientRegistry(send_timeout=5, max_behind_seconds=30)
+        slow, fast = FakeWebSocket(stalled=True), FakeWebSocket()
+        registry.add(slow, "snapshot")
+        registry.add(fast, "snapshot")
+        offered = []
+        for tick in range(5):
+            offered.append(time.monotonic())
+            registry.offer([slow, fast], f"tick {tick}", tick)
+            await asyncio.sleep(0.01)
+        assert [payload for _, payload in fast.received] == [f"tick {k}" for k in range(5)]
+        assert max(sent - at for (sent, _), at in zip(fast.received, offered)) < 0.05
+        assert slow.received == []
+        stats = registry.stats()
+        assert stats["dropped"] == 3        # slow: tick 0 in flight, 1-3 replaced, 4 waiting
+        assert [client["sent"] for client in stats["clients"]] == [0, 5]
+        registry.remove(slow)
+        registry.remove(fast)
+
+    asyncio.run(scenario())
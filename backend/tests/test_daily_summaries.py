@@ -0,0 +1,134 @@
+import sqlite3
+
+import pytest
+
+import daily_summaries
+from daily_summaries import DAY_MS, DailySummaryAggregator
+from sample_writer import SAMPLE_COLUMNS
+
+MIDNIGHT = 1704153600000   # 2024-01-02 00:00 UTC
+SAMPLE_MINUTES = 1 / 60.0  # the baseline counted one sample as one second
+
+
+def make_db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE daily_summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            machine_id TEXT NOT NULL,
+            total_parts INTEGER,
+            total_cycles INTEGER,
+            avg_spindle_load REAL,
+            max_spindle_load REAL,
+            avg_spindle_temp REAL,
+            max_spindle_temp REAL,
+            total_runtime_minutes REAL,
+            total_idle_minutes REAL,
+            total_alarm_minutes REAL,
+            alarm_count INTEGER,
+            avg_production_rate REAL,
+            UNIQUE(date, machine_id)
+        )
+    """)
+    daily_summaries.ensure_columns(conn.cursor())
+    conn.execute(f"CREATE TABLE machine_samples (id INTEGER PRIMARY KEY, {', '.join(SAMPLE_COLUMNS)})")
+    return conn
+
+
+def sample(ts, execution="RUNNING", k=0):
+    row = dict.fromkeys(SAMPLE_COLUMNS, 0)
+    row.update(ts=ts, machine_id="haas_vf2", machine_name="VF-2", execution=execution, alarm=None,
+               warnings=None, spindle_load=40.0 + k % 17, spindle_temp=30.0 + k % 5,
+               part_count=100 + k // 7, total_cycles=500 + k // 3, production_rate=k % 4)
+    return tuple(row[column] for column in SAMPLE_COLUMNS)
+
+
+def store(conn, rows):
+    """As the writer does: insert the samples, then run the flush hook on them"""
+    conn.executemany(f"INSERT INTO machine_samples ({', '.join(SAMPLE_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' for _ in SAMPLE_COLUMNS)})", rows)
+    DailySummaryAggregator()(conn, rows)
+
+
+def baseline(conn, date_ms):
+    """The original generate_daily_summary() query, over the same rows"""
+    return conn.execute("""
+        SELECT
+            COUNT(*) as sample_count,
+            MAX(part_count) - MIN(part_count) as parts_produced,
+            MAX(total_cycles) - MIN(total_cycles) as cycles_completed,
+            AVG(spindle_load) as avg_spindle_load,
+            MAX(spindle_load) as max_spindle_load,
+            AVG(spindle_temp) as avg_spindle_temp,
+            MAX(spindle_temp) as max_spindle_temp,
+            SUM(CASE WHEN execution = 'RUNNING' THEN 1 ELSE 0 END) as running_samples,
+            AVG(production_rate) as avg_production_rate
+        FROM machine_samples
+        WHERE machine_id = 'haas_vf2' AND ts >= ? AND ts < ?
+    """, (date_ms, date_ms + DAY_MS)).fetchone()
+
+
+def summary(conn, date_ms):
+    return daily_summaries.get_daily_summaries(conn, daily_summaries.day_of(date_ms))[0]
+
+
+def assert_matches_baseline(conn, date_ms):
+    expected, got = baseline(conn, date_ms), summary(conn, date_ms)
+    assert got["total_parts"] == expected["parts_produced"]
+    assert got["total_cycles"] == expected["cycles_completed"]
+    for key in ("avg_spindle_load", "max_spindle_load", "avg_spindle_temp", "max_spindle_temp",
+                "avg_production_rate"):
+        assert got[key] == round(expected[key], 2), key
+    # Baseline: one minute per 60 samples. Sample-and-hold credits the same
+    # time except the last sample's second, which runs into the next day
+    assert got["runtime_minutes"] == pytest.approx(expected["running_samples"] * SAMPLE_MINUTES,
+                                                   abs=SAMPLE_MINUTES + 0.01)
+    return expected, got
+
+
+def test_sample_pair_across_midnight_is_split_between_the_days():
+    conn = make_db()
+    # 1 s samples from 23:59:29.5 to 00:00:29.5: one pair straddles midnight
+    store(conn, [sample(MIDNIGHT - 30500 + 1000 * k, k=k) for k in range(61)])
+
+    before, after = MIDNIGHT - DAY_MS, MIDNIGHT
+    expected, got = assert_matches_baseline(conn, before)
+    assert expected["sample_count"] == 31
+    assert got["runtime_minutes"] == round(30.5 / 60, 2)   # up to midnight
+    assert got["finalized"]
+    expected, got = assert_matches_baseline(conn, after)
+    assert expected["sample_count"] == 30
+    assert got["runtime_minutes"] == round(29.5 / 60, 2)   # from midnight on
+    assert not got["finalized"]
+
+    total = conn.execute("SELECT SUM(total_runtime_minutes) FROM daily_summaries").fetchone()[0]
+    assert total == pytest.approx(1.0)   # nothing lost or counted twice at the boundary
+
+
+def test_gap_over_the_cap_is_not_credited():
+    conn = make_db()
+    start = MIDNIGHT + 3600 * 1000
+    rows = [sample(start + 1000 * k, k=k) for k in range(10)]
+    # Server down for two minutes; then a gap right at the cap, which counts
+    rows += [sample(start + 129000 + 1000 * k, k=k) for k in range(10)]
+    rows += [sample(start + 138000 + daily_summaries.MAX_SAMPLE_GAP_MS, k=20)]
+    store(conn, rows)
+
+    expected, got = baseline(conn, MIDNIGHT), summary(conn, MIDNIGHT)
+    assert expected["running_samples"] == 21
+    assert got["runtime_minutes"] == round((9 + 9 + 60) / 60, 2)
+    assert got["total_parts"] == expected["parts_produced"]
+    assert got["avg_spindle_load"] == round(expected["avg_spindle_load"], 2)
+
+
+def test_state_minutes_follow_the_held_state():
+    conn = make_db()
+    states = ["RUNNING"] * 30 + ["ALARM"] * 10 + ["IDLE"] * 20
+    store(conn, [sample(MIDNIGHT + 1000 * k, execution, k) for k, execution in enumerate(states)])
+    got = summary(conn, MIDNIGHT)
+    assert (got["runtime_minutes"], got["alarm_minutes"], got["idle_minutes"]) == (
+        round(30 / 60, 2), round(10 / 60, 2), round(19 / 60, 2),
+    )
+    assert got["alarm_count"] == 1
@@ -0,0 +1,88 @@
+import pickle
+from datetime import datetime, timedelta
+
+from deltas import DROPPED, DeltaTracker, merge_fields
+from fleet_simulator import create_default_fleet
+from haas_machine import create_fleet_machines
+from sharded_fleet import ShardedFleet
+
+START = datetime(2026, 1, 5, 8, 0, 0)
+
+
+def poke(machine, t):
+    """Controls along the way, so alarms, power-off and dropped fields are covered"""
+    if t % 97 == 13:
+        machine.inject_alarm(1010, "TEST ALARM")
+    elif t % 97 == 40:
+        machine.clear_alarm()
+    elif t % 151 == 70:
+        machine.set_power(False)
+    elif t % 151 == 90:
+        machine.set_power(True)
+
+
+def test_dropped_survives_pickling():
+    assert pickle.loads(pickle.dumps(DROPPED)) is DROPPED
+    assert merge_fields({"a": 1, "b": 2}, {"b": DROPPED, "c": 3}) == {"a": 1, "c": 3}
+
+
+def test_object_deltas_rebuild_to_dict():
+    machines = create_fleet_machines(2, fleet_seed=3)
+    tracker = DeltaTracker()
+    held = {}
+    for t in range(400):
+        now = START + timedelta(seconds=t)
+        for machine in machines.values():
+            poke(machine, t)
+            machine.update(1.0, now)
+        changes = {}
+        for machine_id, machine in machines.items():
+            fields = machine.to_delta(held.get(machine_id, 0))
+            if fields:
+                changes[machine_id] = fields
+                held[machine_id] = machine.version
+        tracker.publish(changes)
+        assert tracker.snapshot() == {machine_id: m.to_dict() for machine_id, m in machines.items()}
+
+
+def test_object_delta_skips_unchanged_fields():
+    machine = create_fleet_machines(1, fleet_seed=3)["haas_vf2"]
+    machine.update(1.0, START)
+    machine.to_delta(0)
+    version = machine.version
+    assert machine.to_delta(version) == {}
+    machine.update(1.0, START + timedelta(seconds=1))
+    fields = machine.to_delta(version)
+    assert "specs" not in fields and "id" not in fields
+    assert fields["timestamp"] == (START + timedelta(seconds=1)).isoformat() + "Z"
+
+
+def test_vector_changes_rebuild_to_dict():
+    fleet = create_default_fleet(2, fleet_seed=3)
+    views = fleet.machines()
+    tracker = DeltaTracker()
+    for t in range(400):
+        for machine in views.values():
+            poke(machine, t)
+        fleet.step(1.0, START + timedelta(seconds=t))
+        tracker.publish(fleet.changes())
+        assert tracker.snapshot() == fleet.all_dicts()
+
+
+def test_sharded_changes_rebuild_to_dict():
+    serial = create_fleet_machines(2, fleet_seed=3)
+    shards = ShardedFleet(create_fleet_machines(2, fleet_seed=3).values(), workers=2)
+    shards.start()
+    try:
+        tracker = DeltaTracker()
+        for t in range(60):
+            now = START + timedelta(seconds=t)
+            for machine in serial.values():
+                machine.update(1.0, now)
+            shards.step(1.0, now)
+            tracker.publish(shards.changes())
+            expected = {machine_id: m.to_dict() for machine_id, m in serial.items()}
+            assert tracker.snapshot() == expected
+            assert shards.all_dicts() == expected
+    finally:
+        shards.stop()
@@ -0,0 +1,39 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import api
+
+client = TestClient(api.app)   # no startup: ticks are run by hand
+
+
+def tick():
+    asyncio.run(api.run_tick())
+
+
+def test_unchanged_tick_is_a_304_and_the_etag_moves_with_ticks():
+    tick()
+    for path in ("/api/machines", "/api/machines/haas_vf2", "/api/reports/summary"):
+        first = client.get(path)
+        etag = first.headers["etag"]
+        assert first.status_code == 200 and first.json()
+        assert etag.startswith(f'"{api.ETAG_RUN}-') and first.headers["cache-control"] == "no-cache"
+
+        again = client.get(path, headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.content == b""
+        assert again.headers["etag"] == etag
+        assert client.get(path, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+        tick()
+        after = client.get(path, headers={"If-None-Match": etag})
+        assert after.status_code == 200 and after.json()
+        assert after.headers["etag"] != etag
+
+
+def test_etag_from_another_run_never_matches():
+    tick()
+    current = client.get("/api/machines").headers["etag"]
+    revision = current.strip('"').rsplit("-", 1)[1]
+    other_run = f"{int(api.ETAG_RUN, 16) ^ 1:08x}"
+    stale = f'"{other_run}-{revision}"'
+    assert client.get("/api/machines", headers={"If-None-Match": stale}).status_code == 200
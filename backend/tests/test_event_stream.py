@@ -0,0 +1,74 @@
+import asyncio
+import zlib
+
+from event_stream import KEEPALIVE, RETRY, EventStream, GzipStream, format_event, parse_last_event_id
+
+
+def stream_with(run, versions):
+    events = EventStream(max_events=10, run=run)
+    for version in versions:
+        events.publish(version, b'{"v":%d}' % version)
+    return events
+
+
+def test_ids_carry_the_run():
+    assert format_event("ab12", 7, b"{}") == b"id: ab12-7\ndata: {}\n\n"
+    assert parse_last_event_id("ab12-7", "ab12") == 7
+    assert parse_last_event_id(None, "ab12") is None
+    assert parse_last_event_id("ab12-x", "ab12") is None
+    assert parse_last_event_id("7", "ab12") is None
+
+
+def test_resume_replays_missed_events():
+    events = stream_with("ab12", range(1, 6))
+    assert events.since(parse_last_event_id("ab12-3", "ab12")) == [
+        b'id: ab12-4\ndata: {"v":4}\n\n',
+        b'id: ab12-5\ndata: {"v":5}\n\n',
+    ]
+    assert events.since(5) == []
+
+
+def test_id_from_before_a_restart_gets_a_snapshot():
+    # The old run got further than the new one: same version number, other run
+    events = stream_with("cd34", range(1, 6))
+    assert events.since(parse_last_event_id("ab12-3", "cd34")) is None
+    assert events.since(parse_last_event_id("ab12-5", "cd34")) is None
+
+
+def test_fallen_out_of_the_buffer_gets_a_snapshot():
+    events = stream_with("ab12", range(1, 30))
+    assert events.since(5) is None
+    assert events.since(30) is None
+
+
+def test_gap_in_ids_clears_the_buffer():
+    events = stream_with("ab12", range(1, 6))
+    events.publish(9, b'{"v":9}')   # ticks 6-8 never published: not replayable
+    assert [event_id for event_id, _ in events.events] == [9]
+    assert events.since(4) is None
+    assert events.since(8) == [b'id: ab12-9\ndata: {"v":9}\n\n']
+    events.publish(10, b'{"v":10}')
+    assert events.since(9) == [b'id: ab12-10\ndata: {"v":10}\n\n']
+
+
+def test_wait_wakes_on_publish():
+    async def scenario():
+        events = stream_with("ab12", range(1, 3))
+        assert await events.wait(1, timeout=0.01) is True     # already past it
+        assert await events.wait(2, timeout=0.01) is False
+        waiter = asyncio.ensure_future(events.wait(2, timeout=5))
+        await asyncio.sleep(0)
+        events.publish(3, b"{}")
+        assert await waiter is True
+
+    asyncio.run(scenario())
+
+
+def test_gzip_chunks_decode_as_soon_as_they_are_flushed():
+    stream = GzipStream()
+    decoder = zlib.decompressobj(31)
+    chunks = [RETRY] + [format_event("ab12", k, b'{"v":%d}' % k) for k in range(1, 20)] + [KEEPALIVE]
+    for chunk in chunks:
+        # Everything sent so far decodes without waiting for more input
+        assert decoder.decompress(stream.encode(chunk)) == chunk
+    assert not decoder.eof   # the stream stays open
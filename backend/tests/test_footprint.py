@@ -0,0 +1,30 @@
+import json
+import sys
+import tracemalloc
+
+from haas_machine import create_fleet_machines
+
+# Dict-based machines with per-tool dicts used ~16 KB each. The budget is
+# for the machine's state; its own random stream (a Mersenne Twister, ~2.5 KB)
+# is a fixed cost on top.
+STATE_BUDGET = 6 * 1024
+
+
+def test_machines_stay_compact():
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        machines = create_fleet_machines(100)
+        for machine in machines.values():
+            machine.update(1.0)
+        per_machine = (tracemalloc.get_traced_memory()[0] - before) / len(machines)
+    finally:
+        tracemalloc.stop()
+
+    sample = machines["haas_vf4"]
+    assert not hasattr(sample, "__dict__")   # slotted
+    assert per_machine - sys.getsizeof(sample.rng) <= STATE_BUDGET
+
+    data = json.loads(json.dumps(sample.to_dict()))
+    assert len(data["tools"]) == sample.specs["toolCapacity"]
+    assert "level" in data["coolant"]
@@ -0,0 +1,54 @@
+import sqlite3
+
+from partitions import DAY_MS, VIEW_ARMS, SamplePartitions, list_partitions, union_sql
+from sample_writer import SAMPLE_COLUMNS
+
+# 2024-01-01 UTC
+FIRST_DAY_MS = 1704067200000
+
+
+def row(ts):
+    return (ts, "haas_vf2") + (0,) * (len(SAMPLE_COLUMNS) - 2)
+
+
+def test_view_spans_more_partitions_than_a_compound_select_allows():
+    days = 520   # SQLite rejects a UNION ALL of more than 500 terms
+    conn = sqlite3.connect(":memory:")
+    partitions = SamplePartitions()
+    for day in range(days):
+        partitions.insert(conn, [row(FIRST_DAY_MS + day * DAY_MS + 1000)])
+    conn.commit()
+
+    assert len(list_partitions(conn)) == days
+    assert conn.execute("SELECT COUNT(*) FROM machine_samples").fetchone()[0] == days
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM machine_samples WHERE machine_id = ? AND ts >= ? ORDER BY ts",
+        ("haas_vf2", FIRST_DAY_MS + 510 * DAY_MS),
+    )]
+    assert ids == list(range(511, days + 1))
+
+    # Still pushed down to each partition's index
+    plan = [r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM machine_samples WHERE machine_id = 'haas_vf2' AND ts > 0"
+    )]
+    assert sum("USING INDEX" in step or "USING COVERING INDEX" in step for step in plan) == days
+
+    partitions.drop(conn, list_partitions(conn)[0])
+    assert conn.execute("SELECT COUNT(*) FROM machine_samples").fetchone()[0] == days - 1
+
+
+def test_union_nests_again_past_view_arms_squared():
+    names = [f"samples_{k}" for k in range(VIEW_ARMS * VIEW_ARMS + 1)]
+    sql = union_sql(names)
+    depth = 0
+    arms = [0]
+    for token in sql.replace("(", " ( ").replace(")", " ) ").split():
+        if token == "(":
+            depth += 1
+            arms.append(0)
+        elif token == ")":
+            assert arms.pop() <= VIEW_ARMS
+            depth -= 1
+        elif token == "SELECT":
+            arms[-1] += 1
+    assert arms == [arms[0]] and arms[0] <= VIEW_ARMS
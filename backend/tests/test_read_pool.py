@@ -0,0 +1,51 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from read_pool import QueryTimeout, ReadPool
+
+
+def make_pool(tmp_path, **kwargs):
+    db = str(tmp_path / "read.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(k,) for k in range(100)])
+    conn.commit()
+    conn.close()
+    pool = ReadPool(db, size=1, max_concurrent=1, timeout=0.5, **kwargs)
+    pool.start()
+    return pool
+
+
+def scan(conn):
+    return conn.execute("SELECT x FROM t ORDER BY x")
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+def test_open_stream_does_not_take_a_query_slot(tmp_path):
+    pool = make_pool(tmp_path, max_streams=1)
+
+    async def scenario():
+        batches = pool.stream(scan, batch_size=10)
+        first = await batches.__anext__()          # a slow client: stream left open
+        assert [row[0] for row in first] == list(range(10))
+        assert await pool.run(count) == 100        # the one query slot is still free
+        assert pool.stats()["active_streams"] == 1
+
+        # ...but the stream slots are bounded
+        second = pool.stream(scan, batch_size=10)
+        with pytest.raises(QueryTimeout):
+            await second.__anext__()
+
+        rest = [row[0] async for rows in batches for row in rows]
+        assert rest == list(range(10, 100))
+        assert pool.stats()["active_streams"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.close()
@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+
+from sample_writer import SAMPLE_COLUMNS, SampleWriter
+
+
+def make_writer(tmp_path, extra_schema=(), **kwargs):
+    db = str(tmp_path / "samples.db")
+    conn = sqlite3.connect(db)
+    conn.execute(f"CREATE TABLE machine_samples ({', '.join(SAMPLE_COLUMNS)})")
+    for statement in extra_schema:
+        conn.execute(statement)
+    conn.close()
+    writer = SampleWriter(db, flush_interval_ms=10, **kwargs)
+    writer.start()
+    return db, writer
+
+
+def row(ts):
+    return (ts, "haas_vf2") + (0,) * (len(SAMPLE_COLUMNS) - 2)
+
+
+def count_rows(db, table="machine_samples"):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_failing_hook_is_rolled_back_alone(tmp_path):
+    failing = {"on": True}
+
+    def hook(conn, rows):
+        conn.execute("INSERT INTO derived VALUES (?)", (len(rows),))
+        if failing["on"]:
+            raise ValueError("rollup bug")
+
+    db, writer = make_writer(tmp_path, ["CREATE TABLE derived (n)"], flush_hooks=[hook])
+    try:
+        assert writer.submit_batch([row(1), row(2)])
+        assert writer.flush(5)
+        assert writer.stats()["running"]
+        assert writer.stats()["flush_errors"] == 1
+        assert writer.stats()["rows_dropped"] == 0
+        assert count_rows(db) == 2      # the samples are kept...
+        assert count_rows(db, "derived") == 0   # ...the hook's partial write is not
+
+        failing["on"] = False
+        assert writer.submit_batch([row(3)])
+        assert writer.flush(5)
+        assert count_rows(db) == 3
+        assert count_rows(db, "derived") == 1
+    finally:
+        writer.stop()
+
+
+def test_failing_call_does_not_cost_the_samples_or_other_calls(tmp_path):
+    db, writer = make_writer(tmp_path)
+    writer._stop.set()      # hold the thread so everything lands in one flush
+    writer._thread.join()
+    writer._thread = None
+    try:
+        assert writer.submit_batch([row(1)])
+        assert writer.submit_call(lambda conn: conn.execute("INSERT INTO machine_samples (ts) VALUES (2)"))
+        assert writer.submit_call(lambda conn: 1 / 0)
+        writer.start()
+        assert writer.flush(5)
+        assert count_rows(db) == 2
+        assert writer.stats()["flush_errors"] == 1
+    finally:
+        writer.stop()
+
+
+def test_flush_is_bounded_when_the_queue_stays_full(tmp_path):
+    db, writer = make_writer(tmp_path, max_queue=1)
+    writer._stop.set()      # a writer that has stopped draining
+    writer._thread.join()
+    writer._thread = threading.Thread(target=lambda: time.sleep(2), daemon=True)
+    writer._thread.start()
+    assert writer.submit_batch([row(1)])
+    started = time.monotonic()
+    assert writer.flush(0.2) is False
+    assert time.monotonic() - started < 1
+
+
+def test_failing_call_and_task_keep_the_writer_alive(tmp_path):
+    db, writer = make_writer(tmp_path)
+    try:
+        assert writer.submit_call(lambda conn: 1 / 0)
+        assert writer.flush(5)
+        writer.add_task(lambda conn: {}["missing"])
+        assert writer.submit_batch([row(1)])
+        assert writer.flush(5)
+        assert writer.stats()["running"]
+        assert writer.stats()["flush_errors"] >= 2
+        assert writer.stats()["background_tasks"] == 0
+        assert count_rows(db) == 1
+    finally:
+        writer.stop()
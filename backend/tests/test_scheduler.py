@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import haas_machine
+from deltas import DeltaTracker
+from haas_machine import create_fleet_machines
+from scheduler import EventScheduler
+
+START = datetime(2026, 1, 5, 8, 0, 0)
+
+
+def collect(scheduler, held):
+    """What api.collect_changes does for SIM_ENGINE=events"""
+    changes = {}
+    for machine in scheduler.drain_touched():
+        fields = machine.to_delta(held.get(machine.id, 0))
+        if fields:
+            changes[machine.id] = fields
+            held[machine.id] = machine.version
+    return changes
+
+
+def test_only_touched_machines_are_diffed(monkeypatch):
+    for machine_type in haas_machine.START_CHANCE:
+        monkeypatch.setitem(haas_machine.START_CHANCE, machine_type, 0.002)   # mostly idle
+    machines = create_fleet_machines(10, fleet_seed=4)
+    scheduler = EventScheduler(machines.values(), 1.0)
+    tracker, held = DeltaTracker(), {}
+
+    touched = []
+    for t in range(120):
+        scheduler.step(START + timedelta(seconds=t))
+        touched.append(len(scheduler._touched))
+        tracker.publish(collect(scheduler, held))
+    assert touched[0] == len(machines)
+    assert max(touched[-20:]) < len(machines) // 2
+
+    # Awake machines are published as they are; a sleeping one as soon as it is touched
+    for machine in machines.values():
+        scheduler.wake(machine)
+    tracker.publish(collect(scheduler, held))
+    assert tracker.snapshot() == {machine_id: m.to_dict() for machine_id, m in machines.items()}
+
+
+def test_sampler_gets_machines_stepped_since_its_last_drain():
+    machines = create_fleet_machines(1, fleet_seed=4)
+    scheduler = EventScheduler(machines.values(), 1.0)
+    scheduler.step(START)
+    assert {m.id for m in scheduler.drain_unsampled()} == set(machines)
+    scheduler.drain_touched()   # the delta side drains its own set
+    scheduler.step(START + timedelta(seconds=1))
+    stepped = {m.id for m in scheduler.drain_unsampled()}
+    assert stepped and {m.id for m in scheduler._active} <= stepped
+    assert scheduler.drain_unsampled() == []
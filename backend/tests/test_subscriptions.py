@@ -0,0 +1,96 @@
+import pytest
+
+from deltas import DeltaTracker
+from subscriptions import MAX_PENDING_WARNINGS, SubscriptionHub, parse_subscription
+
+MACHINES = ("haas_vf2", "haas_vf4", "laser_cut")
+FIELDS = ("execution", "spindleLoad", "warnings")
+
+
+def parse(message, fields=FIELDS, tick_seconds=1.0):
+    return parse_subscription(message, MACHINES, fields, tick_seconds)
+
+
+@pytest.mark.parametrize("message, error", [
+    ({"machines": "haas_vf2"}, "machines must be a list"),
+    ({"machines": ["haas_vf2", 7]}, "machines must be a list"),
+    ({"machines": ["haas_vf2", "nope"]}, "unknown machines: nope"),
+    ({"fields": []}, "fields must be a non-empty list"),
+    ({"fields": ["spindleLoad", "color"]}, "unknown fields: color"),
+    ({"maxRate": 0}, "maxRate must be a positive number"),
+    ({"maxRate": -1}, "maxRate must be a positive number"),
+    ({"maxRate": True}, "maxRate must be a positive number"),
+    ({"maxRate": "2"}, "maxRate must be a positive number"),
+])
+def test_invalid_subscriptions_are_rejected(message, error):
+    with pytest.raises(ValueError, match=error):
+        parse(message)
+
+
+def test_subscription_key_is_normalized():
+    assert parse({}) == (None, None, 1)
+    assert parse({"machines": ["laser_cut", "haas_vf2", "laser_cut"], "fields": ["spindleLoad", "execution"]}) == (
+        ("haas_vf2", "laser_cut"), ("execution", "spindleLoad"), 1,
+    )
+    # Fields aren't known before the first tick: anything goes
+    assert parse({"fields": ["anything"]}, fields=None)[1] == ("anything",)
+
+
+@pytest.mark.parametrize("max_rate, tick_seconds, every_ticks", [
+    (10, 1.0, 1),       # faster than the ticks: every tick
+    (1, 1.0, 1),
+    (0.5, 1.0, 2),
+    (0.3, 1.0, 4),      # 3.33 ticks: rounded up, never more often than asked
+    (1 / 3, 1.0, 3),    # exactly 3 despite float error
+    (2, 0.25, 2),
+    (0.1, 0.5, 20),
+])
+def test_max_rate_becomes_whole_ticks_rounded_up(max_rate, tick_seconds, every_ticks):
+    assert parse({"maxRate": max_rate}, tick_seconds=tick_seconds)[2] == every_ticks
+
+
+def test_groups_project_only_the_subscribed_fields():
+    hub = SubscriptionHub()
+    group = hub.subscribe("client", parse({"machines": ["haas_vf4"], "fields": ["spindleLoad", "warnings"]}))
+    machines = {
+        "haas_vf2": {"execution": "RUNNING", "spindleLoad": 40.0, "warnings": []},
+        "haas_vf4": {"execution": "IDLE", "spindleLoad": 0.0},
+    }
+    assert group.project(machines) == {"haas_vf4": {"spindleLoad": 0.0}}
+    # Shared by every client with the same subscription, encoded once per version
+    assert hub.subscribe("other", (group.machines, group.fields, group.every_ticks)) is group
+    assert group.frame(3, machines) is group.frame(3, machines)
+
+
+def test_due_respects_the_rate_and_changes():
+    hub = SubscriptionHub()
+    tracker = DeltaTracker()
+    group = hub.subscribe("client", parse({"machines": ["haas_vf2"], "fields": ["spindleLoad"], "maxRate": 0.5}))
+    other = {"haas_vf4": {"spindleLoad": 1.0}}
+
+    tracker.publish({"haas_vf2": {"spindleLoad": 1.0, "execution": "RUNNING"}})
+    assert [g for g, _ in hub.due(0, tracker)] == [group]
+    tracker.publish({"haas_vf2": {"spindleLoad": 2.0}})
+    assert hub.due(1, tracker) == []               # changed, but only every 2nd tick
+    assert [g for g, _ in hub.due(2, tracker)] == [group]
+    tracker.publish({"haas_vf2": {"execution": "IDLE"}, **other})
+    assert hub.due(4, tracker) == []               # nothing it subscribed to changed
+
+
+def test_pending_warnings_are_capped():
+    hub = SubscriptionHub()
+    tracker = DeltaTracker()
+    everything = hub.subscribe("a", parse({}))
+    vf2_only = hub.subscribe("b", parse({"machines": ["haas_vf2"]}))
+    no_warnings = hub.subscribe("c", parse({"fields": ["spindleLoad"]}))
+
+    events = [{"machineId": MACHINES[k % 2], "event": "RAISED", "n": k} for k in range(MAX_PENDING_WARNINGS + 500)]
+    for start in range(0, len(events), 100):
+        hub.add_warnings(events[start:start + 100])
+
+    due = dict(hub.due(0, tracker))   # nothing published: due for the warnings alone
+    assert set(due) == {everything, vf2_only}
+    assert [event["n"] for event in due[everything]] == list(range(500, len(events)))   # newest kept
+    assert len(due[vf2_only]) == (len(events) + 1) // 2
+    assert no_warnings.warnings == []
+    assert everything.warnings == [] and hub.due(1, tracker) == []
@@ -0,0 +1,25 @@
+import asyncio
+
+import api
+
+
+def test_a_failing_tick_does_not_stop_the_loop(monkeypatch, capsys):
+    calls = []
+
+    async def run_tick():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise ValueError("bad tick")
+        if len(calls) == 3:
+            raise asyncio.CancelledError()
+
+    monkeypatch.setattr(api, "run_tick", run_tick)
+    monkeypatch.setattr(api, "TICK_SECONDS", 0.001)
+    try:
+        asyncio.run(api.tick_loop())
+    except asyncio.CancelledError:
+        pass
+    assert calls == [0, 1, 2]
+    out = capsys.readouterr()
+    assert "failed: ValueError('bad tick')" in out.out
+    assert "Traceback" in out.err
@@ -27,6 +27,7 @@ def check_dependencies():
         'uvicorn',
         'websockets',
         'aiofiles',
+        'numpy',
     ]
     
     all_good = True